@@ -0,0 +1,398 @@
+"""
+Сквозной бенчмарк бота без сети: /film и /random от обновления до видео.
+
+Все внешние сервисы заменены локальными (benchmarks/fake_services.py,
+отдельный процесс): Kinopoisk API, сайт zona с плеером, отдающим
+локальный .mp4, и Telegram Bot API, принимающий sendVideo
+и editMessageText. Бот собирается как в bot/main.py (БД во временном
+каталоге, общий HTTP-клиент, процессы парсера, пул /random) и получает
+обновления через Dispatcher.feed_update - работают те же middleware
+и обработчики search_film и random_handler.
+
+Нагрузка закрытая: --concurrency клиентов, каждый отправляет следующий
+запрос после ответа на предыдущий. --hit-ratio - доля запросов
+к фильмам, уже загруженным в Telegram (для /random - предпочтение
+загруженных кандидатов, RANDOM_CACHED_PREFERENCE). Промахи /film
+ищут каждый раз новое название.
+
+Парсер: --parser chromium - настоящий парсер в Chromium (нужен
+playwright install chromium), --parser http - процесс парсера без
+браузера (benchmarks/fake_parser_worker.py).
+
+Результат - JSON с задержками p50/p95/p99 (всего, попаданий и промахов),
+пропускной способностью и пиковой памятью процесса бота с процессами
+парсера. --compare печатает изменения относительно прошлого прогона.
+
+Остальные настройки берутся из окружения, как у бота (JOB_WORKERS,
+DOWNLOAD_SEGMENTS, PARSER_WORKERS...). Лимиты исходящих запросов
+Telegram (--outbound-limits) по умолчанию выключены: канал хранилища
+принимает 20 видео в минуту, и загрузки упирались бы в этот лимит.
+
+Запуск:
+    python -m benchmarks.bench_e2e --parser http --requests 200 --concurrency 16 --hit-ratio 0.8
+    python -m benchmarks.bench_e2e --json after.json --compare before.json
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.fake_services import FakeOptions, FakeServicesProcess, TOP_TITLE
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+BENCH_CHANNEL_ID = "-1001234567890"
+BENCH_TOKEN = "42:bench"
+
+# Первый пользователь бенчмарка; у каждого запроса свой пользователь и чат
+FIRST_USER_ID = 100_000
+
+# Метрики, сравниваемые в --compare (больше - лучше только у пропускной способности)
+COMPARED = ("p50_ms", "p95_ms", "p99_ms", "throughput_rps", "peak_rss_mb")
+
+
+def configure_environment(base_url: str, db_path: str, args) -> None:
+    """Переменные окружения до импорта config: внешние адреса ведут на заменители"""
+    os.environ.update({
+        "KINOPOISK_API_URL": f"{base_url}/kinopoisk/v1.4",
+        "KINOPOISK_TOKEN": "bench",
+        "ZONA_BASE_URL": f"{base_url}/zona",
+        "DATABASE_URL": f"sqlite+aiosqlite:///{db_path}",
+        "CHANNEL_ID": BENCH_CHANNEL_ID,
+        "RANDOM_CACHED_PREFERENCE": str(args.hit_ratio),
+        "METRICS_PORT": "0",
+    })
+    os.environ.setdefault("RANDOM_POOL_PAGES", "5")
+    os.environ.setdefault("RANDOM_POOL_PAGE_SIZE", "100")
+    if args.parser == "http":
+        os.environ.setdefault("PARSER_WORKERS", "2")
+
+
+def _percentile(values: List[float], p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+def _latency_summary(latencies: List[float]) -> Dict[str, Any]:
+    if not latencies:
+        return {"count": 0}
+    return {
+        "count": len(latencies),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2),
+        "p50_ms": round(_percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(_percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(_percentile(latencies, 0.99) * 1000, 2),
+        "max_ms": round(max(latencies) * 1000, 2),
+    }
+
+
+class RssSampler:
+    """Пиковая память процесса бота вместе с процессами парсера (без заменителей)"""
+
+    def __init__(self, exclude_pid: Optional[int], interval: float = 0.1):
+        self.exclude_pid = exclude_pid
+        self.interval = interval
+        self.peak = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def sample(self) -> int:
+        from services.parser_worker import process_tree_rss
+        rss = process_tree_rss()
+        if self.exclude_pid:
+            rss -= process_tree_rss(self.exclude_pid)
+        self.peak = max(self.peak, rss)
+        return rss
+
+    def reset(self) -> None:
+        self.peak = 0
+        self.sample()
+
+    def start(self) -> None:
+        async def run():
+            while True:
+                self.sample()
+                await asyncio.sleep(self.interval)
+
+        self._task = asyncio.create_task(run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+def create_recorder():
+    from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+    from aiogram.methods import SendMessage, SendVideo
+
+    class Recorder(BaseRequestMiddleware):
+        """Что бот отправил в чаты пользователей: статус поиска (промах) и видео"""
+
+        def __init__(self):
+            self.searched: Set[int] = set()
+            self.delivered: Set[int] = set()
+            self.uploads = 0
+
+        async def __call__(self, make_request, bot, method):
+            chat_id = getattr(method, "chat_id", None)
+            if isinstance(method, SendMessage) and method.text.startswith("🔍"):
+                self.searched.add(chat_id)
+            elif isinstance(method, SendVideo):
+                if str(chat_id) == BENCH_CHANNEL_ID:
+                    self.uploads += 1
+                else:
+                    self.delivered.add(chat_id)
+            return await make_request(bot, method)
+
+    return Recorder()
+
+
+def make_update(update_id: int, user_id: int, text: str) -> Dict[str, Any]:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "User"},
+            "text": text,
+        },
+    }
+
+
+async def seed_cached_films(count: int, base_url: str) -> None:
+    """Фильмы, уже загруженные в Telegram: первые count фильмов топа"""
+    from database.connection import get_db_session
+    from database.models import VideoCache
+
+    async with get_db_session() as session:
+        for movie_id in range(1, count + 1):
+            await VideoCache.create_or_update(
+                session,
+                title=TOP_TITLE.format(movie_id),
+                file_id=f"cached-{movie_id}",
+                video_url=f"{base_url}/video/cached-{movie_id}.mp4",
+                kinopoisk_id=movie_id,
+                description=f"Описание фильма {movie_id}"
+            )
+        await session.commit()
+
+
+async def run_scenario(scenario: str, args, bot, dp, recorder, sampler: RssSampler, ids) -> Dict[str, Any]:
+    from aiogram.types import Update
+
+    run_tag = f"{os.getpid()}-{scenario}"
+    requests = itertools.count()
+    samples: List[Dict[str, Any]] = []
+
+    def command() -> str:
+        if scenario == "random":
+            return "/random"
+        if random.random() < args.hit_ratio:
+            return f"/film {TOP_TITLE.format(random.randint(1, args.cached_films))}"
+        return f"/film Bench Film {run_tag}-{next(ids)}"
+
+    async def client() -> None:
+        while next(requests) < args.requests:
+            user_id = FIRST_USER_ID + next(ids)
+            update = Update.model_validate(make_update(user_id, user_id, command()), context={"bot": bot})
+            started = time.perf_counter()
+            error = None
+            try:
+                await dp.feed_update(bot, update)
+            except Exception as e:
+                error = repr(e)
+            samples.append({
+                "latency": time.perf_counter() - started,
+                "hit": user_id not in recorder.searched,
+                "delivered": user_id in recorder.delivered,
+                "error": error,
+            })
+
+    uploads_before = recorder.uploads
+    sampler.reset()
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+    sampler.sample()
+
+    delivered = [s for s in samples if s["delivered"]]
+    result = {
+        "requests": len(samples),
+        "delivered": len(delivered),
+        "failed": len(samples) - len(delivered),
+        "errors": sorted({s["error"] for s in samples if s["error"]}),
+        "cache_hit_ratio": round(sum(s["hit"] for s in delivered) / len(delivered), 3) if delivered else 0.0,
+        "uploads": recorder.uploads - uploads_before,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(delivered) / elapsed, 2) if elapsed else 0.0,
+        "peak_rss_mb": round(sampler.peak / (1024 * 1024), 1),
+        **_latency_summary([s["latency"] for s in delivered]),
+        "hits": _latency_summary([s["latency"] for s in delivered if s["hit"]]),
+        "misses": _latency_summary([s["latency"] for s in delivered if not s["hit"]]),
+    }
+    print(f"{scenario:<7} delivered={result['delivered']}/{result['requests']} "
+          f"hit={result['cache_hit_ratio']:.2f} rps={result['throughput_rps']:.2f} "
+          f"p50={result.get('p50_ms', 0):.1f}ms p95={result.get('p95_ms', 0):.1f}ms "
+          f"p99={result.get('p99_ms', 0):.1f}ms rss={result['peak_rss_mb']:.0f}MB")
+    return result
+
+
+async def run(args, fakes: FakeServicesProcess) -> Dict[str, Any]:
+    from aiogram import Bot, Dispatcher
+    from aiogram.client.session.aiohttp import AiohttpSession
+    from aiogram.client.telegram import TelegramAPIServer
+
+    import services.zona_parser_service as parser_service
+    from config import PARSER_WORKERS, PARSER_JOB_TIMEOUT, PARSER_WORKER_MAX_RSS_MB
+    from bot.handlers import start, film, help, random as random_film, favorites, text
+    from bot.middlewares.database import DatabaseMiddleware
+    from bot.middlewares.outbound import OutboundScheduler
+    from bot.middlewares.tracing import TracingMiddleware
+    from database.connection import init_db
+    from services.http_client import start_http_client, close_http_client
+    from services.logging_setup import setup_logging
+    from services.parser_pool import ParserWorkerPool
+    from services.random_pool import random_pool
+
+    setup_logging(level=args.log_level)
+    if args.parser == "http":
+        parser_service.parser_workers = ParserWorkerPool(
+            max(1, PARSER_WORKERS), PARSER_JOB_TIMEOUT, PARSER_WORKER_MAX_RSS_MB,
+            module="benchmarks.fake_parser_worker"
+        )
+
+    await init_db()
+    await seed_cached_films(args.cached_films, fakes.base_url)
+    await start_http_client()
+    await parser_service.start_parser()
+    await random_pool.refresh()
+
+    session = AiohttpSession(api=TelegramAPIServer.from_base(fakes.base_url))
+    bot = Bot(BENCH_TOKEN, session=session)
+    recorder = create_recorder()
+    bot.session.middleware(recorder)
+    outbound = None
+    if args.outbound_limits:
+        outbound = OutboundScheduler()
+        bot.session.middleware(outbound)
+
+    dp = Dispatcher()
+    dp.update.outer_middleware(TracingMiddleware())
+    dp.message.middleware(DatabaseMiddleware())
+    dp.callback_query.middleware(DatabaseMiddleware())
+    for module in (start, film, random_film, favorites, help, text):
+        dp.include_router(module.router)
+
+    sampler = RssSampler(fakes.process.pid if fakes.process else None)
+    sampler.start()
+    ids = itertools.count()
+    scenarios: Dict[str, Any] = {}
+    try:
+        for scenario in args.scenarios:
+            scenarios[scenario] = await run_scenario(scenario, args, bot, dp, recorder, sampler, ids)
+    finally:
+        await sampler.stop()
+        await parser_service.stop_parser()
+        await close_http_client()
+        if outbound is not None:
+            await outbound.close()
+        await bot.session.close()
+
+    return {
+        "benchmark": "e2e",
+        "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "options": {key: value for key, value in vars(args).items() if key not in ("json", "compare")},
+        "max_rss_self_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "scenarios": scenarios,
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=PROJECT_ROOT, capture_output=True, text=True, timeout=10
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    """Изменения метрик относительно прошлого прогона"""
+    print(f"\nCompared with {baseline.get('git_commit') or '?'} ({baseline.get('started_at', '?')}):")
+    for scenario, current in report["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(scenario)
+        if not previous:
+            continue
+        for metric in COMPARED:
+            old, new = previous.get(metric), current.get(metric)
+            if old is None or new is None:
+                continue
+            change = f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+            print(f"  {scenario:<7} {metric:<15} {old:>10} -> {new:>10}  {change}")
+
+
+def main(args) -> None:
+    fakes = FakeServicesProcess(FakeOptions(
+        kinopoisk_ms=args.kinopoisk_ms,
+        zona_ms=args.zona_ms,
+        telegram_ms=args.telegram_ms,
+        video_mb=args.video_mb
+    ))
+    base_url = fakes.start()
+    workdir = tempfile.mkdtemp(prefix="bench_e2e_")
+    try:
+        configure_environment(base_url, os.path.join(workdir, "movies.db"), args)
+        print(f"requests={args.requests} concurrency={args.concurrency} hit_ratio={args.hit_ratio} "
+              f"parser={args.parser} video={args.video_mb}MB")
+        report = asyncio.run(run(args, fakes))
+    finally:
+        fakes.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    with open(args.json, "w") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"Results saved to {args.json}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", type=lambda value: value.split(","), default=["film", "random"],
+                        help="Через запятую: film, random")
+    parser.add_argument("--requests", type=int, default=200, help="Запросов на сценарий")
+    parser.add_argument("--concurrency", type=int, default=16, help="Одновременных пользователей")
+    parser.add_argument("--hit-ratio", type=float, default=0.8, help="Доля запросов к загруженным фильмам")
+    parser.add_argument("--cached-films", type=int, default=100, help="Загруженных фильмов до начала")
+    parser.add_argument("--parser", choices=("chromium", "http"), default="chromium")
+    parser.add_argument("--kinopoisk-ms", type=float, default=150, help="Задержка ответа Kinopoisk")
+    parser.add_argument("--zona-ms", type=float, default=300, help="Задержка страницы zona")
+    parser.add_argument("--telegram-ms", type=float, default=40, help="Задержка ответа Telegram")
+    parser.add_argument("--video-mb", type=float, default=8, help="Размер видео")
+    parser.add_argument("--outbound-limits", action="store_true", help="Лимиты Telegram (OutboundScheduler)")
+    parser.add_argument("--log-level", default="WARNING")
+    parser.add_argument("--json", default="bench_e2e.json", help="Файл результатов")
+    parser.add_argument("--compare", help="JSON прошлого прогона для сравнения")
+    main(parser.parse_args())
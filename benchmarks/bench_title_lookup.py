@@ -0,0 +1,119 @@
+"""
+Бенчмарк поиска по названию в VideoCache.
+
+Сравнивает прежний ILIKE '%query%', точный поиск по title_key
+и нечеткий поиск через FTS5 на синтетической SQLite-таблице.
+
+Запуск:
+    python -m benchmarks.bench_title_lookup --rows 100000 --queries 500
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from database.connection import Base
+from database.migrations import run_migrations
+from database.models import VideoCache
+from services.normalize import normalize_title
+
+WORDS = [
+    "матрица", "начало", "терминатор", "чужой", "бегущий", "лезвию", "побег", "шоушенка",
+    "криминальное", "чтиво", "форрест", "гамп", "список", "властелин", "колец", "гарри",
+    "поттер", "звездные", "войны", "темный", "рыцарь", "зеленая", "миля", "брат", "остров",
+    "интерстеллар", "джентльмены", "удачи", "ирония", "судьбы", "пираты", "карибского", "моря",
+]
+
+
+def make_title(i: int) -> str:
+    rnd = random.Random(i)
+    words = " ".join(rnd.sample(WORDS, rnd.randint(1, 4))).capitalize()
+    return f"{words} {i} ({rnd.randint(1950, 2024)})"
+
+
+async def fill(session_maker, rows: int) -> None:
+    batch = 5000
+    async with session_maker() as session:
+        for start in range(0, rows, batch):
+            values = []
+            for i in range(start, min(start + batch, rows)):
+                title = make_title(i)
+                values.append({"title": title, "title_key": normalize_title(title), "file_id": f"file_{i}"})
+            await session.execute(insert(VideoCache), values)
+        await session.commit()
+
+
+async def measure(name: str, queries: list, lookup) -> dict:
+    latencies = []
+    hits = 0
+    for query in queries:
+        started = time.perf_counter()
+        if await lookup(query):
+            hits += 1
+        latencies.append((time.perf_counter() - started) * 1000)
+    latencies.sort()
+    result = {
+        "name": name,
+        "p50_ms": round(statistics.median(latencies), 3),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1], 3),
+        "qps": round(len(queries) / (sum(latencies) / 1000), 1),
+        "hits": hits,
+    }
+    print(f"{name:<24} p50={result['p50_ms']:>8.3f}ms  p95={result['p95_ms']:>8.3f}ms  "
+          f"qps={result['qps']:>9.1f}  hits={hits}/{len(queries)}")
+    return result
+
+
+async def main(rows: int, queries_count: int) -> None:
+    db_path = os.path.join(tempfile.mkdtemp(), "bench_titles.db")
+    engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+    session_maker = async_sessionmaker(engine, expire_on_commit=False)
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await run_migrations(conn)
+
+    started = time.perf_counter()
+    await fill(session_maker, rows)
+    print(f"Inserted {rows} rows in {time.perf_counter() - started:.1f}s ({db_path})")
+
+    rnd = random.Random(42)
+    ids = [rnd.randrange(rows) for _ in range(queries_count)]
+    exact_queries = [make_title(i).upper() for i in ids]
+    # Запрос по части названия: первое слово и номер
+    partial_queries = [f"{make_title(i).split()[0]} {i}" for i in ids]
+
+    async with session_maker() as session:
+        async def old_ilike(query):
+            stmt = select(VideoCache).where(VideoCache.title.ilike(f"%{query}%")).limit(1)
+            return (await session.execute(stmt)).scalars().first()
+
+        async def title_key(query):
+            return await VideoCache.get_by_title_key(session, query)
+
+        async def fts(query):
+            return await VideoCache.search_by_title(session, query, limit=10)
+
+        await measure("ILIKE %query% (old)", partial_queries, old_ilike)
+        await measure("title_key exact", exact_queries, title_key)
+        await measure("FTS5 ranked, LIMIT 10", partial_queries, fts)
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.queries))
@@ -0,0 +1,262 @@
+"""
+Бенчмарк получения обновлений: long polling против вебхука.
+
+Без сети и токена: вместо Telegram API подставляется фейковая сессия
+бота, а вебхук получает синтетические обновления POST-запросами от
+клиента в отдельном процессе (как Telegram, не больше --connections
+соединений), чтобы нагрузка не делила цикл событий с ботом.
+Обновления поступают с частотой --rate, обработчик имитирует работу
+(--handler-ms) и отвечает сообщением. Для polling каждый getUpdates
+стоит --rtt-ms сетевой задержки.
+
+Задержка - от появления обновления у "Telegram" до начала обработчика.
+Клиент и бот делят процессор: на одном ядре при высокой частоте
+результат вебхука ограничен самим генератором нагрузки.
+
+Запуск:
+    python -m benchmarks.bench_transport --updates 5000 --rate 1000
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import sys
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Deque, Dict, List
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import aiohttp
+from aiohttp import web
+from aiogram import Bot, Dispatcher, Router
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import GetMe, GetUpdates, SendMessage, TelegramMethod
+from aiogram.types import Message, Update, User
+
+from bot.webhook import create_webhook_app
+
+SECRET = "bench-secret"
+PATH = "/telegram/webhook"
+
+
+def make_update(update_id: int) -> Dict[str, Any]:
+    """Обновление с временем появления в тексте (monotonic общий для процессов)"""
+    user_id = 1000 + update_id % 500
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "User"},
+            "text": f"{update_id} {time.monotonic()}",
+        },
+    }
+
+
+class FakeTelegramSession(BaseSession):
+    """Ответы Telegram API из памяти; getUpdates отдает накопленные обновления"""
+
+    def __init__(self, rtt: float):
+        super().__init__()
+        self.rtt = rtt
+        self.inbox: Deque[Dict[str, Any]] = deque()
+        self.arrived = asyncio.Event()
+        self.sent = 0
+
+    async def make_request(self, bot: Bot, method: TelegramMethod, timeout: Any = None) -> Any:
+        if isinstance(method, GetUpdates):
+            await asyncio.sleep(self.rtt / 2)
+            if not self.inbox:
+                self.arrived.clear()
+                try:
+                    await asyncio.wait_for(self.arrived.wait(), method.timeout or 1)
+                except asyncio.TimeoutError:
+                    pass
+            batch = [self.inbox.popleft() for _ in range(min(len(self.inbox), method.limit or 100))]
+            await asyncio.sleep(self.rtt / 2)
+            return [Update.model_validate(update, context={"bot": bot}) for update in batch]
+        if isinstance(method, GetMe):
+            return User(id=1, is_bot=True, first_name="Bench")
+        if isinstance(method, SendMessage):
+            self.sent += 1
+            return Message.model_validate({
+                "message_id": self.sent,
+                "date": int(time.time()),
+                "chat": {"id": method.chat_id, "type": "private"},
+                "text": method.text,
+            }, context={"bot": bot})
+        return True
+
+    async def stream_content(self, *args: Any, **kwargs: Any):
+        raise NotImplementedError
+        yield b""
+
+    async def close(self) -> None:
+        pass
+
+    def push(self, update: Dict[str, Any]) -> None:
+        self.inbox.append(update)
+        self.arrived.set()
+
+
+class Recorder:
+    def __init__(self, total: int):
+        self.total = total
+        self.latencies: List[float] = []
+        self.handled = 0
+        # Первое появление обновления и окончание последнего обработчика (monotonic)
+        self.first_arrival = float("inf")
+        self.finished = 0.0
+        self.done = asyncio.Event()
+
+    def router(self, handler_delay: float) -> Router:
+        router = Router()
+
+        @router.message()
+        async def handle(message: Message) -> None:
+            arrival = float(message.text.split()[1])
+            self.first_arrival = min(self.first_arrival, arrival)
+            self.latencies.append(time.monotonic() - arrival)
+            await asyncio.sleep(handler_delay)
+            await message.answer("ok")
+            self.handled += 1
+            if self.handled >= self.total:
+                self.finished = time.monotonic()
+                self.done.set()
+
+        return router
+
+    def report(self, name: str) -> Dict[str, Any]:
+        elapsed = self.finished - self.first_arrival
+        latencies = sorted(self.latencies) or [0.0]
+
+        def pct(p: float) -> float:
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000, 2)
+
+        result = {
+            "transport": name,
+            "updates": self.handled,
+            "updates_per_sec": round(self.handled / elapsed, 1),
+            "p50_ms": pct(0.50),
+            "p95_ms": pct(0.95),
+            "p99_ms": pct(0.99),
+        }
+        print(f"{name:<8} updates/s={result['updates_per_sec']:>8.1f}  "
+              f"p50={result['p50_ms']:>8.2f}ms  p95={result['p95_ms']:>8.2f}ms  p99={result['p99_ms']:>8.2f}ms")
+        return result
+
+
+async def produce(updates: int, rate: float, deliver) -> None:
+    """Открытая нагрузка: обновления приходят с частотой rate независимо от обработки"""
+    started = time.monotonic()
+    for update_id in range(1, updates + 1):
+        delay = started + update_id / rate - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        deliver(make_update(update_id))
+
+
+async def run_polling(args) -> Dict[str, Any]:
+    session = FakeTelegramSession(args.rtt_ms / 1000)
+    bot = Bot("42:bench", session=session)
+    recorder = Recorder(args.updates)
+    dp = Dispatcher()
+    dp.include_router(recorder.router(args.handler_ms / 1000))
+
+    polling = asyncio.create_task(dp.start_polling(bot, handle_signals=False, close_bot_session=False, polling_timeout=1))
+    await produce(args.updates, args.rate, session.push)
+    await recorder.done.wait()
+    await dp.stop_polling()
+    await polling
+    return recorder.report("polling")
+
+
+async def run_webhook(args) -> Dict[str, Any]:
+    session = FakeTelegramSession(args.rtt_ms / 1000)
+    bot = Bot("42:bench", session=session)
+    recorder = Recorder(args.updates)
+    dp = Dispatcher()
+    dp.include_router(recorder.router(args.handler_ms / 1000))
+
+    app = create_webhook_app(
+        dp, bot, SECRET, path=PATH,
+        max_concurrency=args.max_concurrency, max_pending=args.max_pending
+    )
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    url = f"http://127.0.0.1:{port}{PATH}"
+
+    rejected = multiprocessing.get_context("spawn").Value("i", 0)
+    client = multiprocessing.get_context("spawn").Process(
+        target=post_updates,
+        args=(url, args.updates, args.rate, args.connections, rejected)
+    )
+    client.start()
+    await recorder.done.wait()
+
+    await asyncio.get_running_loop().run_in_executor(None, client.join)
+    await runner.cleanup()
+    result = recorder.report("webhook")
+    result["rejected_503"] = rejected.value
+    return result
+
+
+def post_updates(url: str, updates: int, rate: float, connections: int, rejected) -> None:
+    """Процесс-"Telegram": отправляет обновления на вебхук"""
+    async def run() -> None:
+        client = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=connections))
+        posts = set()
+
+        async def post(update: Dict[str, Any]) -> None:
+            # Как Telegram: повтор, пока вебхук не примет обновление
+            while True:
+                async with client.post(url, json=update, headers={"X-Telegram-Bot-Api-Secret-Token": SECRET}) as resp:
+                    if resp.status == 200:
+                        return
+                with rejected.get_lock():
+                    rejected.value += 1
+                await asyncio.sleep(0.1)
+
+        def deliver(update: Dict[str, Any]) -> None:
+            task = asyncio.create_task(post(update))
+            posts.add(task)
+            task.add_done_callback(posts.discard)
+
+        await produce(updates, rate, deliver)
+        await asyncio.gather(*posts)
+        await client.close()
+
+    asyncio.run(run())
+
+
+async def main(args) -> None:
+    print(f"updates={args.updates} rate={args.rate}/s handler={args.handler_ms}ms rtt={args.rtt_ms}ms")
+    results = []
+    if args.transport in ("polling", "both"):
+        results.append(await run_polling(args))
+    if args.transport in ("webhook", "both"):
+        results.append(await run_webhook(args))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--transport", choices=("polling", "webhook", "both"), default="both")
+    parser.add_argument("--updates", type=int, default=5000)
+    parser.add_argument("--rate", type=float, default=1000, help="Обновлений в секунду")
+    parser.add_argument("--handler-ms", type=float, default=20, help="Время работы обработчика")
+    parser.add_argument("--rtt-ms", type=float, default=50, help="Сетевая задержка getUpdates")
+    parser.add_argument("--connections", type=int, default=40, help="Соединений Telegram к вебхуку")
+    parser.add_argument("--max-concurrency", type=int, default=64)
+    parser.add_argument("--max-pending", type=int, default=1000)
+    parser.add_argument("--json", help="Сохранить результаты в JSON-файл")
+    asyncio.run(main(parser.parse_args()))
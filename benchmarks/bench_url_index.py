@@ -0,0 +1,119 @@
+"""
+Бенчмарк поиска VideoCache по URL видео.
+
+Сравнивает прежний индекс по полному тексту video_url с уникальным
+индексом по url_hash (хеш канонического URL): размер индексов
+и задержку поиска. Ссылки CDN содержат подпись и срок действия,
+поэтому "свежая" ссылка на тот же файл отличается от сохраненной.
+
+Запуск:
+    python -m benchmarks.bench_url_index --rows 200000 --queries 1000
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import insert, select, text
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from benchmarks.bench_title_lookup import measure
+from database.connection import Base
+from database.migrations import run_migrations
+from database.models import VideoCache
+from services.normalize import normalize_title, video_url_hash
+
+
+def make_url(i: int, token_seed: int = 0) -> str:
+    rnd = random.Random(i * 7919 + token_seed)
+    token = "".join(rnd.choices("abcdef0123456789", k=64))
+    expires = 1_700_000_000 + rnd.randrange(10_000_000)
+    return (
+        f"https://cdn{i % 16}.stream.example.net/hls/videos/{i // 1000}/{i}/720p/movie_{i}.mp4"
+        f"?token={token}&expires={expires}&quality=720&utm_source=zona&utm_medium=player"
+    )
+
+
+async def fill(session_maker, rows: int) -> None:
+    batch = 5000
+    async with session_maker() as session:
+        for start in range(0, rows, batch):
+            values = []
+            for i in range(start, min(start + batch, rows)):
+                url = make_url(i)
+                values.append({
+                    "title": f"Фильм {i}",
+                    "title_key": normalize_title(f"Фильм {i}"),
+                    "file_id": f"file_{i}",
+                    "video_url": url,
+                    "url_hash": video_url_hash(url),
+                })
+            await session.execute(insert(VideoCache), values)
+        await session.commit()
+
+
+async def index_sizes(session) -> dict:
+    """Размер индексов в байтах (нужна поддержка dbstat в SQLite)"""
+    try:
+        result = await session.execute(text(
+            "SELECT name, SUM(pgsize) FROM dbstat "
+            "WHERE name IN ('idx_video_url', 'idx_url_hash_unique') GROUP BY name"
+        ))
+        return dict(result.all())
+    except Exception:
+        return {}
+
+
+async def main(rows: int, queries_count: int) -> None:
+    db_path = os.path.join(tempfile.mkdtemp(), "bench_urls.db")
+    engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+    session_maker = async_sessionmaker(engine, expire_on_commit=False)
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await run_migrations(conn)
+
+    started = time.perf_counter()
+    await fill(session_maker, rows)
+    async with engine.begin() as conn:
+        # Прежний индекс - только для сравнения
+        await conn.execute(text("CREATE INDEX idx_video_url ON video_cache (video_url)"))
+        await conn.execute(text("ANALYZE"))
+    print(f"Inserted {rows} rows in {time.perf_counter() - started:.1f}s ({db_path})")
+
+    rnd = random.Random(42)
+    ids = [rnd.randrange(rows) for _ in range(queries_count)]
+    stored_urls = [make_url(i) for i in ids]
+    fresh_urls = [make_url(i, token_seed=1) for i in ids]
+
+    async with session_maker() as session:
+        for name, size in sorted((await index_sizes(session)).items()):
+            print(f"{name:<24} {size / (1024 * 1024):>8.1f} MB")
+
+        async def by_text(url):
+            stmt = select(VideoCache).where(VideoCache.video_url == url)
+            return (await session.execute(stmt)).scalars().first()
+
+        async def by_hash(url):
+            return await VideoCache.get_by_url(session, url)
+
+        await measure("video_url (old)", stored_urls, by_text)
+        await measure("video_url, new token", fresh_urls, by_text)
+        await measure("url_hash", stored_urls, by_hash)
+        await measure("url_hash, new token", fresh_urls, by_hash)
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--queries", type=int, default=1000)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.queries))
@@ -0,0 +1,82 @@
+"""
+Процесс парсера без браузера для бенчмарка (--parser http).
+
+Тот же протокол, что у services/parser_worker.py, но страницы
+заменителя zona (benchmarks/fake_services.py) загружаются обычными
+HTTP-запросами, а ссылка на видео берется из кнопки плеера. Измеряет
+бота без стоимости Chromium.
+"""
+import asyncio
+import json
+import logging
+import re
+import sys
+from pathlib import Path
+from typing import Any, Dict, Optional
+from urllib.parse import quote, urljoin
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import aiohttp
+
+from config import ZONA_BASE_URL
+from services.parser_worker import process_tree_rss, _protocol_stream, _reply
+
+logger = logging.getLogger(__name__)
+
+RESULT_LINK = re.compile(r'class="results-item" href="([^"]+)"')
+PLAYER_VIDEO = re.compile(r'class="vjs-big-play-button" data-video="([^"]+)"')
+
+
+async def search(session: aiohttp.ClientSession, title: str, timings: Dict[str, float]) -> Optional[str]:
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    try:
+        search_url = f"{ZONA_BASE_URL}/search/{quote(title, safe='')}"
+        async with session.get(search_url) as resp:
+            page = await resp.text()
+        timings["search_page"] = loop.time() - started
+
+        link = RESULT_LINK.search(page)
+        if link is None:
+            return None
+        film_url = urljoin(search_url, link.group(1))
+        async with session.get(film_url) as resp:
+            page = await resp.text()
+        timings["film_page"] = loop.time() - started - timings["search_page"]
+
+        video = PLAYER_VIDEO.search(page)
+        return urljoin(film_url, video.group(1)) if video else None
+    finally:
+        timings["total"] = loop.time() - started
+
+
+async def serve(protocol) -> None:
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader()
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+
+    async with aiohttp.ClientSession() as session:
+        _reply(protocol, {"ready": True})
+        while line := await reader.readline():
+            job = json.loads(line)
+            reply: Dict[str, Any] = {"id": job["id"], "url": None, "timings": {}}
+            try:
+                reply["url"] = await asyncio.wait_for(
+                    search(session, job["title"], reply["timings"]), job.get("deadline")
+                )
+            except Exception as e:
+                logger.error(f"Search failed for '{job['title']}': {e}")
+                reply["error"] = str(e) or type(e).__name__
+            reply["rss"] = process_tree_rss()
+            _reply(protocol, reply)
+
+
+def main() -> None:
+    protocol = _protocol_stream()
+    logging.basicConfig(level=logging.WARNING, stream=sys.stderr)
+    asyncio.run(serve(protocol))
+
+
+if __name__ == "__main__":
+    main()
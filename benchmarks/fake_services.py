@@ -0,0 +1,241 @@
+"""
+Локальные заменители внешних сервисов для сквозного бенчмарка.
+
+Одно aiohttp-приложение с префиксами:
+    /kinopoisk/v1.4/...   - Kinopoisk API (поиск, детали, топ)
+    /zona/...             - сайт в разметке zona.plus: поиск, страница
+                            фильма, плеер запрашивает /video/<slug>.mp4
+    /video/<slug>.mp4     - видеофайл (HEAD и Range поддерживаются)
+    /bot<token>/<method>  - Telegram Bot API (getMe, sendMessage,
+                            editMessageText, sendVideo, deleteMessage...)
+
+Каждый сервис отвечает с настраиваемой задержкой. Запускается
+в отдельном процессе (FakeServicesProcess), чтобы не делить цикл событий
+и процессор с ботом.
+"""
+import asyncio
+import hashlib
+import html
+import itertools
+import multiprocessing
+import os
+import signal
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+from urllib.parse import quote
+
+from aiohttp import web
+
+# Предзагруженные фильмы бенчмарка совпадают с первыми фильмами топа
+TOP_TITLE = "Top Film {}"
+
+
+@dataclass
+class FakeOptions:
+    kinopoisk_ms: float = 150
+    zona_ms: float = 300
+    telegram_ms: float = 40
+    video_mb: float = 8
+
+
+def film_slug(title: str) -> str:
+    return hashlib.md5(title.encode()).hexdigest()[:16]
+
+
+def film_id(title: str) -> int:
+    """Стабильный ID Kinopoisk по названию (вне диапазона топа)"""
+    return 10_000_000 + int(hashlib.md5(title.encode()).hexdigest()[:8], 16) % 10_000_000
+
+
+def _movie(movie_id: int, name: str) -> Dict[str, Any]:
+    return {
+        "id": movie_id,
+        "name": name,
+        "description": f"Описание фильма {name}. " * 8,
+        "year": 2000 + movie_id % 25,
+        "rating": {"kp": 7 + movie_id % 30 / 10},
+        "poster": {"url": f"https://example.invalid/{movie_id}.jpg"},
+        "genres": [{"name": "драма"}],
+        "countries": [{"name": "США"}],
+    }
+
+
+class FakeServices:
+    def __init__(self, options: FakeOptions, video_path: str):
+        self.options = options
+        self.video_path = video_path
+        self._names: Dict[int, str] = {}
+        self._message_ids = itertools.count(1)
+        self._file_ids = itertools.count(1)
+
+    def app(self) -> web.Application:
+        app = web.Application(client_max_size=1024 ** 3)
+        app.router.add_get("/kinopoisk/v1.4/movie/search", self.kinopoisk_search)
+        app.router.add_get("/kinopoisk/v1.4/movie/{movie_id:\\d+}", self.kinopoisk_details)
+        app.router.add_get("/kinopoisk/v1.4/movie", self.kinopoisk_top)
+        app.router.add_get("/zona/search/{query}", self.zona_search)
+        app.router.add_get("/zona/movies/{slug}", self.zona_film)
+        app.router.add_get("/video/{slug}.mp4", self.video)
+        app.router.add_post("/bot{token}/{method}", self.telegram)
+        return app
+
+    @staticmethod
+    async def _delay(ms: float) -> None:
+        if ms > 0:
+            await asyncio.sleep(ms / 1000)
+
+    # Kinopoisk
+
+    async def kinopoisk_search(self, request: web.Request) -> web.Response:
+        await self._delay(self.options.kinopoisk_ms)
+        query = request.query.get("query", "")
+        if query.startswith("Top Film "):
+            movie_id = int(query.rsplit(" ", 1)[1])
+        else:
+            movie_id = film_id(query)
+        self._names[movie_id] = query
+        return web.json_response({"docs": [_movie(movie_id, query)], "total": 1})
+
+    async def kinopoisk_details(self, request: web.Request) -> web.Response:
+        await self._delay(self.options.kinopoisk_ms)
+        movie_id = int(request.match_info["movie_id"])
+        name = self._names.get(movie_id, TOP_TITLE.format(movie_id))
+        return web.json_response(_movie(movie_id, name))
+
+    async def kinopoisk_top(self, request: web.Request) -> web.Response:
+        await self._delay(self.options.kinopoisk_ms)
+        page = int(request.query.get("page", 1))
+        limit = int(request.query.get("limit", 100))
+        first = (page - 1) * limit + 1
+        docs = [_movie(movie_id, TOP_TITLE.format(movie_id)) for movie_id in range(first, first + limit)]
+        return web.json_response({"docs": docs, "page": page, "limit": limit})
+
+    # zona.plus
+
+    async def zona_search(self, request: web.Request) -> web.Response:
+        await self._delay(self.options.zona_ms)
+        title = request.match_info["query"]
+        return web.Response(content_type="text/html", text=(
+            "<html><body><div class=\"results-wrap\">"
+            f"<a class=\"results-item\" href=\"/zona/movies/{quote(title, safe='')}\">{html.escape(title)}</a>"
+            "</div></body></html>"
+        ))
+
+    async def zona_film(self, request: web.Request) -> web.Response:
+        await self._delay(self.options.zona_ms)
+        title = request.match_info["slug"]
+        video = f"/video/{film_slug(title)}.mp4"
+        return web.Response(content_type="text/html", text=(
+            f"<html><body><h1>{html.escape(title)}</h1>"
+            "<video id=\"player\" preload=\"none\" muted></video>"
+            f"<button class=\"vjs-big-play-button\" data-video=\"{video}\" "
+            "onclick=\"var v = document.getElementById('player'); "
+            "v.src = this.dataset.video; v.play().catch(function () {});\">Play</button>"
+            "</body></html>"
+        ))
+
+    async def video(self, request: web.Request) -> web.StreamResponse:
+        return web.FileResponse(self.video_path, headers={"Content-Type": "video/mp4"})
+
+    # Telegram Bot API
+
+    async def telegram(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"].lower()
+        # Тело читается полностью - загрузка видео стоит как в жизни
+        form = await request.post()
+        await self._delay(self.options.telegram_ms)
+
+        if method == "getme":
+            result: Any = {"id": 1, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+        elif method in ("sendmessage", "editmessagetext", "sendvideo"):
+            result = self._message(form, method)
+        else:
+            # deleteMessage, sendChatAction и прочее
+            result = True
+        return web.json_response({"ok": True, "result": result})
+
+    def _message(self, form, method: str) -> Dict[str, Any]:
+        chat_id = int(form.get("chat_id", 0))
+        message: Dict[str, Any] = {
+            "message_id": int(form["message_id"]) if "message_id" in form else next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private" if chat_id > 0 else "channel"},
+        }
+        if method == "sendvideo":
+            video = form.get("video", "")
+            # Загруженный файл (attach://<поле формы>) получает новый file_id, пересылка - прежний
+            file_id = f"bench-file-{next(self._file_ids)}" if video.startswith("attach://") else video
+            message["video"] = {
+                "file_id": file_id, "file_unique_id": file_id,
+                "width": 1280, "height": 720, "duration": 5400
+            }
+            if "caption" in form:
+                message["caption"] = form["caption"]
+        else:
+            message["text"] = form.get("text", "")
+        return message
+
+
+def _create_video(size_mb: float) -> str:
+    fd, path = tempfile.mkstemp(prefix="bench_video_", suffix=".mp4")
+    chunk = os.urandom(1024 * 1024)
+    remaining = int(size_mb * 1024 * 1024)
+    with os.fdopen(fd, "wb") as f:
+        while remaining > 0:
+            f.write(chunk[:remaining])
+            remaining -= len(chunk)
+    return path
+
+
+def serve(options: FakeOptions, host: str, port_pipe) -> None:
+    """Точка входа процесса: отправляет порт в port_pipe и работает до завершения"""
+    video_path = _create_video(options.video_mb)
+
+    async def run() -> None:
+        runner = web.AppRunner(FakeServices(options, video_path).app(), access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, host, 0)
+        await site.start()
+        port_pipe.send(site._server.sockets[0].getsockname()[1])
+        port_pipe.close()
+
+        stop = asyncio.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            asyncio.get_running_loop().add_signal_handler(sig, stop.set)
+        await stop.wait()
+        await runner.cleanup()
+
+    try:
+        asyncio.run(run())
+    finally:
+        os.unlink(video_path)
+
+
+class FakeServicesProcess:
+    """Заменители в отдельном процессе; base_url известен после start()"""
+
+    def __init__(self, options: FakeOptions, host: str = "127.0.0.1"):
+        self.options = options
+        self.host = host
+        self.base_url: Optional[str] = None
+        self.process: Optional[multiprocessing.Process] = None
+
+    def start(self) -> str:
+        context = multiprocessing.get_context("spawn")
+        receiver, sender = context.Pipe(duplex=False)
+        self.process = context.Process(target=serve, args=(self.options, self.host, sender), daemon=True)
+        self.process.start()
+        sender.close()
+        if not receiver.poll(60):
+            self.stop()
+            raise RuntimeError("Fake services did not start")
+        self.base_url = f"http://{self.host}:{receiver.recv()}"
+        return self.base_url
+
+    def stop(self) -> None:
+        if self.process is not None and self.process.is_alive():
+            self.process.terminate()
+            self.process.join(10)
+        self.process = None
@@ -1,6 +1,7 @@
 import logging
 import os
 import tempfile
+import uuid
 from pathlib import Path
 from typing import Optional, Dict, Any
 
@@ -8,9 +9,11 @@ from aiogram import Bot
 from aiogram.types import FSInputFile
 
 from services.downloader import download_video
+from services.job_queue import stage_limits
+from services.metrics import STAGE_SECONDS
+from services.tracing import span
 from config import CHANNEL_ID
-from database.models import VideoCache
-from database.connection import get_db_session
+from database.hot_cache import get_film_by_url
 
 logger = logging.getLogger(__name__)
 
@@ -35,33 +38,36 @@ async def get_or_upload_video(
     """
     try:
         # Проверяем кеш по URL
-        async with get_db_session() as session:
-            cached = await VideoCache.get_by_url(session, video_url)
-            if cached and cached.file_id:
-                logger.info(f"Found cached file_id for URL: {video_url[:50]}...")
-                return cached.file_id
+        cached = await get_film_by_url(video_url)
+        if cached:
+            logger.info(f"Found cached file_id for URL: {video_url[:50]}...")
+            return cached.file_id
 
         # Если нет в кеше, загружаем
         logger.info(f"Uploading video to channel: {title}")
         
-        # Создаем временный файл
+        # Создаем временный файл (уникальный: загрузок может быть несколько одновременно)
         temp_dir = Path(tempfile.gettempdir())
-        temp_file = temp_dir / f"video_{os.getpid()}.mp4"
+        temp_file = temp_dir / f"video_{os.getpid()}_{uuid.uuid4().hex}.mp4"
         
         try:
             # Скачиваем видео
-            path = await download_video(video_url, str(temp_file))
+            async with stage_limits("download"):
+                with span("download"), STAGE_SECONDS.labels("download").time():
+                    path = await download_video(video_url, str(temp_file))
             
             # Загружаем в канал
             caption = f"🎬 {title}"
             if kinopoisk_data and kinopoisk_data.get('name'):
                 caption = f"🎬 {kinopoisk_data['name']}"
             
-            message = await bot.send_video(
-                chat_id=CHANNEL_ID,
-                video=FSInputFile(path),
-                caption=caption
-            )
+            async with stage_limits("upload"):
+                with span("upload"), STAGE_SECONDS.labels("upload").time():
+                    message = await bot.send_video(
+                        chat_id=CHANNEL_ID,
+                        video=FSInputFile(path),
+                        caption=caption
+                    )
             
             file_id = message.video.file_id
             logger.info(f"Successfully uploaded video, file_id: {file_id[:20]}...")
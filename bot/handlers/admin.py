@@ -0,0 +1,46 @@
+import logging
+import math
+
+from aiogram import Router, F
+from aiogram.types import Message
+from aiogram.filters import Command, CommandObject
+
+from bot.utils import escape_html
+from config import ADMIN_IDS, PROFILE_DEFAULT_SECONDS, PROFILE_MAX_SECONDS
+from services.profiling import profile_event_loop, ProfilerBusy
+
+router = Router()
+logger = logging.getLogger(__name__)
+
+# Команды только для ADMIN_IDS; у остальных сообщение уходит следующим роутерам
+router.message.filter(F.from_user.id.in_(ADMIN_IDS))
+
+
+@router.message(Command('profile'))
+async def profile_handler(message: Message, command: CommandObject):
+    """Обработчик команды /profile [секунд] - профиль цикла событий"""
+    try:
+        seconds = float(command.args) if command.args else PROFILE_DEFAULT_SECONDS
+    except ValueError:
+        seconds = math.nan
+    # float() принимает nan и inf: их clamp не исправит
+    if not math.isfinite(seconds):
+        await message.answer("❌ <b>Использование:</b> /profile секунд\nПример: /profile 30")
+        return
+    seconds = min(max(seconds, 1.0), PROFILE_MAX_SECONDS)
+
+    logger.info(f"Admin {message.from_user.id} requested a {seconds:.0f}s event loop profile")
+    await message.answer(f"⏱ Снимаю профиль цикла событий: {seconds:.0f} сек...")
+    try:
+        path, summary = await profile_event_loop(seconds)
+    except ProfilerBusy:
+        await message.answer("⏳ Профиль уже снимается, дождитесь его.")
+        return
+    except ValueError as e:
+        await message.answer(f"❌ Не удалось включить профилировщик: {escape_html(str(e))}")
+        return
+
+    await message.answer(
+        f"✅ Профиль сохранен: <code>{escape_html(str(path))}</code>\n\n"
+        f"<pre>{escape_html(summary[:3500])}</pre>"
+    )
@@ -0,0 +1,102 @@
+import logging
+from datetime import datetime
+from typing import Optional, Tuple
+
+from aiogram import Router
+from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup
+from aiogram.filters import Command
+
+from bot.keyboards import get_favorites_keyboard
+from bot.utils import escape_html
+from database.connection import LazySession
+from database.models import UserFavorite
+
+router = Router()
+logger = logging.getLogger(__name__)
+
+# Фильмов на одной странице списка
+PAGE_SIZE = 10
+
+# callback_data следующей страницы: favpage:<id>:<created_at> последней записи
+PAGE_PREFIX = "favpage:"
+
+
+def _page_data(favorite) -> str:
+    return f"{PAGE_PREFIX}{favorite.id}:{favorite.created_at.isoformat()}"
+
+
+def _parse_page(data: str) -> Tuple[datetime, int]:
+    favorite_id, created_at = data[len(PAGE_PREFIX):].split(":", 1)
+    return datetime.fromisoformat(created_at), int(favorite_id)
+
+
+async def render_favorites(
+    session: LazySession,
+    user_id: int,
+    after: Optional[Tuple[datetime, int]] = None
+) -> Tuple[str, Optional[InlineKeyboardMarkup]]:
+    """Текст и клавиатура страницы избранного"""
+    # Лишняя запись показывает, есть ли следующая страница
+    favorites = await UserFavorite.get_user_favorites(session, user_id, limit=PAGE_SIZE + 1, after=after)
+    has_more = len(favorites) > PAGE_SIZE
+    favorites = favorites[:PAGE_SIZE]
+
+    if not favorites:
+        if after is not None:
+            return "⭐ Больше фильмов в избранном нет.", None
+        return (
+            "⭐ В избранном пока пусто.\n\n"
+            "Добавляйте фильмы кнопкой «⭐ Добавить в избранное» под видео."
+        ), None
+
+    lines = ["⭐ <b>Избранное</b>\n"]
+    for favorite in favorites:
+        title = escape_html(favorite.title) if favorite.title else f"Фильм {favorite.kinopoisk_id}"
+        lines.append(f'• <a href="https://www.kinopoisk.ru/film/{favorite.kinopoisk_id}/">{title}</a>')
+
+    next_page = _page_data(favorites[-1]) if has_more else None
+    return "\n".join(lines), get_favorites_keyboard(favorites, next_page)
+
+
+@router.message(Command('favorites'))
+async def favorites_handler(message: Message, db_session: LazySession):
+    """Обработчик команды /favorites - список избранного"""
+    text, keyboard = await render_favorites(db_session, message.from_user.id)
+    await message.answer(text, reply_markup=keyboard, disable_web_page_preview=True)
+
+
+@router.callback_query(lambda c: c.data.startswith('favorite_'))
+async def favorite_handler(callback: CallbackQuery, db_session: LazySession):
+    """Обработчик добавления в избранное"""
+    kinopoisk_id = int(callback.data.removeprefix('favorite_'))
+    added = await UserFavorite.add_favorite(db_session, callback.from_user.id, kinopoisk_id)
+    if added:
+        await callback.answer("⭐ Добавлено в избранное!", show_alert=False)
+    else:
+        await callback.answer("⭐ Уже в избранном", show_alert=False)
+
+
+@router.callback_query(lambda c: c.data.startswith('unfavorite_'))
+async def unfavorite_handler(callback: CallbackQuery, db_session: LazySession):
+    """Обработчик удаления из избранного (кнопки в списке /favorites)"""
+    kinopoisk_id = int(callback.data.removeprefix('unfavorite_'))
+    removed = await UserFavorite.remove_favorite(db_session, callback.from_user.id, kinopoisk_id)
+    await callback.answer("🗑 Удалено из избранного" if removed else "Фильма уже нет в избранном")
+
+    # Перерисовываем список с первой страницы
+    text, keyboard = await render_favorites(db_session, callback.from_user.id)
+    try:
+        await callback.message.edit_text(text, reply_markup=keyboard, disable_web_page_preview=True)
+    except Exception as e:
+        logger.debug(f"Failed to update favorites list: {e}")
+
+
+@router.callback_query(lambda c: c.data.startswith(PAGE_PREFIX))
+async def favorites_page_handler(callback: CallbackQuery, db_session: LazySession):
+    """Обработчик кнопки следующей страницы избранного"""
+    text, keyboard = await render_favorites(db_session, callback.from_user.id, after=_parse_page(callback.data))
+    await callback.answer()
+    try:
+        await callback.message.edit_text(text, reply_markup=keyboard, disable_web_page_preview=True)
+    except Exception as e:
+        logger.debug(f"Failed to show favorites page: {e}")
@@ -1,22 +1,25 @@
+import asyncio
 import logging
+from typing import Optional
+
 from aiogram import Router, Bot
-from aiogram.types import Message, CallbackQuery
+from aiogram.types import Message
 from aiogram.filters import Command
 
-from services.zona_parser_service import get_video_url
-from services.kinopoisk_service import search_movie_kinopoisk
-from bot.file_storage import get_or_upload_video
+from bot.pipeline import FilmSearch, UploadFailed, QueueFull, queue_full_message, discard_cached
 from bot.keyboards import get_film_keyboard
 from bot.utils import escape_html
-from database.models import VideoCache
-from database.connection import get_db_session
+from database.connection import LazySession
 
 router = Router()
 logger = logging.getLogger(__name__)
 
 
-async def search_film(title: str, message: Message, bot: Bot):
-    """Вспомогательная функция для поиска фильма по названию"""
+async def search_film(title: str, message: Message, bot: Bot, db_session: Optional[LazySession] = None):
+    """
+    Вспомогательная функция для поиска фильма по названию.
+    db_session - сессия текущего апдейта из DatabaseMiddleware
+    """
     if not title:
         await message.answer(
             "❌ <b>Использование:</b> /film название фильма\n"
@@ -24,95 +27,83 @@ async def search_film(title: str, message: Message, bot: Bot):
         )
         return
 
-    # Показываем, что ищем
-    search_msg = await message.answer(f"🔍 Ищу: <b>{escape_html(title)}</b>...")
-
-    try:
-        # Проверяем кеш в БД
-        async with get_db_session() as session:
-            cached = await VideoCache.get_by_title(session, title)
-            if cached and cached.file_id:
-                logger.info(f"Found cached video for: {title}")
-                await search_msg.delete()
-                description = escape_html(cached.description) if cached.description else ""
+    # Метаданные Kinopoisk ищутся в фоне после промаха кеша, параллельно с поиском видео
+    async with FilmSearch(bot, title, message.from_user.id) as search:
+        # Проверяем кеш (память процесса, затем БД) - при попадании сразу отправляем видео
+        cached = await search.cached(db_session)
+        if cached:
+            logger.info(f"Found cached video for: {title}")
+            description = escape_html(cached.description) if cached.description else ""
+            try:
                 await message.answer_video(
                     video=cached.file_id,
                     caption=f"🎬 <b>{escape_html(cached.title)}</b>\n\n{description}",
                     reply_markup=get_film_keyboard(cached.kinopoisk_id)
                 )
                 return
+            except Exception as e:
+                # Устаревший file_id или сбой Telegram - ищем как при промахе
+                logger.warning(f"Failed to send cached video for '{title}', searching again: {e}")
+                await discard_cached(cached, e, db_session)
+
+        # Поиск и загрузка идут долго - не держим соединение с БД
+        if db_session is not None:
+            await db_session.release()
+
+        # Показываем, что ищем
+        search_msg = await message.answer(f"🔍 Ищу: <b>{escape_html(title)}</b>...")
 
-        # Ищем через Kinopoisk для получения метаданных
-        kinopoisk_data = None
         try:
-            kinopoisk_data = await search_movie_kinopoisk(title)
-            if kinopoisk_data:
-                logger.info(f"Found Kinopoisk data for: {title}")
-        except Exception as e:
-            logger.warning(f"Kinopoisk search failed: {e}")
+            # Ищем видео (одинаковые запросы разных пользователей объединяются)
+            async def on_status(status: str):
+                await search_msg.edit_text(f"🔍 Ищу: <b>{escape_html(title)}</b>...\n{status}")
+
+            try:
+                film = await search.fetch(on_status)
+            except UploadFailed:
+                await search_msg.edit_text("❌ Ошибка при загрузке видео. Попробуйте позже.")
+                return
+            except QueueFull as e:
+                await search_msg.edit_text(queue_full_message(e))
+                return
+            except asyncio.TimeoutError:
+                await search_msg.edit_text(
+                    f"⌛ Не успели найти <b>{escape_html(title)}</b>.\n"
+                    "Попробуйте позже - возможно, фильм уже будет в кеше."
+                )
+                return
+
+            if not film:
+                await search_msg.edit_text(
+                    f"❌ Фильм <b>{escape_html(title)}</b> не найден.\n"
+                    "Попробуйте другое название или используйте /random"
+                )
+                return
 
-        # Ищем видео через парсер
-        await search_msg.edit_text(f"🔍 Ищу: <b>{escape_html(title)}</b>...\n📥 Ищу видео...")
-        video_url = await get_video_url(title)
+            # Отправляем пользователю
+            await search_msg.delete()
+            caption = f"🎬 <b>{escape_html(film.title)}</b>"
+            if film.description:
+                description = escape_html(film.description[:500])
+                caption += f"\n\n{description}..."
+
+            await message.answer_video(
+                video=film.file_id,
+                caption=caption,
+                reply_markup=get_film_keyboard(film.kinopoisk_id)
+            )
 
-        if not video_url:
+        except Exception as e:
+            logger.error(f"Error in search_film: {e}", exc_info=True)
             await search_msg.edit_text(
-                f"❌ Фильм <b>{escape_html(title)}</b> не найден.\n"
-                "Попробуйте другое название или используйте /random"
-            )
-            return
-
-        # Загружаем в канал и получаем file_id
-        await search_msg.edit_text(f"🔍 Ищу: <b>{escape_html(title)}</b>...\n📤 Загружаю в хранилище...")
-        file_id = await get_or_upload_video(bot, video_url, title, kinopoisk_data)
-
-        if not file_id:
-            await search_msg.edit_text("❌ Ошибка при загрузке видео. Попробуйте позже.")
-            return
-
-        # Сохраняем в кеш
-        async with get_db_session() as session:
-            await VideoCache.create_or_update(
-                session,
-                title=title,
-                file_id=file_id,
-                video_url=video_url,
-                kinopoisk_id=kinopoisk_data.get('id') if kinopoisk_data else None,
-                description=kinopoisk_data.get('description') if kinopoisk_data else None
+                f"❌ Произошла ошибка при поиске фильма.\n"
+                f"Попробуйте позже или используйте другое название."
             )
-            await session.commit()
-
-        # Отправляем пользователю
-        await search_msg.delete()
-        film_name = kinopoisk_data.get('name', title) if kinopoisk_data else title
-        caption = f"🎬 <b>{escape_html(film_name)}</b>"
-        if kinopoisk_data and kinopoisk_data.get('description'):
-            description = escape_html(kinopoisk_data['description'][:500])
-            caption += f"\n\n{description}..."
-        
-        await message.answer_video(
-            video=file_id,
-            caption=caption,
-            reply_markup=get_film_keyboard(kinopoisk_data.get('id') if kinopoisk_data else None)
-        )
-
-    except Exception as e:
-        logger.error(f"Error in search_film: {e}", exc_info=True)
-        await search_msg.edit_text(
-            f"❌ Произошла ошибка при поиске фильма.\n"
-            f"Попробуйте позже или используйте другое название."
-        )
 
 
 @router.message(Command('film', 'search'))
-async def film_handler(message: Message, bot: Bot):
+async def film_handler(message: Message, bot: Bot, db_session: LazySession):
     """Обработчик команды /film и /search"""
     title = message.text.replace("/film", "").replace("/search", "").strip()
-    await search_film(title, message, bot)
-
+    await search_film(title, message, bot, db_session)
 
-@router.callback_query(lambda c: c.data.startswith('favorite_'))
-async def favorite_handler(callback: CallbackQuery):
-    """Обработчик добавления в избранное"""
-    # TODO: Реализовать добавление в избранное
-    await callback.answer("⭐ Добавлено в избранное!", show_alert=False)
@@ -15,6 +15,7 @@ async def help_handler(message: Message):
         "• /film название - найти фильм по названию\n"
         "• /search название - альтернативный поиск\n"
         "• /random - получить случайный фильм\n"
+        "• /favorites - избранные фильмы\n"
         "• /help - показать эту справку\n\n"
         "<b>Как использовать:</b>\n"
         "1. Отправьте команду /film с названием фильма\n"
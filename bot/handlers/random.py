@@ -1,15 +1,16 @@
 import logging
 import random
+from typing import Optional
+
 from aiogram import Router, Bot
 from aiogram.types import Message
 from aiogram.filters import Command
 
-from services.kinopoisk_service import get_random_movie
-from services.zona_parser_service import get_video_url
-from bot.file_storage import get_or_upload_video
+from services.random_pool import get_random_movie
+from bot.pipeline import fetch_film, UploadFailed, QueueFull, queue_full_message, discard_cached
 from bot.utils import escape_html
-from database.models import VideoCache
-from database.connection import get_db_session
+from database.connection import LazySession
+from database.hot_cache import get_film_by_title, get_film_by_kinopoisk_id
 
 router = Router()
 logger = logging.getLogger(__name__)
@@ -23,12 +24,12 @@ POPULAR_MOVIES = [
 
 
 @router.message(Command('random'))
-async def random_handler(message: Message, bot: Bot):
+async def random_handler(message: Message, bot: Bot, db_session: Optional[LazySession] = None):
     """Обработчик команды /random - случайный фильм"""
     await message.answer("🎲 Выбираю случайный фильм...")
 
     try:
-        # Пытаемся получить случайный фильм через Kinopoisk
+        # Берем случайный фильм из пула кандидатов Kinopoisk
         kinopoisk_data = None
         try:
             kinopoisk_data = await get_random_movie()
@@ -38,70 +39,78 @@ async def random_handler(message: Message, bot: Bot):
         except Exception as e:
             logger.warning(f"Kinopoisk random failed: {e}")
 
-        # Если Kinopoisk не сработал, используем fallback
+        # Если пул еще пуст, используем fallback
         if not kinopoisk_data:
             title = random.choice(POPULAR_MOVIES)
             logger.info(f"Using fallback random movie: {title}")
 
-        # Проверяем кеш
-        async with get_db_session() as session:
-            cached = await VideoCache.get_by_title(session, title)
-            if cached and cached.file_id:
-                logger.info(f"Found cached video for random: {title}")
-                description = escape_html(cached.description) if cached.description else ""
+        # Проверяем кеш (память процесса, затем БД)
+        cached = None
+        if kinopoisk_data and kinopoisk_data.get('id'):
+            cached = await get_film_by_kinopoisk_id(kinopoisk_data['id'], db_session)
+        if not cached:
+            cached = await get_film_by_title(title, db_session)
+        if cached:
+            logger.info(f"Found cached video for random: {title}")
+            description = escape_html(cached.description) if cached.description else ""
+            try:
                 await message.answer_video(
                     video=cached.file_id,
                     caption=f"🎲 <b>Случайный фильм:</b> {escape_html(title)}\n\n{description}"
                 )
                 return
+            except Exception as e:
+                # Устаревший file_id или сбой Telegram - ищем как при промахе
+                logger.warning(f"Failed to send cached video for random '{title}', searching again: {e}")
+                await discard_cached(cached, e, db_session)
+
+        # Поиск и загрузка идут долго - не держим соединение с БД
+        if db_session is not None:
+            await db_session.release()
 
-        # Ищем видео
+        # Ищем видео (одинаковые запросы разных пользователей объединяются)
         search_msg = await message.answer(f"🔍 Ищу: <b>{escape_html(title)}</b>...")
-        video_url = await get_video_url(title)
 
-        if not video_url:
-            # Пробуем другой фильм
-            title = random.choice([m for m in POPULAR_MOVIES if m != title])
-            await search_msg.edit_text(f"🔍 Ищу: <b>{escape_html(title)}</b>...")
-            video_url = await get_video_url(title)
+        async def on_status(status: str):
+            await search_msg.edit_text(f"🔍 Ищу: <b>{escape_html(title)}</b>...\n{status}")
 
-        if not video_url:
-            await search_msg.edit_text(
-                "❌ Не удалось найти случайный фильм.\n"
-                "Попробуйте использовать /film с конкретным названием."
+        try:
+            film = await fetch_film(
+                bot, title, kinopoisk_data,
+                search_metadata=False, on_status=on_status, user_id=message.from_user.id
             )
-            return
 
-        # Загружаем видео
-        await search_msg.edit_text(f"📤 Загружаю: <b>{escape_html(title)}</b>...")
-        file_id = await get_or_upload_video(bot, video_url, title, kinopoisk_data)
-
-        if not file_id:
+            if not film:
+                # Пробуем другой фильм
+                title = random.choice([m for m in POPULAR_MOVIES if m != title])
+                await search_msg.edit_text(f"🔍 Ищу: <b>{escape_html(title)}</b>...")
+                film = await fetch_film(
+                    bot, title,
+                    search_metadata=False, on_status=on_status, user_id=message.from_user.id
+                )
+        except UploadFailed:
             await search_msg.edit_text("❌ Ошибка при загрузке видео.")
             return
+        except QueueFull as e:
+            await search_msg.edit_text(queue_full_message(e))
+            return
 
-        # Сохраняем в кеш
-        async with get_db_session() as session:
-            await VideoCache.create_or_update(
-                session,
-                title=title,
-                file_id=file_id,
-                video_url=video_url,
-                kinopoisk_id=kinopoisk_data.get('id') if kinopoisk_data else None,
-                description=kinopoisk_data.get('description') if kinopoisk_data else None
+        if not film:
+            await search_msg.edit_text(
+                "❌ Не удалось найти случайный фильм.\n"
+                "Попробуйте использовать /film с конкретным названием."
             )
-            await session.commit()
+            return
 
         # Отправляем
         await search_msg.delete()
-        film_name = kinopoisk_data.get('name', title) if kinopoisk_data else title
-        caption = f"🎲 <b>Случайный фильм:</b> {escape_html(film_name)}"
-        if kinopoisk_data and kinopoisk_data.get('description'):
-            description = escape_html(kinopoisk_data['description'][:500])
+        caption = f"🎲 <b>Случайный фильм:</b> {escape_html(film.title)}"
+        if film.description:
+            description = escape_html(film.description[:500])
             caption += f"\n\n{description}..."
 
         await message.answer_video(
-            video=file_id,
+            video=film.file_id,
             caption=caption
         )
 
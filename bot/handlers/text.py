@@ -2,6 +2,7 @@ from aiogram import Router, Bot, F
 from aiogram.types import Message
 
 from bot.handlers import film, random, help
+from database.connection import LazySession
 
 router = Router()
 
@@ -16,11 +17,11 @@ async def find_film_button(message: Message):
 
 
 @router.message(F.text("🎲 Случайный фильм"))
-async def random_film_button(message: Message, bot: Bot):
+async def random_film_button(message: Message, bot: Bot, db_session: LazySession):
     """Обработчик кнопки 'Случайный фильм'"""
     # Импортируем обработчик напрямую
     from bot.handlers.random import random_handler
-    await random_handler(message, bot)
+    await random_handler(message, bot, db_session)
 
 
 @router.message(F.text("📖 Справка"))
@@ -32,7 +33,7 @@ async def help_button(message: Message):
 
 
 @router.message()
-async def text_handler(message: Message, bot: Bot):
+async def text_handler(message: Message, bot: Bot, db_session: LazySession):
     """Обработчик произвольного текста - пытаемся найти фильм"""
     if not message.text:
         return
@@ -52,5 +53,5 @@ async def text_handler(message: Message, bot: Bot):
     if len(text) > 2:
         # Вызываем функцию поиска напрямую
         from bot.handlers.film import search_film
-        await search_film(text, message, bot)
+        await search_film(text, message, bot, db_session)
 
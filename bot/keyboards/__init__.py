@@ -1,7 +1,7 @@
 from bot.keyboards.reply import get_main_keyboard
-from bot.keyboards.inline import get_film_keyboard
+from bot.keyboards.inline import get_film_keyboard, get_favorites_keyboard
 
-__all__ = ['get_main_keyboard', 'get_film_keyboard']
+__all__ = ['get_main_keyboard', 'get_film_keyboard', 'get_favorites_keyboard']
 
 
 
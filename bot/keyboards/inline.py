@@ -1,5 +1,5 @@
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-from typing import Optional
+from typing import Optional, Sequence
 
 
 def get_film_keyboard(kinopoisk_id: Optional[int] = None) -> Optional[InlineKeyboardMarkup]:
@@ -23,3 +23,25 @@ def get_film_keyboard(kinopoisk_id: Optional[int] = None) -> Optional[InlineKeyb
     ])
     return keyboard
 
+
+def get_favorites_keyboard(favorites: Sequence, next_page: Optional[str] = None) -> InlineKeyboardMarkup:
+    """
+    Создает inline-клавиатуру страницы избранного: кнопка удаления
+    для каждого фильма и кнопка следующей страницы
+    
+    Args:
+        favorites: Строки UserFavorite.get_user_favorites
+        next_page: callback_data следующей страницы или None
+    """
+    rows = [
+        [
+            InlineKeyboardButton(
+                text=f"❌ {(favorite.title or f'Фильм {favorite.kinopoisk_id}')[:40]}",
+                callback_data=f"unfavorite_{favorite.kinopoisk_id}"
+            )
+        ]
+        for favorite in favorites
+    ]
+    if next_page:
+        rows.append([InlineKeyboardButton(text="➡️ Дальше", callback_data=next_page)])
+    return InlineKeyboardMarkup(inline_keyboard=rows)
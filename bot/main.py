@@ -10,46 +10,91 @@ from aiogram.enums import ParseMode
 # Добавляем корневую директорию в путь для импортов
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from config import API_TOKEN
-from bot.handlers import start, film, help, random
+from config import API_TOKEN, BOT_TRANSPORT, METRICS_HOST, METRICS_PORT
+from bot.handlers import start, film, help, random, favorites, admin
 from bot.middlewares.database import DatabaseMiddleware
+from bot.middlewares.outbound import OutboundScheduler
+from bot.middlewares.tracing import TracingMiddleware
+from bot.webhook import run_webhook
 from database.connection import init_db
+from services.zona_parser_service import start_parser, stop_parser
+from services.http_client import start_http_client, close_http_client
+from services.kinopoisk_service import purge_expired_cache
+from services.resolved_urls import purge_expired_urls
+from services.random_pool import random_pool
+from services.metrics import OUTBOUND_PENDING, start_metrics_server, stop_metrics_server
+from services.logging_setup import setup_logging, stop_logging
 
 
 async def main():
-    # Настройка логирования
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
+    # Настройка логирования (запись в поток - вне цикла событий)
+    setup_logging()
     logger = logging.getLogger(__name__)
 
     # Инициализация БД
     await init_db()
+    await purge_expired_cache()
+    await purge_expired_urls()
     logger.info("Database initialized")
 
+    # Эндпоинт /metrics для Prometheus
+    await start_metrics_server(METRICS_HOST, METRICS_PORT)
+
+    # Общий HTTP-клиент для Kinopoisk и скачивания видео
+    await start_http_client()
+
+    # Запуск Chromium для парсера (один процесс на всё время работы бота)
+    await start_parser()
+
+    # Фоновое обновление пула кандидатов для /random
+    await random_pool.start()
+
     # Создание бота и диспетчера
     bot = Bot(
         token=API_TOKEN,
         default=DefaultBotProperties(parse_mode=ParseMode.HTML)
     )
+    # Лимиты Telegram, повтор после flood control, объединение правок статуса
+    outbound = OutboundScheduler()
+    bot.session.middleware(outbound)
+    OUTBOUND_PENDING.set_function(lambda: outbound.pending)
     dp = Dispatcher()
 
     # Регистрация middleware
+    dp.update.outer_middleware(TracingMiddleware())
     dp.message.middleware(DatabaseMiddleware())
+    dp.callback_query.middleware(DatabaseMiddleware())
 
     # Регистрация роутеров (порядок важен - более специфичные первыми)
     from bot.handlers import text
     dp.include_router(start.router)
     dp.include_router(film.router)
     dp.include_router(random.router)
+    dp.include_router(favorites.router)
     dp.include_router(help.router)
+    dp.include_router(admin.router)
     dp.include_router(text.router)  # Текстовые обработчики последними
 
-    # Удаление вебхука и запуск polling
-    await bot.delete_webhook(drop_pending_updates=True)
-    logger.info("Bot started")
-    await dp.start_polling(bot)
+    try:
+        if BOT_TRANSPORT == "webhook":
+            logger.info("Bot started (webhook)")
+            await run_webhook(bot, dp)
+        elif BOT_TRANSPORT == "polling":
+            # Удаление вебхука и запуск polling
+            await bot.delete_webhook(drop_pending_updates=True)
+            logger.info("Bot started (polling)")
+            await dp.start_polling(bot)
+        else:
+            raise ValueError(f"Unknown BOT_TRANSPORT: {BOT_TRANSPORT}")
+    finally:
+        await random_pool.stop()
+        await stop_parser()
+        await close_http_client()
+        await outbound.close()
+        await bot.session.close()
+        await stop_metrics_server()
+        logger.info("Bot stopped")
+        stop_logging()
 
 
 if __name__ == '__main__':
@@ -2,21 +2,29 @@ from typing import Callable, Dict, Any, Awaitable
 from aiogram import BaseMiddleware
 from aiogram.types import TelegramObject
 
-from database.connection import get_db_session
+from database.connection import LazySession
 
 
 class DatabaseMiddleware(BaseMiddleware):
-    """Middleware для предоставления сессии БД в обработчики"""
-    
+    """
+    Middleware для предоставления сессии БД в обработчики.
+
+    Сессия ленивая: соединение берется из пула только при первом
+    запросе к БД, а коммит выполняется только если были изменения.
+    """
+
     async def __call__(
         self,
         handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
         event: TelegramObject,
         data: Dict[str, Any]
     ) -> Any:
-        async with get_db_session() as session:
-            data['db_session'] = session
-            return await handler(event, data)
-
-
-
+        session = LazySession()
+        data['db_session'] = session
+        try:
+            result = await handler(event, data)
+        except BaseException:
+            await session.release(commit=False)
+            raise
+        await session.release()
+        return result
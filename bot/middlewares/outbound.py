@@ -0,0 +1,317 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import logging
+from typing import Any, Dict, Hashable, List, Optional, Set, Tuple
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import (
+    Response, TelegramMethod, DeleteMessage, SendChatAction,
+    EditMessageText, EditMessageCaption, EditMessageReplyMarkup
+)
+
+from config import (
+    OUTBOUND_GLOBAL_RATE, OUTBOUND_CHAT_RATE, OUTBOUND_CHAT_BURST,
+    OUTBOUND_GROUP_RATE_PER_MIN, OUTBOUND_MAX_RETRIES
+)
+
+logger = logging.getLogger(__name__)
+
+# Сначала доставка (сообщения, видео, удаление), затем косметика (статусы поиска)
+PRIORITY_DELIVERY = 0
+PRIORITY_STATUS = 1
+
+# Правки одного сообщения: в очереди остается только последняя
+COALESCED_METHODS = (EditMessageText, EditMessageCaption, EditMessageReplyMarkup)
+STATUS_METHODS = COALESCED_METHODS + (SendChatAction,)
+
+# Хранить лимиты чатов, пока их больше (заполненные корзины удаляются без потерь)
+MAX_IDLE_BUCKETS = 1000
+
+
+class TokenBucket:
+    """Корзина токенов: rate в секунду, не больше burst подряд"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.tokens = self.burst
+        self.updated = 0.0
+        self.paused_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        if now > self.updated:
+            start = max(self.updated, self.paused_until)
+            if now > start:
+                self.tokens = min(self.burst, self.tokens + (now - start) * self.rate)
+            self.updated = now
+
+    def delay(self, now: float) -> float:
+        """Через сколько секунд будет токен (0 - сейчас)"""
+        self._refill(now)
+        if now < self.paused_until:
+            return self.paused_until - now + max(0.0, 1 - self.tokens) / self.rate
+        return max(0.0, 1 - self.tokens) / self.rate
+
+    def take(self, now: float) -> None:
+        self._refill(now)
+        self.tokens -= 1
+
+    def pause(self, now: float, seconds: float) -> None:
+        """Flood control: ни одного запроса до now + seconds"""
+        self._refill(now)
+        self.paused_until = max(self.paused_until, now + seconds)
+        # После паузы - один запрос, дальше в обычном темпе
+        self.tokens = min(self.tokens, 1.0)
+
+    def is_full(self, now: float) -> bool:
+        self._refill(now)
+        return now >= self.paused_until and self.tokens >= self.burst
+
+
+class _Request:
+    """Запрос в очереди и вызовы, которые он заменил"""
+
+    __slots__ = ("bot", "method", "make_request", "priority", "seq", "key", "futures", "retries", "context")
+
+    def __init__(self, bot: Bot, method: TelegramMethod, make_request: NextRequestMiddlewareType,
+                 priority: int, seq: int, key: Optional[Hashable], future: asyncio.Future):
+        self.bot = bot
+        self.method = method
+        self.make_request = make_request
+        self.priority = priority
+        self.seq = seq
+        self.key = key
+        self.futures: List[asyncio.Future] = [future]
+        self.retries = 0
+        # Отправка выполняется в контексте (трассе) вызывающего
+        self.context = contextvars.copy_context()
+
+    @property
+    def abandoned(self) -> bool:
+        return all(future.done() for future in self.futures)
+
+    def resolve(self, result: Any = None, error: Optional[BaseException] = None) -> None:
+        for future in self.futures:
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def __lt__(self, other: '_Request') -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class OutboundScheduler(BaseRequestMiddleware):
+    """
+    Планировщик исходящих запросов к Telegram (middleware сессии бота).
+
+    Запросы с chat_id проходят через корзины токенов - общую и своего
+    чата (личные чаты и группы/каналы с разными лимитами). Из готовых
+    к отправке чатов первым уходит запрос с высшим приоритетом:
+    доставка раньше статусов. Новая правка сообщения заменяет еще
+    не отправленную: вызывающие получают результат последней правки.
+    Удаление сообщения отменяет его неотправленные правки.
+    TelegramRetryAfter приостанавливает чат на retry_after, и запрос
+    повторяется, а не возвращается как ошибка.
+    Остальные запросы (getUpdates, answerCallbackQuery) идут напрямую.
+    """
+
+    def __init__(
+        self,
+        global_rate: float = OUTBOUND_GLOBAL_RATE,
+        chat_rate: float = OUTBOUND_CHAT_RATE,
+        chat_burst: float = OUTBOUND_CHAT_BURST,
+        group_rate_per_min: float = OUTBOUND_GROUP_RATE_PER_MIN,
+        max_retries: int = OUTBOUND_MAX_RETRIES
+    ):
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_rate_per_min / 60
+        self.max_retries = max_retries
+        self._global = TokenBucket(global_rate, global_rate)
+        self._buckets: Dict[Hashable, TokenBucket] = {}
+        self._queues: Dict[Hashable, List[_Request]] = {}
+        self._coalesced: Dict[Hashable, _Request] = {}
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._in_flight: Set[asyncio.Task] = set()
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType,
+        bot: Bot,
+        method: TelegramMethod
+    ) -> Response:
+        chat_id = getattr(method, "chat_id", None)
+        if chat_id is None:
+            return await make_request(bot, method)
+
+        future = asyncio.get_running_loop().create_future()
+        self._submit(_Request(
+            bot, method, make_request,
+            priority=PRIORITY_STATUS if isinstance(method, STATUS_METHODS) else PRIORITY_DELIVERY,
+            seq=next(self._seq),
+            key=self._coalesce_key(chat_id, method),
+            future=future
+        ))
+        return await future
+
+    @property
+    def pending(self) -> int:
+        """Запросов в очереди"""
+        return sum(len(queue) for queue in self._queues.values())
+
+    async def close(self) -> None:
+        """Останавливает планировщик; неотправленные вызовы отменяются"""
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            await asyncio.gather(self._dispatcher, return_exceptions=True)
+            self._dispatcher = None
+        for queue in self._queues.values():
+            for request in queue:
+                for future in request.futures:
+                    future.cancel()
+        self._queues.clear()
+        self._coalesced.clear()
+        await asyncio.gather(*self._in_flight, return_exceptions=True)
+
+    @staticmethod
+    def _coalesce_key(chat_id: Any, method: TelegramMethod) -> Optional[Hashable]:
+        if isinstance(method, COALESCED_METHODS) and method.message_id is not None:
+            return type(method).__name__, chat_id, method.message_id
+        if isinstance(method, SendChatAction):
+            return "action", chat_id
+        return None
+
+    def _submit(self, request: _Request) -> None:
+        chat_id = request.method.chat_id
+        if request.key is not None:
+            previous = self._coalesced.get(request.key)
+            if previous is not None:
+                # Старая правка еще не ушла - отправим только новую
+                request.futures.extend(previous.futures)
+                previous.futures = []
+            self._coalesced[request.key] = request
+        elif isinstance(request.method, DeleteMessage):
+            self._drop_edits(chat_id, request.method.message_id)
+
+        heapq.heappush(self._queues.setdefault(chat_id, []), request)
+        if self._dispatcher is None or self._dispatcher.done():
+            # Общий цикл не принадлежит трассе обновления, создавшего его
+            self._dispatcher = asyncio.create_task(self._run(), context=contextvars.Context())
+        self._wakeup.set()
+
+    def _drop_edits(self, chat_id: Any, message_id: int) -> None:
+        """Правки удаляемого сообщения больше не нужны"""
+        for method in COALESCED_METHODS:
+            request = self._coalesced.pop((method.__name__, chat_id, message_id), None)
+            if request is not None:
+                request.resolve(True)
+
+    def _bucket(self, chat_id: Any) -> TokenBucket:
+        bucket = self._buckets.get(chat_id)
+        if bucket is None:
+            # Личные чаты - положительный ID; группы, каналы и @username - медленнее
+            if isinstance(chat_id, int) and chat_id > 0:
+                bucket = TokenBucket(self.chat_rate, self.chat_burst)
+            else:
+                bucket = TokenBucket(self.group_rate, self.chat_burst)
+            self._buckets[chat_id] = bucket
+        return bucket
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            now = loop.time()
+            chosen, wait = self._next_ready(now)
+            if chosen is None:
+                if len(self._buckets) > MAX_IDLE_BUCKETS:
+                    self._evict_buckets(now)
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            request = heapq.heappop(self._queues[chosen])
+            if not self._queues[chosen]:
+                del self._queues[chosen]
+            if request.key is not None and self._coalesced.get(request.key) is request:
+                del self._coalesced[request.key]
+
+            self._global.take(now)
+            self._bucket(chosen).take(now)
+            task = asyncio.create_task(self._execute(request), context=request.context)
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    def _next_ready(self, now: float) -> Tuple[Optional[Hashable], Optional[float]]:
+        """Чат с лучшим готовым запросом или время до ближайшей готовности"""
+        global_delay = self._global.delay(now)
+        best: Optional[_Request] = None
+        best_chat = None
+        wait: Optional[float] = None
+        for chat_id in list(self._queues):
+            queue = self._queues[chat_id]
+            # Замененные правки и отмененные вызовы пропускаем
+            while queue and queue[0].abandoned:
+                heapq.heappop(queue)
+            if not queue:
+                del self._queues[chat_id]
+                continue
+
+            delay = max(global_delay, self._bucket(chat_id).delay(now))
+            if delay > 0:
+                wait = delay if wait is None else min(wait, delay)
+            elif best is None or queue[0] < best:
+                best, best_chat = queue[0], chat_id
+        return best_chat, wait
+
+    def _evict_buckets(self, now: float) -> None:
+        for chat_id in [chat_id for chat_id, bucket in self._buckets.items()
+                        if chat_id not in self._queues and bucket.is_full(now)]:
+            del self._buckets[chat_id]
+
+    async def _execute(self, request: _Request) -> None:
+        chat_id = request.method.chat_id
+        try:
+            response = await request.make_request(request.bot, request.method)
+        except TelegramRetryAfter as e:
+            now = asyncio.get_running_loop().time()
+            self._bucket(chat_id).pause(now, e.retry_after)
+            logger.warning(f"Flood control for chat {chat_id}: retry in {e.retry_after}s "
+                           f"({type(request.method).__name__}, attempt {request.retries + 1})")
+            if request.retries < self.max_retries and not request.abandoned:
+                request.retries += 1
+                self._requeue(request)
+            else:
+                request.resolve(error=e)
+        except BaseException as e:
+            request.resolve(error=e)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+        else:
+            request.resolve(response)
+
+    def _requeue(self, request: _Request) -> None:
+        if request.key is not None:
+            newer = self._coalesced.get(request.key)
+            if newer is not None:
+                # Пока ждали, пришла более свежая правка - она и ответит всем
+                newer.futures.extend(request.futures)
+                return
+        self._submit_existing(request)
+
+    def _submit_existing(self, request: _Request) -> None:
+        if request.key is not None:
+            self._coalesced[request.key] = request
+        heapq.heappush(self._queues.setdefault(request.method.chat_id, []), request)
+        self._wakeup.set()
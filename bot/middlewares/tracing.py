@@ -0,0 +1,35 @@
+from typing import Callable, Dict, Any, Awaitable
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+from services.tracing import new_trace_id, set_trace_id, trace_id_var, span
+
+
+class TracingMiddleware(BaseMiddleware):
+    """
+    Внешний middleware обновлений: назначает обновлению ID трассы.
+
+    ID хранится в contextvars и доходит до сервисов, задач asyncio,
+    созданных обработчиком, и процессов парсера - по нему собираются
+    все записи лога одного запроса. Обработка обновления пишется
+    событием span "update".
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        token = set_trace_id(new_trace_id())
+        try:
+            fields: Dict[str, Any] = {}
+            if isinstance(event, Update):
+                fields["type"] = event.event_type
+            user = data.get("event_from_user")
+            if user is not None:
+                fields["user"] = user.id
+            with span("update", **fields):
+                return await handler(event, data)
+        finally:
+            trace_id_var.reset(token)
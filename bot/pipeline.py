@@ -0,0 +1,368 @@
+import asyncio
+import logging
+from typing import Optional, Dict, Any, NamedTuple, Callable, Awaitable, Hashable, TypeVar
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest
+
+from services.zona_parser_service import get_video_url
+from services.kinopoisk_service import search_movie_kinopoisk
+from services.resolved_urls import get_resolved_url, remember_resolved_url
+from services.normalize import normalize_title
+from services.singleflight import SingleFlight
+from services.job_queue import job_queue, stage_limits, QueueFull
+from services.metrics import STAGE_SECONDS, STAGE_FAILURES
+from services.tracing import span, record_span
+from bot.file_storage import get_or_upload_video
+from config import (
+    SEARCH_DEADLINE, METADATA_BUDGET, CACHE_LOOKUP_BUDGET, PARSER_DEADLINE, RESOLVED_URL_CHECK_TIMEOUT
+)
+from database.models import VideoCache
+from database.connection import get_db_session, LazySession
+from database.hot_cache import CachedFilm, film_cache, get_film_by_title
+
+logger = logging.getLogger(__name__)
+
+StatusCallback = Callable[[str], Awaitable[Any]]
+T = TypeVar("T")
+
+
+class FilmResult(NamedTuple):
+    """Фильм, готовый к отправке пользователю"""
+    file_id: str
+    title: str
+    description: Optional[str]
+    kinopoisk_id: Optional[int]
+
+
+class UploadFailed(Exception):
+    """Видео найдено, но не удалось загрузить его в хранилище"""
+
+
+def queue_full_message(error: QueueFull) -> str:
+    """Сообщение пользователю, когда загрузка не принята в очередь"""
+    if error.per_user:
+        return "⏳ Ваши фильмы уже загружаются. Дождитесь их и попробуйте снова."
+    return "😔 Сейчас очень много запросов. Попробуйте через пару минут."
+
+
+class Budget:
+    """Общий дедлайн запроса, из остатка которого этапы берут свою долю"""
+
+    def __init__(self, total: float):
+        self.deadline = asyncio.get_running_loop().time() + total
+
+    def remaining(self) -> float:
+        return max(0.0, self.deadline - asyncio.get_running_loop().time())
+
+    def share(self, limit: float) -> float:
+        """Время этапа: его собственный лимит, но не больше остатка"""
+        return min(limit, self.remaining())
+
+
+async def optional_stage(stage: str, aw: Awaitable[T], timeout: float) -> Optional[T]:
+    """
+    Необязательный этап: по таймауту или ошибке возвращает None
+    вместо того, чтобы задерживать или ронять ответ
+    """
+    try:
+        with span(stage), STAGE_SECONDS.labels(stage).time():
+            return await asyncio.wait_for(aw, timeout)
+    except asyncio.TimeoutError:
+        logger.warning(f"Stage '{stage}' exceeded its {timeout:.1f}s budget, continuing without it")
+    except Exception as e:
+        logger.warning(f"Stage '{stage}' failed, continuing without it: {e}")
+    STAGE_FAILURES.labels(stage).inc()
+    return None
+
+
+async def _join_metadata(metadata: "asyncio.Future[Optional[Dict[str, Any]]]", timeout: float) -> Optional[Dict[str, Any]]:
+    """
+    Дожидается метаданных, запущенных обработчиком. Если обработчик
+    отменил их (ушел), загрузка для остальных продолжается без метаданных.
+    """
+    try:
+        return await asyncio.wait_for(asyncio.shield(metadata), timeout)
+    except asyncio.TimeoutError:
+        return None
+    except asyncio.CancelledError:
+        if metadata.cancelled() and not asyncio.current_task().cancelling():
+            return None
+        raise
+
+
+class FilmSearch:
+    """
+    Оркестратор поиска фильма для одного запроса пользователя.
+
+    Метаданные Kinopoisk ищутся в фоне после промаха кеша, параллельно
+    с поиском видео: они нужны только для подписи и сохранения.
+    При попадании в кеш их не ищем вовсе.
+    Весь запрос ограничен общим дедлайном, этапы получают свою долю.
+
+    Использование:
+        async with FilmSearch(bot, title, user_id) as search:
+            cached = await search.cached(db_session)
+            if not cached:
+                film = await search.fetch(on_status)
+    """
+
+    def __init__(self, bot: Bot, title: str, user_id: Optional[Hashable] = None, deadline: float = SEARCH_DEADLINE):
+        self.bot = bot
+        self.title = title
+        self.user_id = user_id
+        self.deadline = deadline
+        self.budget: Optional[Budget] = None
+        self._group: Optional[asyncio.TaskGroup] = None
+        self._metadata: Optional[asyncio.Task] = None
+
+    async def __aenter__(self) -> 'FilmSearch':
+        self.budget = Budget(self.deadline)
+        self._group = asyncio.TaskGroup()
+        await self._group.__aenter__()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        # Ответ уже отправлен - недоделанные необязательные этапы не нужны.
+        # Исключение из тела не передаем в TaskGroup, чтобы оно дошло
+        # до обработчика как есть, а не внутри ExceptionGroup
+        if self._metadata is not None:
+            self._metadata.cancel()
+        await self._group.__aexit__(None, None, None)
+
+    def _start_metadata(self) -> asyncio.Task:
+        if self._metadata is None:
+            self._metadata = self._group.create_task(
+                optional_stage("metadata", search_movie_kinopoisk(self.title), self.budget.share(METADATA_BUDGET))
+            )
+        return self._metadata
+
+    async def cached(self, session: Optional[LazySession] = None) -> Optional[CachedFilm]:
+        """Проверка кеша file_id; при промахе запускает поиск метаданных"""
+        film = await optional_stage(
+            "cache", get_film_by_title(self.title, session), self.budget.share(CACHE_LOOKUP_BUDGET)
+        )
+        if film is None:
+            self._start_metadata()
+        return film
+
+    async def fetch(self, on_status: Optional[StatusCallback] = None) -> Optional[FilmResult]:
+        """
+        Поиск видео и загрузка (см. fetch_film) в пределах остатка дедлайна
+
+        Raises:
+            asyncio.TimeoutError: общий дедлайн запроса истек
+        """
+        return await asyncio.wait_for(
+            fetch_film(
+                self.bot, self.title,
+                on_status=on_status,
+                user_id=self.user_id,
+                metadata=self._start_metadata(),
+                budget=self.budget
+            ),
+            self.budget.remaining()
+        )
+
+
+async def discard_cached(film: CachedFilm, error: Exception, session: Optional[LazySession] = None) -> None:
+    """
+    Кешированное видео не удалось отправить: запись убирается из памяти,
+    а если Telegram отклонил сам file_id (TelegramBadRequest), file_id
+    стирается и в БД - следующий поиск загрузит видео заново
+    """
+    film_cache.invalidate(film.id)
+    if not isinstance(error, TelegramBadRequest):
+        return
+    try:
+        if session is not None:
+            await VideoCache.forget_file_id(session, film.id)
+            await session.release()
+        else:
+            async with get_db_session() as db_session:
+                await VideoCache.forget_file_id(db_session, film.id)
+    except Exception as e:
+        logger.warning(f"Failed to forget file_id of cached video {film.id}: {e}")
+
+
+class StatusUpdates:
+    """
+    Статусы поиска одного запроса: отправляются по очереди в фоне,
+    поиск не ждет, пока Telegram примет правку. Пока правка идет,
+    новые статусы заменяют друг друга - уходит только последний.
+    После close() статусы больше не отправляются.
+    """
+
+    def __init__(self, on_status: Optional[StatusCallback]):
+        self.on_status = on_status
+        self._latest: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+
+    async def __call__(self, text: str) -> None:
+        if self.on_status is None or self._closed:
+            return
+        self._latest = text
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._send())
+
+    async def _send(self) -> None:
+        while self._latest is not None and not self._closed:
+            text, self._latest = self._latest, None
+            try:
+                await self.on_status(text)
+            except Exception as e:
+                logger.debug(f"Failed to update search status: {e}")
+
+    async def close(self) -> None:
+        """Отбрасывает неотправленный статус и дожидается начатой правки"""
+        self._closed = True
+        self._latest = None
+        if self._task is not None:
+            await asyncio.gather(self._task, return_exceptions=True)
+
+
+# Одинаковые конкурентные поиски выполняются один раз
+film_flight = SingleFlight()
+
+
+def film_key(title: str, kinopoisk_id: Optional[int] = None) -> str:
+    """Ключ объединения запросов: ID Kinopoisk или нормализованное название"""
+    if kinopoisk_id:
+        return f"kp:{kinopoisk_id}"
+    return f"title:{normalize_title(title)}"
+
+
+async def fetch_film(
+    bot: Bot,
+    title: str,
+    kinopoisk_data: Optional[Dict[str, Any]] = None,
+    search_metadata: bool = True,
+    on_status: Optional[StatusCallback] = None,
+    user_id: Optional[Hashable] = None,
+    metadata: Optional["asyncio.Future[Optional[Dict[str, Any]]]"] = None,
+    budget: Optional[Budget] = None
+) -> Optional[FilmResult]:
+    """
+    Находит видео, загружает его в канал и сохраняет в кеш.
+
+    Одновременные запросы одного фильма объединяются: поиск, скачивание
+    и загрузка выполняются один раз, а file_id получают все участники.
+    Загрузка ждет своей очереди в job_queue (справедливо между
+    пользователями), этапы ограничены stage_limits.
+
+    Args:
+        bot: Экземпляр бота
+        title: Название фильма
+        kinopoisk_data: Уже известные данные из Kinopoisk
+        search_metadata: Искать метаданные в Kinopoisk, если их нет
+        on_status: Колбэк для обновления статуса поиска (только у лидера)
+        user_id: Пользователь, от имени которого задача стоит в очереди
+        metadata: Уже запущенный поиск метаданных (из FilmSearch)
+        budget: Дедлайн запроса; по умолчанию SEARCH_DEADLINE с текущего момента
+
+    Returns:
+        FilmResult или None если видео не найдено
+
+    Raises:
+        UploadFailed: если не удалось загрузить видео в хранилище
+        QueueFull: очередь загрузок переполнена
+    """
+    # Статус - косметика: загрузка не ждет, пока Telegram примет правку
+    # (исходящие правки ограничены лимитами и могут ждать flood control)
+    status = StatusUpdates(on_status)
+
+    async def queued() -> Optional[FilmResult]:
+        async def on_position(position: int) -> None:
+            await status(f"⏳ Место в очереди: {position}")
+
+        waiting_since = asyncio.get_running_loop().time()
+        async with job_queue.slot(user_id, on_position):
+            record_span("queue", asyncio.get_running_loop().time() - waiting_since)
+            return await _fetch_film(
+                bot, title, kinopoisk_data, search_metadata, status,
+                metadata, budget or Budget(SEARCH_DEADLINE)
+            )
+
+    key = film_key(title, kinopoisk_data.get('id') if kinopoisk_data else None)
+    try:
+        return await film_flight.do(key, queued)
+    finally:
+        # Дальше обработчик правит или удаляет сообщение со статусом -
+        # старый статус не должен прийти после этого
+        await status.close()
+
+
+async def _fetch_film(
+    bot: Bot,
+    title: str,
+    kinopoisk_data: Optional[Dict[str, Any]],
+    search_metadata: bool,
+    status: StatusCallback,
+    metadata: Optional["asyncio.Future[Optional[Dict[str, Any]]]"],
+    budget: Budget
+) -> Optional[FilmResult]:
+    async with asyncio.TaskGroup() as group:
+        # Метаданные Kinopoisk нужны только для подписи и сохранения -
+        # ищем их параллельно с видео
+        if kinopoisk_data is not None:
+            metadata = None
+        elif metadata is not None:
+            metadata = group.create_task(_join_metadata(metadata, budget.remaining()))
+        elif search_metadata:
+            metadata = group.create_task(
+                optional_stage("metadata", search_movie_kinopoisk(title), budget.share(METADATA_BUDGET))
+            )
+
+        # Ищем видео: сначала ранее найденный URL (если еще отвечает), затем парсер
+        await status("📥 Ищу видео...")
+        known_id = kinopoisk_data.get('id') if kinopoisk_data else None
+        with span("resolve") as resolve_span:
+            video_url = await get_resolved_url(title, known_id, budget.share(RESOLVED_URL_CHECK_TIMEOUT))
+            resolved_now = video_url is None
+            if resolved_now:
+                async with stage_limits("resolve"):
+                    with STAGE_SECONDS.labels("resolve").time():
+                        video_url = await get_video_url(title, budget.share(PARSER_DEADLINE))
+            resolve_span.fields.update(source="parser" if resolved_now else "cache", found=bool(video_url))
+        if not video_url:
+            if metadata is not None:
+                metadata.cancel()
+            return None
+
+        if metadata is not None:
+            kinopoisk_data = await metadata
+            if kinopoisk_data:
+                logger.info(f"Found Kinopoisk data for: {title}")
+
+    kinopoisk_id = kinopoisk_data.get('id') if kinopoisk_data else None
+    if resolved_now:
+        await remember_resolved_url(title, video_url, kinopoisk_id)
+
+    # Загружаем в канал и получаем file_id
+    await status("📤 Загружаю в хранилище...")
+    file_id = await get_or_upload_video(bot, video_url, title, kinopoisk_data)
+    if not file_id:
+        raise UploadFailed(title)
+
+    description = kinopoisk_data.get('description') if kinopoisk_data else None
+
+    # Сохраняем в кеш
+    async with get_db_session() as session:
+        await VideoCache.create_or_update(
+            session,
+            title=title,
+            file_id=file_id,
+            video_url=video_url,
+            kinopoisk_id=kinopoisk_id,
+            description=description
+        )
+        await session.commit()
+
+    film_name = kinopoisk_data.get('name') or title if kinopoisk_data else title
+    return FilmResult(
+        file_id=file_id,
+        title=film_name,
+        description=description,
+        kinopoisk_id=kinopoisk_id
+    )
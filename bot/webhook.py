@@ -0,0 +1,144 @@
+import asyncio
+import logging
+import secrets
+import signal
+from typing import Any, Dict
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler
+
+from config import (
+    WEBHOOK_BASE_URL, WEBHOOK_PATH, WEBHOOK_SECRET, WEBHOOK_HOST, WEBHOOK_PORT,
+    WEBHOOK_MAX_CONCURRENCY, WEBHOOK_MAX_PENDING, WEBHOOK_MAX_CONNECTIONS, WEBHOOK_DRAIN_TIMEOUT
+)
+
+logger = logging.getLogger(__name__)
+
+
+class BoundedRequestHandler(SimpleRequestHandler):
+    """
+    Прием обновлений от Telegram с ограниченной обработкой.
+
+    Обновление подтверждается сразу и обрабатывается в фоне, но
+    одновременно работают не больше max_concurrency обработчиков.
+    Если принятых и еще не обработанных обновлений больше max_pending,
+    запрос отклоняется с 503 - Telegram доставит его повторно.
+    При остановке новые обновления не принимаются, а принятые
+    дорабатываются в пределах drain_timeout.
+    """
+
+    def __init__(
+        self,
+        dispatcher: Dispatcher,
+        bot: Bot,
+        secret_token: str,
+        max_concurrency: int = WEBHOOK_MAX_CONCURRENCY,
+        max_pending: int = WEBHOOK_MAX_PENDING,
+        drain_timeout: float = WEBHOOK_DRAIN_TIMEOUT,
+        **data: Any
+    ):
+        super().__init__(dispatcher, bot, handle_in_background=True, secret_token=secret_token, **data)
+        self.max_pending = max_pending
+        self.drain_timeout = drain_timeout
+        self._semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        self._accepting = True
+
+    @property
+    def pending(self) -> int:
+        """Принятые обновления, обработка которых не закончилась"""
+        return len(self._background_feed_update_tasks)
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if not self.verify_secret(request.headers.get("X-Telegram-Bot-Api-Secret-Token", ""), self.bot):
+            return web.Response(body="Unauthorized", status=401)
+        if not self._accepting or self.pending >= self.max_pending:
+            return web.Response(body="Overloaded", status=503, headers={"Retry-After": "1"})
+        return await self._handle_request_background(bot=self.bot, request=request)
+
+    __call__ = handle
+
+    async def _background_feed_update(self, bot: Bot, update: Dict[str, Any]) -> None:
+        async with self._semaphore:
+            try:
+                await super()._background_feed_update(bot, update)
+            except Exception as e:
+                logger.error(f"Failed to process update {update.get('update_id')}: {e}", exc_info=True)
+
+    async def close(self) -> None:
+        """Дожидается принятых обновлений (сессию бота закрывает main)"""
+        self._accepting = False
+        tasks = set(self._background_feed_update_tasks)
+        if not tasks:
+            return
+
+        logger.info(f"Draining {len(tasks)} webhook updates")
+        _, pending = await asyncio.wait(tasks, timeout=self.drain_timeout)
+        if pending:
+            logger.warning(f"Cancelling {len(pending)} updates still running after {self.drain_timeout:.0f}s")
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+
+def create_webhook_app(
+    dispatcher: Dispatcher,
+    bot: Bot,
+    secret_token: str,
+    path: str = WEBHOOK_PATH,
+    **handler_options: Any
+) -> web.Application:
+    """aiohttp-приложение с обработчиком обновлений на path"""
+    app = web.Application()
+    BoundedRequestHandler(dispatcher, bot, secret_token, **handler_options).register(app, path=path)
+    return app
+
+
+async def run_webhook(bot: Bot, dispatcher: Dispatcher) -> None:
+    """Принимает обновления через вебхук до SIGINT/SIGTERM"""
+    secret_token = WEBHOOK_SECRET
+    if not secret_token:
+        if not WEBHOOK_BASE_URL:
+            # Вебхук регистрируют вручную - случайный секрет туда не попадет,
+            # и Telegram получал бы 401 на каждое обновление
+            raise ValueError("WEBHOOK_SECRET is required when WEBHOOK_BASE_URL is not set")
+        # Подходит для одного процесса; при нескольких нужен общий WEBHOOK_SECRET
+        secret_token = secrets.token_urlsafe(32)
+        logger.warning("WEBHOOK_SECRET is not set, using a random secret for this run")
+
+    app = create_webhook_app(dispatcher, bot, secret_token)
+    runner = web.AppRunner(app)
+    await runner.setup()
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            # Windows: остановка через Ctrl+C (KeyboardInterrupt)
+            pass
+
+    try:
+        await dispatcher.emit_startup(bot=bot, dispatcher=dispatcher, bots=[bot])
+        await web.TCPSite(runner, WEBHOOK_HOST, WEBHOOK_PORT).start()
+        logger.info(f"Webhook server listening on {WEBHOOK_HOST}:{WEBHOOK_PORT}{WEBHOOK_PATH}")
+
+        if WEBHOOK_BASE_URL:
+            await bot.set_webhook(
+                url=WEBHOOK_BASE_URL.rstrip("/") + WEBHOOK_PATH,
+                secret_token=secret_token,
+                max_connections=WEBHOOK_MAX_CONNECTIONS,
+                allowed_updates=dispatcher.resolve_used_update_types()
+            )
+            logger.info(f"Webhook registered at {WEBHOOK_BASE_URL}")
+        else:
+            logger.warning("WEBHOOK_BASE_URL is not set, webhook must be registered externally")
+
+        await stop.wait()
+        logger.info("Stopping webhook server")
+    finally:
+        # Сначала закрывается порт, затем дорабатываются принятые обновления.
+        # Вебхук не удаляем: Telegram придержит обновления до перезапуска
+        await runner.cleanup()
+        await dispatcher.emit_shutdown(bot=bot, dispatcher=dispatcher, bots=[bot])
@@ -10,6 +10,119 @@ CHANNEL_ID = os.getenv("CHANNEL_ID", "-1002084549848")
 
 # Kinopoisk токен (опционально)
 KINOPOISK_TOKEN = os.getenv("KINOPOISK_TOKEN", "SGFTDVY-RFPM0J2-Q454BH7-EHDSWC0")
+KINOPOISK_API_URL = os.getenv("KINOPOISK_API_URL", "https://api.kinopoisk.dev/v1.4")  # Неофициальный API kinopoisk.dev
 
 # Для обратной совместимости
 kinopoisk_token = KINOPOISK_TOKEN
+
+# Логи: уровень и формат (text или json - одна запись на строку с trace_id и полями этапов)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+
+# Администраторы бота: ID пользователей Telegram через запятую (/profile)
+ADMIN_IDS = {int(user_id) for user_id in os.getenv("ADMIN_IDS", "").split(",") if user_id.strip()}
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")  # Куда сохранять профили цикла событий
+PROFILE_DEFAULT_SECONDS = float(os.getenv("PROFILE_DEFAULT_SECONDS", "30"))  # /profile без аргумента, сек
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "300"))  # Самый длинный профиль, сек
+
+# Метрики Prometheus (GET /metrics); 0 - выключены
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))
+
+# Получение обновлений: polling (по умолчанию) или webhook
+BOT_TRANSPORT = os.getenv("BOT_TRANSPORT", "polling")
+WEBHOOK_BASE_URL = os.getenv("WEBHOOK_BASE_URL", "")  # Публичный https-адрес; пусто - вебхук регистрируется вручную
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")  # Заголовок X-Telegram-Bot-Api-Secret-Token; пусто - случайный (только с WEBHOOK_BASE_URL)
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+WEBHOOK_MAX_CONCURRENCY = int(os.getenv("WEBHOOK_MAX_CONCURRENCY", "64"))  # Одновременно обрабатываемых обновлений
+WEBHOOK_MAX_PENDING = int(os.getenv("WEBHOOK_MAX_PENDING", "1000"))  # Принятых и не обработанных; больше - 503
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "40"))  # Соединений Telegram к вебхуку (1-100)
+WEBHOOK_DRAIN_TIMEOUT = float(os.getenv("WEBHOOK_DRAIN_TIMEOUT", "30"))  # Доработка принятых обновлений при остановке, сек
+
+# Исходящие запросы к Telegram (лимиты Bot API: ~30 сообщений/с всего, ~1/с в чат, 20/мин в группу)
+OUTBOUND_GLOBAL_RATE = float(os.getenv("OUTBOUND_GLOBAL_RATE", "30"))  # Запросов в секунду на всех
+OUTBOUND_CHAT_RATE = float(os.getenv("OUTBOUND_CHAT_RATE", "1"))  # Запросов в секунду в личный чат
+OUTBOUND_CHAT_BURST = float(os.getenv("OUTBOUND_CHAT_BURST", "3"))  # Запросов подряд в один чат без ожидания
+OUTBOUND_GROUP_RATE_PER_MIN = float(os.getenv("OUTBOUND_GROUP_RATE_PER_MIN", "20"))  # Запросов в минуту в группу/канал
+OUTBOUND_MAX_RETRIES = int(os.getenv("OUTBOUND_MAX_RETRIES", "3"))  # Повторов после TelegramRetryAfter
+
+# Парсер zona.plus: пул браузера Playwright
+ZONA_BASE_URL = os.getenv("ZONA_BASE_URL", "https://w140.zona.plus")
+PARSER_HEADLESS = os.getenv("PARSER_HEADLESS", "1") != "0"
+PARSER_POOL_SIZE = int(os.getenv("PARSER_POOL_SIZE", "2"))  # Число контекстов/страниц (без процессов парсера)
+PARSER_MAX_USES = int(os.getenv("PARSER_MAX_USES", "50"))  # Пересоздавать контекст после K поисков
+PARSER_DEADLINE = float(os.getenv("PARSER_DEADLINE", "45"))  # Общий дедлайн поиска видео, сек
+PARSER_NAVIGATION_TIMEOUT = float(os.getenv("PARSER_NAVIGATION_TIMEOUT", "20"))  # Загрузка страниц, сек
+PARSER_RESULTS_TIMEOUT = float(os.getenv("PARSER_RESULTS_TIMEOUT", "15"))  # Ожидание результатов поиска, сек
+PARSER_PLAY_TIMEOUT = float(os.getenv("PARSER_PLAY_TIMEOUT", "10"))  # Ожидание кнопки Play, сек
+PARSER_VIDEO_TIMEOUT = float(os.getenv("PARSER_VIDEO_TIMEOUT", "15"))  # Ожидание .mp4 после Play, сек
+# Процессы парсера: браузер и разбор страниц вне цикла событий бота
+PARSER_WORKERS = int(os.getenv("PARSER_WORKERS", str(PARSER_POOL_SIZE)))  # Процессов (по одному поиску в каждом), 0 - в процессе бота
+PARSER_JOB_TIMEOUT = float(os.getenv("PARSER_JOB_TIMEOUT", str(PARSER_DEADLINE + 30)))  # Жесткий лимит поиска в процессе, сек
+PARSER_WORKER_MAX_RSS_MB = int(os.getenv("PARSER_WORKER_MAX_RSS_MB", "1500"))  # Память процесса вместе с Chromium, МБ
+# Перехват запросов браузера: списки через запятую, пустая строка - не блокировать
+PARSER_BLOCK_TYPES = os.getenv("PARSER_BLOCK_TYPES", "image,font,ping")  # Типы ресурсов Playwright; stylesheet не блокируем: парсер ждет видимых .results-wrap и кнопки Play
+PARSER_BLOCK_DOMAINS = os.getenv(
+    "PARSER_BLOCK_DOMAINS",
+    "google-analytics.com,googletagmanager.com,doubleclick.net,googlesyndication.com,"
+    "adservice.google.com,mc.yandex.ru,mc.yandex.com,an.yandex.ru,"
+    "top-fwz1.mail.ru,counter.yadro.ru,adfox.ru,adriver.ru,mediametrics.ru,facebook.net"
+)  # Аналитика и реклама
+PARSER_ALLOW_DOMAINS = os.getenv("PARSER_ALLOW_DOMAINS", "")  # Всегда пропускать (например, CDN плеера)
+
+# Кеш найденных URL видео (повторный запрос без поиска в браузере)
+RESOLVED_URL_TTL = int(os.getenv("RESOLVED_URL_TTL", str(6 * 3600)))  # Срок жизни записи, сек (ссылки CDN подписаны и истекают)
+RESOLVED_URL_CHECK_TIMEOUT = float(os.getenv("RESOLVED_URL_CHECK_TIMEOUT", "5"))  # Проверка, что ссылка еще отвечает, сек
+
+# Скачивание видео
+MAX_VIDEO_SIZE = int(os.getenv("MAX_VIDEO_SIZE", str(2 * 1024 * 1024 * 1024)))  # 2GB
+DOWNLOAD_CHUNK_SIZE = int(os.getenv("DOWNLOAD_CHUNK_SIZE", str(1024 * 1024)))  # Размер блока записи на диск
+DOWNLOAD_BUFFERS = int(os.getenv("DOWNLOAD_BUFFERS", "4"))  # Буферов в пуле на одно скачивание
+DOWNLOAD_SEGMENTS = int(os.getenv("DOWNLOAD_SEGMENTS", "4"))  # Параллельных соединений (1 - отключить)
+DOWNLOAD_SEGMENT_MIN_SIZE = int(os.getenv("DOWNLOAD_SEGMENT_MIN_SIZE", str(16 * 1024 * 1024)))  # Мельче - одним потоком
+DOWNLOAD_SEGMENT_RETRIES = int(os.getenv("DOWNLOAD_SEGMENT_RETRIES", "3"))  # Повторов на сегмент при сбоях сети
+
+# Общий HTTP-клиент (Kinopoisk, скачивание видео)
+HTTP_POOL_LIMIT = int(os.getenv("HTTP_POOL_LIMIT", "100"))  # Всего соединений
+HTTP_POOL_LIMIT_PER_HOST = int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", "20"))  # Соединений на один хост
+HTTP_DNS_CACHE_TTL = int(os.getenv("HTTP_DNS_CACHE_TTL", "300"))  # Кеш DNS, сек
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", "30"))  # Keep-alive простаивающих соединений, сек
+
+# Кеш ответов Kinopoisk (память + таблица в БД)
+KINOPOISK_CACHE_SIZE = int(os.getenv("KINOPOISK_CACHE_SIZE", "2000"))  # Записей в памяти
+KINOPOISK_CACHE_TTL = int(os.getenv("KINOPOISK_CACHE_TTL", str(7 * 24 * 3600)))  # Найденные фильмы, сек
+KINOPOISK_NEGATIVE_TTL = int(os.getenv("KINOPOISK_NEGATIVE_TTL", str(6 * 3600)))  # "Ничего не найдено", сек
+
+# Пул кандидатов для /random
+RANDOM_POOL_PAGES = int(os.getenv("RANDOM_POOL_PAGES", "5"))  # Страниц топа Kinopoisk
+RANDOM_POOL_PAGE_SIZE = int(os.getenv("RANDOM_POOL_PAGE_SIZE", "100"))  # Фильмов на странице
+RANDOM_POOL_REFRESH = int(os.getenv("RANDOM_POOL_REFRESH", str(6 * 3600)))  # Период обновления, сек
+RANDOM_CACHED_PREFERENCE = float(os.getenv("RANDOM_CACHED_PREFERENCE", "0.9"))  # Доля выбора из уже загруженных
+
+# Кеш file_id в памяти перед БД
+HOT_CACHE_SIZE = int(os.getenv("HOT_CACHE_SIZE", "10000"))  # Записей (название/URL/ID Kinopoisk)
+
+# База данных: SQLite (по умолчанию) или PostgreSQL (postgresql+asyncpg://...)
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./movies.db")
+SQLITE_BUSY_TIMEOUT = int(os.getenv("SQLITE_BUSY_TIMEOUT", "5000"))  # Ожидание блокировки, мс
+SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", "65536"))  # Кеш страниц на соединение, КиБ
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))  # Memory-mapped I/O, байт
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))  # PostgreSQL: постоянных соединений
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))  # PostgreSQL: дополнительных соединений при пиках
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # PostgreSQL: пересоздавать соединение через, сек
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "256"))  # asyncpg: кеш prepared statements (0 для pgbouncer)
+
+# Очередь загрузок фильмов (поиск видео → скачивание → отправка в канал)
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))  # Одновременно выполняемых загрузок
+JOB_QUEUE_MAX_DEPTH = int(os.getenv("JOB_QUEUE_MAX_DEPTH", "50"))  # Больше ожидающих - отказ с сообщением
+JOB_QUEUE_MAX_PER_USER = int(os.getenv("JOB_QUEUE_MAX_PER_USER", "2"))  # Загрузок одного пользователя (в работе и в очереди)
+STAGE_RESOLVE_CONCURRENCY = int(os.getenv("STAGE_RESOLVE_CONCURRENCY", str(PARSER_WORKERS or PARSER_POOL_SIZE)))  # Поисков видео в браузере
+STAGE_DOWNLOAD_CONCURRENCY = int(os.getenv("STAGE_DOWNLOAD_CONCURRENCY", "2"))  # Скачиваний видео
+STAGE_UPLOAD_CONCURRENCY = int(os.getenv("STAGE_UPLOAD_CONCURRENCY", "2"))  # Отправок видео в канал
+
+# Бюджет времени одного поиска фильма (доли этапов берутся из общего остатка)
+SEARCH_DEADLINE = float(os.getenv("SEARCH_DEADLINE", "900"))  # Весь запрос: очередь, поиск, скачивание, загрузка, сек
+METADATA_BUDGET = float(os.getenv("METADATA_BUDGET", "8"))  # Метаданные Kinopoisk (необязательный этап), сек
+CACHE_LOOKUP_BUDGET = float(os.getenv("CACHE_LOOKUP_BUDGET", "3"))  # Проверка кеша file_id, сек
@@ -1,20 +1,78 @@
 import logging
 from contextlib import asynccontextmanager
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
-from sqlalchemy.orm import declarative_base
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine, async_sessionmaker
+from sqlalchemy.orm import Session, declarative_base
+
+from config import (
+    DATABASE_URL, SQLITE_BUSY_TIMEOUT, SQLITE_CACHE_SIZE, SQLITE_MMAP_SIZE,
+    DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_RECYCLE, DB_STATEMENT_CACHE_SIZE
+)
 
 logger = logging.getLogger(__name__)
 
 # Базовая модель
 Base = declarative_base()
 
+
+def create_engine_from_url(url: str, tuned: bool = True) -> AsyncEngine:
+    """
+    Создает движок БД с настройками под конкретную СУБД.
+
+    SQLite: WAL, synchronous=NORMAL, mmap, кеш страниц и busy_timeout
+    на каждом соединении. PostgreSQL (asyncpg): пул соединений,
+    pre-ping и кеш prepared statements.
+
+    Args:
+        url: URL базы данных
+        tuned: False - движок с настройками по умолчанию (для бенчмарков)
+    """
+    url_obj = make_url(url)
+    backend = url_obj.get_backend_name()
+
+    if backend == "sqlite":
+        engine = create_async_engine(url_obj, echo=False)
+        if tuned:
+            event.listen(engine.sync_engine, "connect", _apply_sqlite_pragmas)
+        return engine
+
+    if backend == "postgresql":
+        if url_obj.drivername == "postgresql":
+            url_obj = url_obj.set(drivername="postgresql+asyncpg")
+        if not tuned:
+            return create_async_engine(url_obj, echo=False)
+        if "prepared_statement_cache_size" not in url_obj.query:
+            url_obj = url_obj.update_query_dict({"prepared_statement_cache_size": str(DB_STATEMENT_CACHE_SIZE)})
+        return create_async_engine(
+            url_obj,
+            echo=False,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_pre_ping=True,
+            pool_recycle=DB_POOL_RECYCLE,
+            connect_args={"statement_cache_size": DB_STATEMENT_CACHE_SIZE}
+        )
+
+    return create_async_engine(url_obj, echo=False)
+
+
+def _apply_sqlite_pragmas(dbapi_connection, _connection_record) -> None:
+    """Настройки SQLite для конкурентной работы нескольких обработчиков"""
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT}")
+        cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE}")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+    finally:
+        cursor.close()
+
+
 # Движок БД
-DATABASE_URL = "sqlite+aiosqlite:///./movies.db"
-engine = create_async_engine(
-    DATABASE_URL,
-    echo=False,
-    future=True
-)
+engine = create_engine_from_url(DATABASE_URL)
 
 # Фабрика сессий
 async_session_maker = async_sessionmaker(
@@ -38,12 +96,89 @@ async def get_db_session():
         await session.close()
 
 
+# Ключ в Session.info: в текущей транзакции были изменения данных
+_HAS_WRITES = "has_writes"
+
+
+@event.listens_for(Session, "after_flush")
+def _mark_flush(session: Session, _flush_context) -> None:
+    session.info[_HAS_WRITES] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _mark_dml(orm_execute_state) -> None:
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info[_HAS_WRITES] = True
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def _clear_writes(session: Session) -> None:
+    session.info.pop(_HAS_WRITES, None)
+
+
+class LazySession:
+    """
+    Сессия БД, которая открывается при первом обращении.
+
+    Проксирует атрибуты AsyncSession, поэтому передается везде, где
+    ожидается сессия. Если обработчик не обращался к БД, соединение
+    не берется из пула; если ничего не изменял - коммит пропускается.
+    """
+
+    def __init__(self, session_maker: async_sessionmaker = None):
+        self._session_maker = session_maker or async_session_maker
+        self._session: AsyncSession = None
+
+    @property
+    def started(self) -> bool:
+        return self._session is not None
+
+    @property
+    def session(self) -> AsyncSession:
+        if self._session is None:
+            self._session = self._session_maker()
+        return self._session
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+    def has_changes(self) -> bool:
+        return self._session is not None and _has_changes(self._session)
+
+    async def release(self, commit: bool = True) -> None:
+        """
+        Коммитит изменения (если они есть и commit=True) и возвращает
+        соединение в пул. Сессией можно пользоваться дальше - при
+        следующем обращении откроется новая. Стоит вызывать перед
+        долгими операциями, не связанными с БД.
+        """
+        session, self._session = self._session, None
+        if session is None:
+            return
+        try:
+            if commit and _has_changes(session):
+                await session.commit()
+        finally:
+            # close() откатывает незакоммиченную транзакцию
+            await session.close()
+
+
+def _has_changes(session: AsyncSession) -> bool:
+    return bool(
+        session.new or session.dirty or session.deleted
+        or session.sync_session.info.get(_HAS_WRITES)
+    )
+
+
 async def init_db():
     """Инициализация БД - создание таблиц"""
-    from database.models import VideoCache, UserFavorite  # noqa
+    from database.models import VideoCache, UserFavorite, KinopoiskCache, ResolvedUrl  # noqa
+    from database.migrations import run_migrations
     
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await run_migrations(conn)
     
     logger.info("Database tables created")
 
@@ -0,0 +1,183 @@
+from collections import OrderedDict
+from typing import Optional, NamedTuple, Hashable, Dict, Set, Iterable
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from config import HOT_CACHE_SIZE
+from database.connection import get_db_session
+from services.cache import CacheStats
+from services.metrics import track_cache
+from services.normalize import normalize_title, video_url_hash
+
+
+class CachedFilm(NamedTuple):
+    """Компактная запись о загруженном фильме"""
+    id: int
+    file_id: str
+    title: str
+    description: Optional[str]  # Короткое описание (до 500 символов)
+    kinopoisk_id: Optional[int]
+
+    @classmethod
+    def from_row(cls, row) -> 'CachedFilm':
+        return cls(
+            id=row.id,
+            file_id=row.file_id,
+            title=row.title,
+            description=row.description[:500] if row.description else None,
+            kinopoisk_id=row.kinopoisk_id
+        )
+
+
+class FilmCache:
+    """
+    Ограниченный LRU-кеш записей VideoCache в памяти процесса.
+
+    Ключи: ("title", ключ названия), ("url", хеш URL), ("kp", ID Kinopoisk).
+    Кешируются только найденные записи с file_id. Запись сбрасывается
+    при VideoCache.create_or_update. Счетчик поколений не дает положить
+    в кеш данные, прочитанные из БД до сброса.
+    """
+
+    def __init__(self, maxsize: int = 10000):
+        self.maxsize = max(1, maxsize)
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, CachedFilm]" = OrderedDict()
+        self._keys_by_id: Dict[int, Set[Hashable]] = {}
+
+    def get(self, key: Hashable) -> Optional[CachedFilm]:
+        film = self._data.get(key)
+        if film is None:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return film
+
+    def put(self, key: Hashable, film: CachedFilm, generation: int) -> None:
+        if generation != self.generation:
+            # Пока читали из БД, запись могла измениться
+            return
+        self._drop(key)
+        self._data[key] = film
+        self._keys_by_id.setdefault(film.id, set()).add(key)
+        while len(self._data) > self.maxsize:
+            self._drop(next(iter(self._data)))
+
+    def invalidate(self, row_id: Optional[int] = None, keys: Iterable[Hashable] = ()) -> None:
+        """Сбрасывает все ключи записи row_id и явно переданные ключи"""
+        self.generation += 1
+        if row_id is not None:
+            for key in list(self._keys_by_id.get(row_id, ())):
+                self._drop(key)
+        for key in keys:
+            self._drop(key)
+
+    def clear(self) -> None:
+        self.generation += 1
+        self._data.clear()
+        self._keys_by_id.clear()
+
+    def _drop(self, key: Hashable) -> None:
+        film = self._data.pop(key, None)
+        if film is None:
+            return
+        keys = self._keys_by_id.get(film.id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_id[film.id]
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+film_cache = FilmCache(HOT_CACHE_SIZE)
+# Поиск загруженных фильмов: память, БД или промах
+film_cache_stats = CacheStats()
+track_cache("film", film_cache_stats)
+
+# Ключ в Session.info со сбросами, которые надо повторить после коммита
+_PENDING_INVALIDATIONS = "film_cache_invalidations"
+
+
+def invalidate_on_commit(session: AsyncSession, row_id: Optional[int], keys: Iterable[Hashable]) -> None:
+    """
+    Сбрасывает записи сразу и еще раз после коммита сессии:
+    чтение, начатое до коммита, могло положить в кеш старые данные
+    """
+    keys = tuple(keys)
+    film_cache.invalidate(row_id, keys)
+    session.sync_session.info.setdefault(_PENDING_INVALIDATIONS, []).append((row_id, keys))
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session: Session) -> None:
+    for row_id, keys in session.info.pop(_PENDING_INVALIDATIONS, ()):
+        film_cache.invalidate(row_id, keys)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session: Session) -> None:
+    session.info.pop(_PENDING_INVALIDATIONS, None)
+
+
+def title_key(title: str) -> tuple:
+    return ("title", normalize_title(title))
+
+
+def url_key(video_url: str) -> tuple:
+    return ("url", video_url_hash(video_url))
+
+
+def kinopoisk_key(kinopoisk_id: int) -> tuple:
+    return ("kp", kinopoisk_id)
+
+
+async def get_film_by_title(title: str, session: Optional[AsyncSession] = None) -> Optional[CachedFilm]:
+    """Фильм по названию: из памяти или из БД (с сохранением в память)"""
+    from database.models import VideoCache
+    return await _read_through(title_key(title), lambda s: VideoCache.get_by_title(s, title), session)
+
+
+async def get_film_by_url(video_url: str, session: Optional[AsyncSession] = None) -> Optional[CachedFilm]:
+    """Фильм по URL видео"""
+    from database.models import VideoCache
+    return await _read_through(url_key(video_url), lambda s: VideoCache.get_by_url(s, video_url), session)
+
+
+async def get_film_by_kinopoisk_id(kinopoisk_id: int, session: Optional[AsyncSession] = None) -> Optional[CachedFilm]:
+    """Фильм по ID Kinopoisk"""
+    from database.models import VideoCache
+    return await _read_through(
+        kinopoisk_key(kinopoisk_id),
+        lambda s: VideoCache.get_by_kinopoisk_id(s, kinopoisk_id),
+        session
+    )
+
+
+async def _read_through(key: tuple, load, session: Optional[AsyncSession]) -> Optional[CachedFilm]:
+    film = film_cache.get(key)
+    if film is not None:
+        film_cache_stats.memory_hits += 1
+        return film
+
+    generation = film_cache.generation
+    if session is None:
+        async with get_db_session() as session:
+            row = await load(session)
+    else:
+        row = await load(session)
+
+    if row is None or not row.file_id:
+        film_cache_stats.misses += 1
+        return None
+
+    film_cache_stats.db_hits += 1
+    film = CachedFilm.from_row(row)
+    film_cache.put(key, film, generation)
+    return film
@@ -0,0 +1,232 @@
+import logging
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from services.normalize import normalize_title, video_url_hash
+
+logger = logging.getLogger(__name__)
+
+# Размер пачки при заполнении новых колонок
+BACKFILL_BATCH = 1000
+
+FTS_STATEMENTS = (
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS video_cache_fts USING fts5(
+        title_key, content='video_cache', content_rowid='id', tokenize='unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS video_cache_fts_ai AFTER INSERT ON video_cache BEGIN
+        INSERT INTO video_cache_fts(rowid, title_key) VALUES (new.id, new.title_key);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS video_cache_fts_ad AFTER DELETE ON video_cache BEGIN
+        INSERT INTO video_cache_fts(video_cache_fts, rowid, title_key) VALUES ('delete', old.id, old.title_key);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS video_cache_fts_au AFTER UPDATE OF title_key ON video_cache BEGIN
+        INSERT INTO video_cache_fts(video_cache_fts, rowid, title_key) VALUES ('delete', old.id, old.title_key);
+        INSERT INTO video_cache_fts(rowid, title_key) VALUES (new.id, new.title_key);
+    END
+    """,
+)
+
+
+async def run_migrations(conn: AsyncConnection) -> None:
+    """Идемпотентные изменения схемы для уже существующих БД (после create_all)"""
+    await conn.run_sync(_migrate)
+
+
+def _migrate(conn: Connection) -> None:
+    _add_title_key(conn)
+    _rekey_year_titles(conn)
+    _add_url_hash(conn)
+    _rehash_urls(conn)
+    _add_unique_keys(conn)
+    # Keyset-пагинация списка избранного
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS idx_user_created ON user_favorites (user_id, created_at, id)"
+    ))
+    if conn.dialect.name == "sqlite":
+        _create_title_fts(conn)
+
+
+def _add_title_key(conn: Connection) -> None:
+    """Колонка title_key с индексом и заполнение для старых записей"""
+    columns = {c["name"] for c in inspect(conn).get_columns("video_cache")}
+    if "title_key" not in columns:
+        logger.info("Adding video_cache.title_key column")
+        conn.execute(text("ALTER TABLE video_cache ADD COLUMN title_key VARCHAR(500)"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS idx_title_key ON video_cache (title_key)"))
+
+    filled = 0
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            text(
+                "SELECT id, title FROM video_cache WHERE title_key IS NULL AND id > :last_id "
+                "ORDER BY id LIMIT :limit"
+            ),
+            {"last_id": last_id, "limit": BACKFILL_BATCH}
+        ).all()
+        if not rows:
+            break
+        conn.execute(
+            text("UPDATE video_cache SET title_key = :key WHERE id = :id"),
+            [{"id": row.id, "key": normalize_title(row.title)} for row in rows]
+        )
+        filled += len(rows)
+        last_id = rows[-1].id
+
+    if filled:
+        logger.info(f"Backfilled title_key for {filled} rows")
+
+
+def _rekey_year_titles(conn: Connection) -> None:
+    """
+    Пересчет title_key у названий с числами вида 19xx/20xx: раньше год
+    убирался из любого места названия ("Бегущий по лезвию 2049" и
+    "Бегущий по лезвию" давали один ключ). Меняются только отличающиеся ключи.
+    """
+    changed = 0
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            text(
+                "SELECT id, title, title_key FROM video_cache "
+                "WHERE id > :last_id AND (title LIKE '%19%' OR title LIKE '%20%') "
+                "ORDER BY id LIMIT :limit"
+            ),
+            {"last_id": last_id, "limit": BACKFILL_BATCH}
+        ).all()
+        if not rows:
+            break
+        updates = [
+            {"id": row.id, "key": normalize_title(row.title)}
+            for row in rows if row.title_key != normalize_title(row.title)
+        ]
+        if updates:
+            conn.execute(text("UPDATE video_cache SET title_key = :key WHERE id = :id"), updates)
+            changed += len(updates)
+        last_id = rows[-1].id
+
+    if changed:
+        # Ключи по названию в других кешах посчитаны по старым правилам
+        conn.execute(text("DELETE FROM resolved_urls WHERE key LIKE 'title:%'"))
+        conn.execute(text("DELETE FROM kinopoisk_cache WHERE key LIKE 'q:%'"))
+        logger.info(f"Recomputed title_key for {changed} rows with years in titles")
+
+
+def _add_url_hash(conn: Connection) -> None:
+    """Колонка url_hash и заполнение для старых записей"""
+    columns = {c["name"] for c in inspect(conn).get_columns("video_cache")}
+    if "url_hash" not in columns:
+        logger.info("Adding video_cache.url_hash column")
+        conn.execute(text("ALTER TABLE video_cache ADD COLUMN url_hash VARCHAR(32)"))
+    _backfill_url_hash(conn)
+
+
+def _backfill_url_hash(conn: Connection) -> None:
+    filled = 0
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            text(
+                "SELECT id, video_url FROM video_cache "
+                "WHERE url_hash IS NULL AND video_url IS NOT NULL AND id > :last_id "
+                "ORDER BY id LIMIT :limit"
+            ),
+            {"last_id": last_id, "limit": BACKFILL_BATCH}
+        ).all()
+        if not rows:
+            break
+        conn.execute(
+            text("UPDATE video_cache SET url_hash = :hash WHERE id = :id"),
+            [{"id": row.id, "hash": video_url_hash(row.video_url)} for row in rows]
+        )
+        filled += len(rows)
+        last_id = rows[-1].id
+
+    if filled:
+        logger.info(f"Backfilled url_hash for {filled} rows")
+
+
+def _rehash_urls(conn: Connection) -> None:
+    """
+    Пересчет url_hash по каноническому URL (без токенов и сроков действия)
+    и удаление индекса по полному тексту video_url. Наличие этого индекса -
+    признак БД, созданной до канонизации URL, поэтому выполняется один раз.
+    """
+    indexes = {index["name"] for index in inspect(conn).get_indexes("video_cache")}
+    if "idx_video_url" not in indexes:
+        return
+
+    logger.info("Rehashing video_cache.url_hash over canonical URLs")
+    # Разные ссылки на один файл теперь дают один хеш - дубликаты
+    # удалятся перед повторным созданием уникального индекса
+    if "idx_url_hash_unique" in indexes:
+        conn.execute(text("DROP INDEX idx_url_hash_unique"))
+    conn.execute(text("UPDATE video_cache SET url_hash = NULL"))
+    _backfill_url_hash(conn)
+    conn.execute(text("DROP INDEX idx_video_url"))
+    logger.info("Dropped idx_video_url index")
+
+
+def _add_unique_keys(conn: Connection) -> None:
+    """
+    Уникальные индексы по kinopoisk_id и url_hash (цели ON CONFLICT).
+    Перед созданием удаляем дубликаты: остается запись с file_id,
+    затем самая свежая.
+    """
+    indexes = {index["name"] for index in inspect(conn).get_indexes("video_cache")}
+    for column_name, index_name in (
+        ("kinopoisk_id", "idx_kinopoisk_id_unique"),
+        ("url_hash", "idx_url_hash_unique"),
+    ):
+        if index_name in indexes:
+            continue
+        removed = conn.execute(text(f"""
+            DELETE FROM video_cache WHERE id IN (
+                SELECT id FROM (
+                    SELECT id, ROW_NUMBER() OVER (
+                        PARTITION BY {column_name}
+                        ORDER BY file_id IS NULL, updated_at DESC, id DESC
+                    ) AS position
+                    FROM video_cache WHERE {column_name} IS NOT NULL
+                ) ranked WHERE position > 1
+            )
+        """)).rowcount
+        if removed:
+            logger.warning(f"Removed {removed} duplicate video_cache rows by {column_name}")
+        conn.execute(text(f"CREATE UNIQUE INDEX {index_name} ON video_cache ({column_name})"))
+        logger.info(f"Created unique index {index_name}")
+
+    # Обычные индексы по kinopoisk_id дублируют уникальный
+    for index_name in ("idx_kinopoisk_id", "ix_video_cache_kinopoisk_id"):
+        if index_name in indexes:
+            conn.execute(text(f"DROP INDEX {index_name}"))
+
+
+def _create_title_fts(conn: Connection) -> None:
+    """FTS5-таблица по title_key, синхронизируемая триггерами"""
+    exists = conn.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'video_cache_fts'")
+    ).first()
+    if exists:
+        return
+
+    try:
+        for statement in FTS_STATEMENTS:
+            conn.execute(text(statement))
+    except Exception as e:
+        # SQLite собран без FTS5 - поиск будет работать через LIKE
+        logger.warning(f"FTS5 is not available, fuzzy title search falls back to LIKE: {e}")
+        return
+
+    # Индексируем записи, существовавшие до создания таблицы
+    conn.execute(text("INSERT INTO video_cache_fts(video_cache_fts) VALUES ('rebuild')"))
+    logger.info("Created video_cache_fts full-text index")
@@ -1,11 +1,50 @@
-from datetime import datetime
-from typing import Optional
-from sqlalchemy import Column, Integer, String, Text, DateTime, BigInteger, Index
+from contextlib import nullcontext
+from datetime import datetime, timedelta
+from typing import Optional, Iterable, Dict, Any
+from sqlalchemy import Column, Integer, String, Text, DateTime, BigInteger, Index, delete, update, or_, text, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import OperationalError, IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy.sql import func
+from sqlalchemy.orm import validates
+from sqlalchemy.sql import func, table, column
 
 from database.connection import Base
+from database.hot_cache import invalidate_on_commit, title_key, url_key, kinopoisk_key
+from services.normalize import normalize_title, video_url_hash
+
+# FTS5-индекс по title_key (только SQLite, создается в database/migrations.py)
+video_cache_fts = table("video_cache_fts", column("rowid"), column("title_key"))
+
+# Размер пачки для bulk_upsert (одна инструкция INSERT на пачку)
+UPSERT_CHUNK = 500
+
+
+def _insert_for(session: AsyncSession):
+    """
+    INSERT с поддержкой ON CONFLICT для диалекта сессии.
+    None - диалект без ON CONFLICT, запись через SELECT и INSERT/UPDATE.
+    """
+    dialect = session.bind.dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert
+    if dialect == "sqlite":
+        return sqlite.insert
+    return None
+
+
+def _retry_point(session: AsyncSession):
+    """
+    Точка отката для повтора инструкции после IntegrityError.
+    
+    В PostgreSQL ошибка прерывает всю транзакцию - нужен SAVEPOINT.
+    В SQLite ошибка ограничения откатывает только саму инструкцию,
+    а SAVEPOINT вместе с FTS5-триггерами дает мгновенные
+    "database is locked" при конкурентной записи.
+    """
+    if session.bind.dialect.name == "sqlite":
+        return nullcontext()
+    return session.begin_nested()
 
 
 class VideoCache(Base):
@@ -14,30 +53,141 @@ class VideoCache(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String(500), nullable=False, index=True)
+    title_key = Column(String(500), nullable=True)  # Нормализованное название для точного поиска по индексу
     file_id = Column(String(200), nullable=True)  # Telegram file_id
-    video_url = Column(Text, nullable=True)  # Оригинальный URL видео
-    kinopoisk_id = Column(Integer, nullable=True, index=True)
+    video_url = Column(Text, nullable=True)  # Оригинальный URL видео (без индекса)
+    url_hash = Column(String(32), nullable=True)  # Хеш канонического video_url, ключ поиска по URL
+    kinopoisk_id = Column(Integer, nullable=True)
     description = Column(Text, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow, server_default=func.now())
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, server_default=func.now())
     
     __table_args__ = (
         Index('idx_title', 'title'),
-        Index('idx_kinopoisk_id', 'kinopoisk_id'),
-        Index('idx_video_url', 'video_url'),
+        Index('idx_title_key', 'title_key'),
+        Index('idx_kinopoisk_id_unique', 'kinopoisk_id', unique=True),
+        Index('idx_url_hash_unique', 'url_hash', unique=True),
     )
     
+    # Поля, которые upsert обновляет у существующей записи (если переданы)
+    UPSERT_FIELDS = ('file_id', 'video_url', 'url_hash', 'kinopoisk_id', 'description')
+    
+    @validates('title')
+    def _update_title_key(self, _key: str, title: str) -> str:
+        """Ключ названия пересчитывается при каждом изменении title"""
+        self.title_key = normalize_title(title)
+        return title
+    
+    @validates('video_url')
+    def _update_url_hash(self, _key: str, video_url: Optional[str]) -> Optional[str]:
+        """Хеш URL пересчитывается при каждом изменении video_url"""
+        self.url_hash = video_url_hash(video_url) if video_url else None
+        return video_url
+    
+    @classmethod
+    def _row_values(
+        cls,
+        title: str,
+        file_id: Optional[str] = None,
+        video_url: Optional[str] = None,
+        kinopoisk_id: Optional[int] = None,
+        description: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Значения колонок для INSERT в обход ORM (с вычисляемыми ключами)"""
+        now = datetime.utcnow()
+        return {
+            'title': title,
+            'title_key': normalize_title(title),
+            'file_id': file_id,
+            'video_url': video_url,
+            'url_hash': video_url_hash(video_url) if video_url else None,
+            'kinopoisk_id': kinopoisk_id or None,
+            'description': description,
+            'created_at': now,
+            'updated_at': now,
+        }
+    
+    @classmethod
+    def _upsert_stmt(cls, session: AsyncSession, rows: list[Dict[str, Any]], target: str):
+        """
+        INSERT ... ON CONFLICT (target) DO UPDATE: переданные поля
+        заменяют старые, NULL не затирает уже сохраненные значения.
+        Уже заданный kinopoisk_id при совпадении URL не меняется.
+        """
+        stmt = _insert_for(session)(cls).values(rows)
+        columns = cls.__table__.c
+        updates = {
+            name: func.coalesce(stmt.excluded[name], columns[name])
+            for name in cls.UPSERT_FIELDS
+            if name != target
+        }
+        if target != 'kinopoisk_id':
+            updates['kinopoisk_id'] = func.coalesce(columns.kinopoisk_id, stmt.excluded.kinopoisk_id)
+        updates['updated_at'] = stmt.excluded.updated_at
+        return stmt.on_conflict_do_update(
+            index_elements=[target],
+            set_=updates
+        )
+    
+    @classmethod
+    async def get_by_title_key(cls, session: AsyncSession, title: str) -> Optional['VideoCache']:
+        """Получить кеш по точному совпадению нормализованного названия"""
+        stmt = (
+            select(cls)
+            .where(cls.title_key == normalize_title(title))
+            .order_by(cls.updated_at.desc())
+            .limit(1)
+        )
+        result = await session.execute(stmt)
+        return result.scalars().first()
+    
     @classmethod
     async def get_by_title(cls, session: AsyncSession, title: str) -> Optional['VideoCache']:
-        """Получить кеш по названию"""
-        stmt = select(cls).where(cls.title.ilike(f"%{title}%")).order_by(cls.updated_at.desc())
+        """Получить кеш по названию: точное совпадение ключа, затем нечеткий поиск"""
+        cached = await cls.get_by_title_key(session, title)
+        if cached:
+            return cached
+        
+        matches = await cls.search_by_title(session, title, limit=1)
+        return matches[0] if matches else None
+    
+    @classmethod
+    async def search_by_title(cls, session: AsyncSession, query: str, limit: int = 10) -> list['VideoCache']:
+        """Нечеткий поиск по названию, лучшие совпадения первыми"""
+        key = normalize_title(query)
+        if not key:
+            return []
+        
+        if session.bind.dialect.name == "sqlite":
+            # Все слова запроса как префиксы, ранжирование по bm25
+            match = " ".join(f'"{token}"*' for token in key.split())
+            stmt = (
+                select(cls)
+                .join(video_cache_fts, video_cache_fts.c.rowid == cls.id)
+                .where(text("video_cache_fts MATCH :match"))
+                .order_by(text("bm25(video_cache_fts)"))
+                .limit(limit)
+            )
+            try:
+                result = await session.execute(stmt, {"match": match})
+                return list(result.scalars().all())
+            except OperationalError:
+                # SQLite без FTS5 - ищем подстроку
+                pass
+        
+        stmt = (
+            select(cls)
+            .where(cls.title_key.like(f"%{key}%"))
+            .order_by(func.length(cls.title_key), cls.updated_at.desc())
+            .limit(limit)
+        )
         result = await session.execute(stmt)
-        return result.scalar_one_or_none()
+        return list(result.scalars().all())
     
     @classmethod
     async def get_by_url(cls, session: AsyncSession, video_url: str) -> Optional['VideoCache']:
-        """Получить кеш по URL видео"""
-        stmt = select(cls).where(cls.video_url == video_url).order_by(cls.updated_at.desc())
+        """Получить кеш по URL видео (по хешу канонического URL)"""
+        stmt = select(cls).where(cls.url_hash == video_url_hash(video_url))
         result = await session.execute(stmt)
         return result.scalar_one_or_none()
     
@@ -48,6 +198,24 @@ class VideoCache(Base):
         result = await session.execute(stmt)
         return result.scalar_one_or_none()
     
+    @classmethod
+    async def get_cached_kinopoisk_ids(cls, session: AsyncSession, kinopoisk_ids: list[int]) -> set[int]:
+        """Из переданных ID Kinopoisk вернуть те, для которых уже есть file_id"""
+        if not kinopoisk_ids:
+            return set()
+        stmt = select(cls.kinopoisk_id).where(
+            cls.kinopoisk_id.in_(kinopoisk_ids),
+            cls.file_id.is_not(None)
+        )
+        result = await session.execute(stmt)
+        return set(result.scalars().all())
+    
+    @classmethod
+    async def forget_file_id(cls, session: AsyncSession, row_id: int) -> None:
+        """Сбросить file_id, который Telegram больше не принимает (видео загрузится заново)"""
+        await session.execute(update(cls).where(cls.id == row_id).values(file_id=None))
+        invalidate_on_commit(session, row_id, ())
+    
     @classmethod
     async def create_or_update(
         cls,
@@ -58,40 +226,203 @@ class VideoCache(Base):
         kinopoisk_id: Optional[int] = None,
         description: Optional[str] = None
     ) -> 'VideoCache':
-        """Создать или обновить запись в кеше"""
-        # Пытаемся найти существующую запись
-        existing = None
-        if kinopoisk_id:
-            existing = await cls.get_by_kinopoisk_id(session, kinopoisk_id)
-        elif video_url:
-            existing = await cls.get_by_url(session, video_url)
+        """
+        Создать или обновить запись в кеше.
+        
+        С kinopoisk_id или video_url - одна инструкция INSERT ... ON CONFLICT
+        DO UPDATE ... RETURNING по уникальному ключу, без гонок между
+        конкурентными запросами. Только с названием - поиск по точному
+        ключу названия и вставка/обновление.
+        """
+        values = cls._row_values(title, file_id, video_url, kinopoisk_id, description)
+        targets = [
+            name for name in ('kinopoisk_id', 'url_hash') if values[name] is not None
+        ]
+        
+        if targets:
+            cached = await cls._upsert_one(session, values, targets)
         else:
-            existing = await cls.get_by_title(session, title)
-        
-        if existing:
-            # Обновляем существующую
-            if file_id:
-                existing.file_id = file_id
-            if video_url:
-                existing.video_url = video_url
-            if kinopoisk_id:
-                existing.kinopoisk_id = kinopoisk_id
-            if description:
-                existing.description = description
-            existing.updated_at = datetime.utcnow()
+            cached = await cls._update_by_title(session, values)
+        
+        # Сбрасываем кеш file_id в памяти по всем ключам записи
+        keys = [title_key(title)]
+        if video_url:
+            keys.append(url_key(video_url))
+        if kinopoisk_id:
+            keys.append(kinopoisk_key(kinopoisk_id))
+        invalidate_on_commit(session, cached.id, keys)
+        return cached
+    
+    @classmethod
+    async def _upsert_one(cls, session: AsyncSession, values: Dict[str, Any], targets: list[str]) -> 'VideoCache':
+        """
+        Upsert по первому подходящему уникальному ключу. Если запись
+        конфликтует по другому ключу (например, тот же URL уже сохранен
+        без kinopoisk_id), повторяем по следующему ключу.
+        """
+        if len(targets) > 1:
+            values = await cls._resolve_key_conflict(session, values)
+            targets = [target for target in targets if values[target] is not None]
+        if _insert_for(session) is None:
+            return await cls._select_then_write(session, values, targets)
+        
+        for i, target in enumerate(targets):
+            stmt = cls._upsert_stmt(session, [values], target).returning(cls)
+            try:
+                async with _retry_point(session):
+                    result = await session.execute(stmt, execution_options={"populate_existing": True})
+                    return result.scalars().one()
+            except IntegrityError:
+                if i == len(targets) - 1:
+                    raise
+    
+    @classmethod
+    async def _resolve_key_conflict(cls, session: AsyncSession, values: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        kinopoisk_id и url_hash могут указывать на разные записи - ни один
+        upsert тогда не пройдет. URL без kinopoisk_id сливается с записью
+        фильма (она удаляется, ее file_id и описание переходят в values).
+        URL другого фильма остается за ним, запись фильма обновляется без URL.
+        """
+        stmt = select(cls).where(or_(
+            cls.kinopoisk_id == values['kinopoisk_id'],
+            cls.url_hash == values['url_hash']
+        ))
+        rows = (await session.execute(stmt)).scalars().all()
+        by_url = next(
+            (row for row in rows
+             if row.url_hash == values['url_hash'] and row.kinopoisk_id != values['kinopoisk_id']),
+            None
+        )
+        if by_url is None:
+            return values
+        
+        if by_url.kinopoisk_id is not None:
+            return dict(values, video_url=None, url_hash=None)
+        if not any(row.kinopoisk_id == values['kinopoisk_id'] for row in rows):
+            # Записи фильма еще нет - upsert по URL проставит kinopoisk_id
+            return values
+        
+        merged = dict(values)
+        for name in ('file_id', 'description'):
+            if merged[name] is None:
+                merged[name] = getattr(by_url, name)
+        await session.execute(delete(cls).where(cls.id == by_url.id))
+        invalidate_on_commit(session, by_url.id, [title_key(by_url.title), ('url', by_url.url_hash)])
+        return merged
+    
+    @classmethod
+    async def _select_then_write(cls, session: AsyncSession, values: Dict[str, Any], targets: list[str]) -> 'VideoCache':
+        """Upsert без ON CONFLICT: запись по первому найденному ключу или новая"""
+        existing = None
+        for target in targets:
+            stmt = select(cls).where(getattr(cls, target) == values[target])
+            existing = (await session.execute(stmt)).scalar_one_or_none()
+            if existing is not None:
+                break
+        if existing is None:
+            existing = cls(title=values['title'])
             session.add(existing)
-            return existing
-        else:
-            # Создаем новую
-            new_cache = cls(
-                title=title,
-                file_id=file_id,
-                video_url=video_url,
-                kinopoisk_id=kinopoisk_id,
-                description=description
-            )
-            session.add(new_cache)
-            return new_cache
+        for name in cls.UPSERT_FIELDS:
+            if name == 'url_hash' or values[name] is None:
+                continue
+            if name == 'kinopoisk_id' and existing.kinopoisk_id is not None:
+                continue
+            setattr(existing, name, values[name])
+        existing.updated_at = values['updated_at']
+        await session.flush()
+        return existing
+    
+    @classmethod
+    async def _update_by_title(cls, session: AsyncSession, values: Dict[str, Any]) -> 'VideoCache':
+        """Запись без уникального ключа: обновляем найденную по ключу названия"""
+        existing = await cls.get_by_title_key(session, values['title'])
+        if existing is None:
+            existing = cls(title=values['title'])
+            session.add(existing)
+        for name in ('file_id', 'description'):
+            if values[name]:
+                setattr(existing, name, values[name])
+        existing.updated_at = values['updated_at']
+        await session.flush()
+        return existing
+    
+    @classmethod
+    async def bulk_upsert(
+        cls,
+        session: AsyncSession,
+        entries: Iterable[Dict[str, Any]],
+        chunk_size: int = UPSERT_CHUNK
+    ) -> int:
+        """
+        Массовое сохранение записей (импорт, прогрев кеша) в транзакции сессии.
+        
+        entries - словари с ключами как у create_or_update (title обязателен).
+        Записи с kinopoisk_id или video_url сохраняются пачками по chunk_size
+        одной инструкцией на пачку; при конфликте по второму уникальному ключу
+        пачка сохраняется по одной записи. Записи только с названием
+        сохраняются по одной.
+        
+        Returns:
+            Число сохраненных записей
+        """
+        # Внутри одной инструкции ключ не может встречаться дважды - последняя запись побеждает
+        by_target: Dict[str, Dict[Any, Dict[str, Any]]] = {'kinopoisk_id': {}, 'url_hash': {}}
+        title_only = []
+        for entry in entries:
+            values = cls._row_values(**entry)
+            if values['kinopoisk_id'] is not None:
+                by_target['kinopoisk_id'][values['kinopoisk_id']] = values
+            elif values['url_hash'] is not None:
+                by_target['url_hash'][values['url_hash']] = values
+            else:
+                title_only.append(entry)
+        
+        saved = 0
+        for target, rows_by_key in by_target.items():
+            rows = list(rows_by_key.values())
+            for start in range(0, len(rows), chunk_size):
+                chunk = rows[start:start + chunk_size]
+                ids = await cls._upsert_chunk(session, chunk, target)
+                for row_id in ids:
+                    invalidate_on_commit(session, row_id, ())
+                invalidate_on_commit(session, None, _cache_keys(chunk))
+                saved += len(ids)
+        
+        for entry in title_only:
+            await cls.create_or_update(session, **entry)
+            saved += 1
+        
+        return saved
+    
+    @classmethod
+    async def _upsert_chunk(cls, session: AsyncSession, chunk: list[Dict[str, Any]], target: str) -> list[int]:
+        """Пачка одной инструкцией; при конфликте по второму ключу или без ON CONFLICT - по одной записи"""
+        if _insert_for(session) is not None:
+            stmt = cls._upsert_stmt(session, chunk, target).returning(cls.id)
+            try:
+                async with _retry_point(session):
+                    return list((await session.execute(stmt)).scalars().all())
+            except IntegrityError:
+                pass
+        
+        ids = []
+        for values in chunk:
+            targets = [t for t in ('kinopoisk_id', 'url_hash') if values[t] is not None]
+            ids.append((await cls._upsert_one(session, values, targets)).id)
+        return ids
+
+
+def _cache_keys(rows: list[Dict[str, Any]]) -> list[tuple]:
+    """Ключи кеша file_id в памяти для записей bulk_upsert"""
+    keys = []
+    for values in rows:
+        keys.append(title_key(values['title']))
+        if values['video_url']:
+            keys.append(url_key(values['video_url']))
+        if values['kinopoisk_id']:
+            keys.append(kinopoisk_key(values['kinopoisk_id']))
+    return keys
 
 
 class UserFavorite(Base):
@@ -105,47 +436,156 @@ class UserFavorite(Base):
     
     __table_args__ = (
         Index('idx_user_kinopoisk', 'user_id', 'kinopoisk_id', unique=True),
+        Index('idx_user_created', 'user_id', 'created_at', 'id'),  # Keyset-пагинация списка
     )
     
     @classmethod
-    async def add_favorite(cls, session: AsyncSession, user_id: int, kinopoisk_id: int) -> 'UserFavorite':
-        """Добавить фильм в избранное"""
-        # Проверяем, не добавлен ли уже
-        stmt = select(cls).where(
-            cls.user_id == user_id,
-            cls.kinopoisk_id == kinopoisk_id
-        )
-        result = await session.execute(stmt)
-        existing = result.scalar_one_or_none()
+    async def add_favorite(cls, session: AsyncSession, user_id: int, kinopoisk_id: int) -> bool:
+        """
+        Добавить фильм в избранное одной инструкцией (ON CONFLICT DO NOTHING),
+        в диалектах без ON CONFLICT - проверкой и вставкой.
         
-        if existing:
-            return existing
+        Returns:
+            True если добавлен, False если уже был в избранном
+        """
+        insert = _insert_for(session)
+        if insert is None:
+            stmt = select(cls.id).where(cls.user_id == user_id, cls.kinopoisk_id == kinopoisk_id)
+            if (await session.execute(stmt)).first() is not None:
+                return False
+            session.add(cls(user_id=user_id, kinopoisk_id=kinopoisk_id, created_at=datetime.utcnow()))
+            await session.flush()
+            return True
         
-        favorite = cls(user_id=user_id, kinopoisk_id=kinopoisk_id)
-        session.add(favorite)
-        return favorite
+        stmt = insert(cls).values(
+            user_id=user_id,
+            kinopoisk_id=kinopoisk_id,
+            created_at=datetime.utcnow()
+        ).on_conflict_do_nothing(index_elements=['user_id', 'kinopoisk_id'])
+        result = await session.execute(stmt)
+        return result.rowcount > 0
     
     @classmethod
     async def remove_favorite(cls, session: AsyncSession, user_id: int, kinopoisk_id: int) -> bool:
         """Удалить фильм из избранного"""
-        stmt = select(cls).where(
+        stmt = delete(cls).where(
             cls.user_id == user_id,
             cls.kinopoisk_id == kinopoisk_id
         )
         result = await session.execute(stmt)
-        favorite = result.scalar_one_or_none()
-        
-        if favorite:
-            await session.delete(favorite)
-            return True
-        return False
+        return result.rowcount > 0
     
     @classmethod
-    async def get_user_favorites(cls, session: AsyncSession, user_id: int) -> list['UserFavorite']:
-        """Получить все избранные фильмы пользователя"""
-        stmt = select(cls).where(cls.user_id == user_id).order_by(cls.created_at.desc())
+    async def get_user_favorites(
+        cls,
+        session: AsyncSession,
+        user_id: int,
+        limit: int = 10,
+        after: Optional[tuple[datetime, int]] = None
+    ) -> list:
+        """
+        Страница избранного пользователя, новые первыми.
+        
+        Keyset-пагинация по (created_at, id): следующая страница начинается
+        после (created_at, id) последней записи предыдущей, поэтому стоимость
+        запроса не зависит от номера страницы. Названия подтягиваются из
+        VideoCache тем же запросом.
+        
+        Args:
+            user_id: ID пользователя Telegram
+            limit: Размер страницы
+            after: (created_at, id) последней записи предыдущей страницы
+        
+        Returns:
+            Строки с полями id, kinopoisk_id, created_at, title (None, если фильма нет в кеше)
+        """
+        stmt = (
+            select(cls.id, cls.kinopoisk_id, cls.created_at, VideoCache.title)
+            .outerjoin(VideoCache, VideoCache.kinopoisk_id == cls.kinopoisk_id)
+            .where(cls.user_id == user_id)
+            .order_by(cls.created_at.desc(), cls.id.desc())
+            .limit(limit)
+        )
+        if after is not None:
+            stmt = stmt.where(tuple_(cls.created_at, cls.id) < tuple_(*after))
         result = await session.execute(stmt)
-        return list(result.scalars().all())
+        return list(result.all())
 
 
+class KinopoiskCache(Base):
+    """Модель для кеширования ответов Kinopoisk API (переживает перезапуск)"""
+    __tablename__ = "kinopoisk_cache"
+    
+    key = Column(String(300), primary_key=True)  # q:<нормализованный запрос> или id:<ID фильма>
+    payload = Column(Text, nullable=True)  # JSON с данными фильма, NULL - ничего не найдено
+    expires_at = Column(DateTime, nullable=False, index=True)
+    
+    @classmethod
+    async def get_valid(cls, session: AsyncSession, key: str) -> Optional['KinopoiskCache']:
+        """Получить непросроченную запись по ключу"""
+        stmt = select(cls).where(cls.key == key, cls.expires_at > datetime.utcnow())
+        result = await session.execute(stmt)
+        return result.scalar_one_or_none()
+    
+    @classmethod
+    async def put(cls, session: AsyncSession, key: str, payload: Optional[str], ttl: int) -> 'KinopoiskCache':
+        """Сохранить запись в кеш"""
+        entry = cls(key=key, payload=payload, expires_at=datetime.utcnow() + timedelta(seconds=ttl))
+        return await session.merge(entry)
+    
+    @classmethod
+    async def purge_expired(cls, session: AsyncSession) -> int:
+        """Удалить просроченные записи"""
+        result = await session.execute(delete(cls).where(cls.expires_at <= datetime.utcnow()))
+        return result.rowcount
+
 
+class ResolvedUrl(Base):
+    """Модель для кеширования найденных парсером URL видео (без повторного поиска в браузере)"""
+    __tablename__ = "resolved_urls"
+    
+    key = Column(String(300), primary_key=True)  # title:<нормализованное название> или kp:<ID фильма>
+    video_url = Column(Text, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    
+    @classmethod
+    async def get_valid(cls, session: AsyncSession, keys: list[str]) -> Optional['ResolvedUrl']:
+        """Получить непросроченную запись по первому найденному ключу (в порядке keys)"""
+        stmt = select(cls).where(cls.key.in_(keys), cls.expires_at > datetime.utcnow())
+        result = await session.execute(stmt)
+        entries = {entry.key: entry for entry in result.scalars()}
+        return next((entries[key] for key in keys if key in entries), None)
+    
+    @classmethod
+    async def put(cls, session: AsyncSession, keys: list[str], video_url: str, ttl: int) -> None:
+        """
+        Сохранить URL под всеми ключами одной инструкцией
+        INSERT ... ON CONFLICT (key) DO UPDATE: процессы, одновременно
+        нашедшие один фильм, не конфликтуют по первичному ключу
+        """
+        expires_at = datetime.utcnow() + timedelta(seconds=ttl)
+        insert = _insert_for(session)
+        if insert is None:
+            for key in keys:
+                await session.merge(cls(key=key, video_url=video_url, expires_at=expires_at))
+            return
+        
+        stmt = insert(cls).values([
+            {'key': key, 'video_url': video_url, 'expires_at': expires_at} for key in keys
+        ])
+        await session.execute(stmt.on_conflict_do_update(
+            index_elements=['key'],
+            set_={'video_url': stmt.excluded.video_url, 'expires_at': stmt.excluded.expires_at}
+        ))
+    
+    @classmethod
+    async def forget(cls, session: AsyncSession, video_url: str) -> int:
+        """Удалить все ключи, указывающие на нерабочий URL"""
+        result = await session.execute(delete(cls).where(cls.video_url == video_url))
+        return result.rowcount
+    
+    @classmethod
+    async def purge_expired(cls, session: AsyncSession) -> int:
+        """Удалить просроченные записи"""
+        result = await session.execute(delete(cls).where(cls.expires_at <= datetime.utcnow()))
+        return result.rowcount
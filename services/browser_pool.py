@@ -0,0 +1,195 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Optional, Dict, Any, AsyncIterator
+
+from playwright.async_api import async_playwright, Browser, BrowserContext, Page, Playwright
+
+logger = logging.getLogger(__name__)
+
+
+class _Slot:
+    """Контекст браузера с одной страницей, выдаваемый в аренду"""
+
+    def __init__(self, browser: Browser, context: BrowserContext, page: Page):
+        self.browser = browser
+        self.context = context
+        self.page = page
+        self.uses = 0
+        self.crashed = False
+        page.on("crash", self._on_crash)
+
+    def _on_crash(self, _page) -> None:
+        self.crashed = True
+
+    def is_healthy(self, browser: Optional[Browser]) -> bool:
+        return (
+            not self.crashed
+            and self.browser is browser
+            and browser.is_connected()
+            and not self.page.is_closed()
+        )
+
+    async def close(self) -> None:
+        try:
+            await self.context.close()
+        except Exception as e:
+            logger.debug(f"Failed to close browser context: {e}")
+
+
+class BrowserPool:
+    """
+    Долгоживущий процесс Chromium с пулом переиспользуемых контекстов.
+
+    Каждый поиск арендует страницу через lease(). Контекст пересоздается
+    после max_uses поисков, при падении страницы или если не удалось
+    сбросить страницу после использования. Упавший браузер перезапускается.
+    """
+
+    def __init__(
+        self,
+        size: int = 2,
+        max_uses: int = 50,
+        headless: bool = True,
+        context_options: Optional[Dict[str, Any]] = None
+    ):
+        self.size = max(1, size)
+        self.max_uses = max(1, max_uses)
+        self.headless = headless
+        self.context_options = context_options or {}
+
+        self._playwright: Optional[Playwright] = None
+        self._browser: Optional[Browser] = None
+        self._slots: Optional[asyncio.Queue] = None
+        self._lock = asyncio.Lock()
+        self._closed = False
+
+    @property
+    def started(self) -> bool:
+        return self._browser is not None
+
+    @property
+    def busy(self) -> int:
+        """Арендованных страниц"""
+        return self.size - self._slots.qsize() if self._slots is not None else 0
+
+    async def start(self) -> None:
+        """Запускает Chromium и заранее создает контексты"""
+        async with self._lock:
+            if self._browser is not None:
+                return
+            self._closed = False
+            self._playwright = await async_playwright().start()
+            try:
+                await self._launch_browser()
+            except Exception:
+                await self._playwright.stop()
+                self._playwright = None
+                raise
+
+            self._slots = asyncio.Queue()
+            for _ in range(self.size):
+                try:
+                    self._slots.put_nowait(await self._new_slot())
+                except Exception as e:
+                    # Слот будет создан лениво при первой аренде
+                    logger.warning(f"Failed to warm up browser context: {e}")
+                    self._slots.put_nowait(None)
+
+        logger.info(f"Browser pool started: {self.size} contexts, recycle after {self.max_uses} uses")
+
+    async def close(self) -> None:
+        """Закрывает все контексты, браузер и Playwright"""
+        async with self._lock:
+            self._closed = True
+            if self._slots is not None:
+                while not self._slots.empty():
+                    slot = self._slots.get_nowait()
+                    if slot is not None:
+                        await slot.close()
+                self._slots = None
+
+            if self._browser is not None:
+                try:
+                    await self._browser.close()
+                except Exception as e:
+                    logger.debug(f"Failed to close browser: {e}")
+                self._browser = None
+
+            if self._playwright is not None:
+                await self._playwright.stop()
+                self._playwright = None
+
+        logger.info("Browser pool closed")
+
+    @asynccontextmanager
+    async def lease(self) -> AsyncIterator[Page]:
+        """Арендует страницу на время одного поиска"""
+        if self._browser is None:
+            await self.start()
+
+        slots = self._slots
+        slot = await slots.get()
+        try:
+            if slot is not None and not slot.is_healthy(self._browser):
+                logger.info("Recycling unhealthy browser context")
+                await slot.close()
+                slot = None
+
+            if slot is None:
+                slot = await self._new_slot()
+
+            slot.uses += 1
+            yield slot.page
+
+        finally:
+            if slot is not None:
+                slot = await self._release(slot)
+            slots.put_nowait(slot)
+
+    async def _release(self, slot: _Slot) -> Optional[_Slot]:
+        """Проверяет слот после использования, возвращает None если его надо пересоздать"""
+        if self._closed:
+            await slot.close()
+            return None
+
+        if slot.uses >= self.max_uses or not slot.is_healthy(self._browser):
+            logger.info(f"Recycling browser context after {slot.uses} uses")
+            await slot.close()
+            return None
+
+        try:
+            # Останавливаем загрузку страницы и освобождаем память
+            await slot.page.goto("about:blank", timeout=5000)
+        except Exception as e:
+            logger.warning(f"Failed to reset page, recycling context: {e}")
+            await slot.close()
+            return None
+
+        return slot
+
+    async def _new_slot(self) -> _Slot:
+        browser = await self._ensure_browser()
+        context = await browser.new_context(**self.context_options)
+        try:
+            page = await context.new_page()
+        except Exception:
+            await context.close()
+            raise
+        return _Slot(browser, context, page)
+
+    async def _ensure_browser(self) -> Browser:
+        """Перезапускает браузер, если процесс упал"""
+        if self._browser is not None and self._browser.is_connected():
+            return self._browser
+
+        async with self._lock:
+            if self._browser is None or not self._browser.is_connected():
+                if self._playwright is None:
+                    raise RuntimeError("Browser pool is closed")
+                logger.warning("Chromium is not connected, relaunching")
+                await self._launch_browser()
+        return self._browser
+
+    async def _launch_browser(self) -> None:
+        self._browser = await self._playwright.chromium.launch(headless=self.headless)
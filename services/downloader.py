@@ -1,61 +1,367 @@
+import asyncio
+import inspect
 import logging
+import os
+import re
+import threading
+import time
 import aiohttp
-import ssl
-from typing import Optional
+from typing import Optional, Callable, Any, List, Tuple
+
+from config import (
+    MAX_VIDEO_SIZE, DOWNLOAD_CHUNK_SIZE, DOWNLOAD_BUFFERS,
+    DOWNLOAD_SEGMENTS, DOWNLOAD_SEGMENT_MIN_SIZE, DOWNLOAD_SEGMENT_RETRIES
+)
+from services.http_client import get_http_session
+from services.metrics import DOWNLOAD_BYTES, DOWNLOAD_SPEED
 
 logger = logging.getLogger(__name__)
 
-ssl_context = ssl.create_default_context()
-ssl_context.check_hostname = False
-ssl_context.verify_mode = ssl.CERT_NONE
+_CONTENT_RANGE_RE = re.compile(r"bytes\s+(\d+)-(\d+)/(\d+)")
+
+# progress(скачано_байт, всего_байт или None) - обычная функция или корутина
+ProgressCallback = Callable[[int, Optional[int]], Any]
+
+
+class BufferPool:
+    """
+    Пул переиспользуемых буферов фиксированного размера.
+
+    Ограничивает память одного скачивания: когда все буферы ждут
+    записи на диск, чтение из сети приостанавливается.
+    """
+
+    def __init__(self, count: int, size: int):
+        self.size = size
+        self._free: asyncio.Queue = asyncio.Queue()
+        for _ in range(max(2, count)):
+            self._free.put_nowait(bytearray(size))
+
+    async def acquire(self) -> bytearray:
+        return await self._free.get()
 
+    def release(self, buffer: bytearray) -> None:
+        self._free.put_nowait(buffer)
 
-async def download_video(url: str, path: str, timeout: int = 300) -> Optional[str]:
+
+async def download_video(
+    url: str,
+    path: str,
+    timeout: int = 300,
+    chunk_size: int = DOWNLOAD_CHUNK_SIZE,
+    progress: Optional[ProgressCallback] = None,
+    max_size: int = MAX_VIDEO_SIZE,
+    segments: int = DOWNLOAD_SEGMENTS,
+    session: Optional[aiohttp.ClientSession] = None
+) -> Optional[str]:
     """
     Скачивает видео по URL и сохраняет в файл
-    
+
+    Тело ответа не держится в памяти целиком: оно пишется на диск
+    блоками по chunk_size байт по мере получения.
+
     Args:
         url: URL видео для скачивания
         path: Путь для сохранения файла
         timeout: Таймаут в секундах
-        
+        chunk_size: Размер блока записи на диск
+        progress: Колбэк прогресса progress(скачано, всего)
+        max_size: Максимальный размер файла в байтах
+        segments: Число параллельных соединений для больших файлов.
+                  Если сервер не поддерживает Range, качаем одним потоком
+        session: HTTP-сессия (по умолчанию общая сессия приложения)
+
     Returns:
         Путь к сохраненному файлу или None при ошибке
     """
     try:
         timeout_obj = aiohttp.ClientTimeout(total=timeout)
-        async with aiohttp.ClientSession(
-            connector=aiohttp.TCPConnector(ssl=ssl_context),
-            timeout=timeout_obj
-        ) as session:
-            logger.info(f"Downloading video from: {url[:100]}...")
-            
-            async with session.get(url) as resp:
-                if resp.status != 200:
-                    logger.error(f"Failed to download video: HTTP {resp.status}")
-                    raise Exception(f"Не удалось скачать видео: HTTP {resp.status}")
-
-                # Проверяем размер файла (ограничение 2GB)
-                content_length = resp.headers.get('Content-Length')
-                if content_length and int(content_length) > 2 * 1024 * 1024 * 1024:
-                    logger.error(f"Video file too large: {content_length} bytes")
-                    raise Exception("Файл слишком большой (максимум 2GB)")
-
-                data = await resp.read()
-                logger.info(f"Downloaded {len(data)} bytes")
-
-            # Сохраняем файл
-            with open(path, "wb") as f:
-                f.write(data)
-
-            logger.info(f"Video saved to: {path}")
-            return path
+        session = session or get_http_session()
+        logger.info(f"Downloading video from: {url[:100]}...")
+        started = time.perf_counter()
+
+        if segments > 1:
+            total = await _probe_range_support(session, url, timeout_obj)
+            if total is not None and total > max_size:
+                logger.error(f"Video file too large: {total} bytes")
+                raise Exception(f"Файл слишком большой (максимум {max_size // (1024 * 1024)} МБ)")
+            if total is not None and total >= DOWNLOAD_SEGMENT_MIN_SIZE:
+                await _download_segmented(session, url, path, total, segments, chunk_size, progress, timeout_obj)
+                _record_download(total, started)
+                logger.info(f"Downloaded {total} bytes in {segments} segments")
+                logger.info(f"Video saved to: {path}")
+                return path
+
+        async with session.get(url, timeout=timeout_obj) as resp:
+            if resp.status != 200:
+                logger.error(f"Failed to download video: HTTP {resp.status}")
+                raise Exception(f"Не удалось скачать видео: HTTP {resp.status}")
+
+            # Проверяем размер файла (по умолчанию ограничение 2GB)
+            content_length = resp.headers.get('Content-Length')
+            total = int(content_length) if content_length else None
+            if total is not None and total > max_size:
+                logger.error(f"Video file too large: {content_length} bytes")
+                raise Exception(f"Файл слишком большой (максимум {max_size // (1024 * 1024)} МБ)")
+
+            downloaded = await _stream_to_file(resp, path, chunk_size, total, max_size, progress)
+            _record_download(downloaded, started)
+            logger.info(f"Downloaded {downloaded} bytes")
+
+        logger.info(f"Video saved to: {path}")
+        return path
 
     except aiohttp.ClientError as e:
         logger.error(f"Network error downloading video: {e}", exc_info=True)
+        _remove_partial(path)
         return None
     except Exception as e:
         logger.error(f"Error downloading video: {e}", exc_info=True)
+        _remove_partial(path)
+        return None
+
+
+async def _stream_to_file(
+    resp: aiohttp.ClientResponse,
+    path: str,
+    chunk_size: int,
+    total: Optional[int],
+    max_size: int,
+    progress: Optional[ProgressCallback]
+) -> int:
+    """
+    Читает тело ответа в буферы из пула и пишет их на диск в пуле потоков,
+    чтобы запись больших файлов не блокировала event loop.
+
+    Returns:
+        Число скачанных байт
+    """
+    loop = asyncio.get_running_loop()
+    pool = BufferPool(DOWNLOAD_BUFFERS, chunk_size)
+    pending: asyncio.Queue = asyncio.Queue()
+    file = await loop.run_in_executor(None, open, path, "wb")
+
+    async def writer():
+        while True:
+            item = await pending.get()
+            if item is None:
+                return
+            buffer, size = item
+            try:
+                await loop.run_in_executor(None, file.write, memoryview(buffer)[:size])
+            finally:
+                pool.release(buffer)
+
+    writer_task = asyncio.create_task(writer())
+
+    def submit(buffer: bytearray, size: int) -> None:
+        if writer_task.done():
+            # Запись упала - дальше качать бессмысленно
+            writer_task.result()
+            raise Exception("Запись файла прервана")
+        pending.put_nowait((buffer, size))
+
+    try:
+        downloaded = 0
+        buffer = await pool.acquire()
+        filled = 0
+        while True:
+            data = await resp.content.read(chunk_size - filled)
+            if not data:
+                break
+
+            size = len(data)
+            buffer[filled:filled + size] = data
+            filled += size
+            downloaded += size
+
+            # Content-Length может отсутствовать - проверяем лимит на лету
+            if downloaded > max_size:
+                logger.error(f"Video file too large: more than {max_size} bytes")
+                raise Exception(f"Файл слишком большой (максимум {max_size // (1024 * 1024)} МБ)")
+
+            if filled == chunk_size:
+                submit(buffer, filled)
+                buffer = await pool.acquire()
+                filled = 0
+
+                if progress is not None:
+                    result = progress(downloaded, total)
+                    if inspect.isawaitable(result):
+                        await result
+
+        if filled:
+            submit(buffer, filled)
+        else:
+            pool.release(buffer)
+
+        pending.put_nowait(None)
+        await writer_task
+
+        if progress is not None:
+            result = progress(downloaded, total)
+            if inspect.isawaitable(result):
+                await result
+
+        return downloaded
+
+    finally:
+        if not writer_task.done():
+            writer_task.cancel()
+            await asyncio.gather(writer_task, return_exceptions=True)
+        await loop.run_in_executor(None, file.close)
+
+
+async def _probe_range_support(
+    session: aiohttp.ClientSession,
+    url: str,
+    timeout: aiohttp.ClientTimeout
+) -> Optional[int]:
+    """
+    Проверяет поддержку Range-запросов запросом первого байта.
+
+    Returns:
+        Полный размер файла или None, если сервер не отдает диапазоны
+    """
+    try:
+        async with session.get(url, headers={"Range": "bytes=0-0"}, timeout=timeout) as resp:
+            accept_ranges = resp.headers.get("Accept-Ranges", "")
+            if resp.status != 206:
+                logger.info(f"Range requests not supported (HTTP {resp.status}, Accept-Ranges: {accept_ranges or '-'})")
+                return None
+
+            match = _CONTENT_RANGE_RE.match(resp.headers.get("Content-Range", ""))
+            if not match:
+                return None
+            return int(match.group(3))
+
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logger.warning(f"Range probe failed, using single stream: {e}")
         return None
 
 
+def _split_ranges(total: int, segments: int) -> List[Tuple[int, int]]:
+    """Делит файл на segments диапазонов [start, end] включительно"""
+    segments = max(1, min(segments, total))
+    size = total // segments
+    ranges = []
+    for i in range(segments):
+        start = i * size
+        end = total - 1 if i == segments - 1 else start + size - 1
+        ranges.append((start, end))
+    return ranges
+
+
+class _PositionalWriter:
+    """Запись в файл по смещению из пула потоков (pwrite или seek+write под блокировкой)"""
+
+    def __init__(self, path: str, total: int):
+        self._file = open(path, "wb")
+        # Выделяем место под весь файл заранее
+        if hasattr(os, "posix_fallocate"):
+            try:
+                os.posix_fallocate(self._file.fileno(), 0, total)
+            except OSError:
+                self._file.truncate(total)
+        else:
+            self._file.truncate(total)
+        self._lock = threading.Lock()
+
+    def write_at(self, offset: int, data: bytes) -> None:
+        if hasattr(os, "pwrite"):
+            view = memoryview(data)
+            while view:
+                written = os.pwrite(self._file.fileno(), view, offset)
+                view = view[written:]
+                offset += written
+        else:
+            with self._lock:
+                self._file.seek(offset)
+                self._file.write(data)
+
+    def close(self) -> None:
+        self._file.close()
+
+
+async def _download_segmented(
+    session: aiohttp.ClientSession,
+    url: str,
+    path: str,
+    total: int,
+    segments: int,
+    chunk_size: int,
+    progress: Optional[ProgressCallback],
+    timeout: aiohttp.ClientTimeout
+) -> None:
+    """
+    Качает файл несколькими соединениями в заранее выделенный файл.
+
+    Каждый сегмент после сетевого сбоя докачивается с последнего
+    записанного байта (до DOWNLOAD_SEGMENT_RETRIES повторов).
+    """
+    loop = asyncio.get_running_loop()
+    writer = await loop.run_in_executor(None, _PositionalWriter, path, total)
+    downloaded = 0
+
+    async def report() -> None:
+        if progress is not None:
+            result = progress(downloaded, total)
+            if inspect.isawaitable(result):
+                await result
+
+    async def fetch_segment(start: int, end: int) -> None:
+        nonlocal downloaded
+        position = start
+        failures = 0
+        while position <= end:
+            try:
+                headers = {"Range": f"bytes={position}-{end}"}
+                async with session.get(url, headers=headers, timeout=timeout) as resp:
+                    if resp.status != 206:
+                        raise Exception(f"Сервер не вернул диапазон: HTTP {resp.status}")
+
+                    async for data in resp.content.iter_chunked(chunk_size):
+                        data = data[:end + 1 - position]
+                        await loop.run_in_executor(None, writer.write_at, position, data)
+                        position += len(data)
+                        downloaded += len(data)
+                        await report()
+                        if position > end:
+                            break
+
+                if position <= end:
+                    raise aiohttp.ClientPayloadError(f"Segment {start}-{end} ended at {position}")
+
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                failures += 1
+                if failures > DOWNLOAD_SEGMENT_RETRIES:
+                    raise
+                logger.warning(f"Segment {start}-{end} failed at {position}, resuming ({failures}): {e}")
+                await asyncio.sleep(min(2 ** failures * 0.5, 5))
+
+    try:
+        async with asyncio.TaskGroup() as group:
+            for start, end in _split_ranges(total, segments):
+                group.create_task(fetch_segment(start, end))
+    except ExceptionGroup as group_error:
+        # Остальные сегменты уже отменены TaskGroup - отдаем первую причину
+        raise group_error.exceptions[0]
+    finally:
+        await loop.run_in_executor(None, writer.close)
+
+
+def _record_download(size: int, started: float) -> None:
+    """Объем и средняя скорость скачивания для метрик"""
+    DOWNLOAD_BYTES.inc(size)
+    elapsed = time.perf_counter() - started
+    if elapsed > 0:
+        DOWNLOAD_SPEED.observe(size / elapsed)
+
+
+def _remove_partial(path: str) -> None:
+    """Удаляет недокачанный файл"""
+    try:
+        if os.path.exists(path):
+            os.remove(path)
+    except OSError as e:
+        logger.warning(f"Failed to remove partial download {path}: {e}")
@@ -0,0 +1,65 @@
+import logging
+import ssl
+from typing import Optional
+
+import aiohttp
+
+from config import HTTP_POOL_LIMIT, HTTP_POOL_LIMIT_PER_HOST, HTTP_DNS_CACHE_TTL, HTTP_KEEPALIVE_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+# SSL контекст для обхода проблем с сертификатами
+ssl_context = ssl.create_default_context()
+ssl_context.check_hostname = False
+ssl_context.verify_mode = ssl.CERT_NONE
+
+_session: Optional[aiohttp.ClientSession] = None
+
+
+def create_http_session() -> aiohttp.ClientSession:
+    """Создает сессию с пулом keep-alive соединений и кешем DNS"""
+    connector = aiohttp.TCPConnector(
+        ssl=ssl_context,
+        limit=HTTP_POOL_LIMIT,
+        limit_per_host=HTTP_POOL_LIMIT_PER_HOST,
+        ttl_dns_cache=HTTP_DNS_CACHE_TTL,
+        keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT
+    )
+    return aiohttp.ClientSession(connector=connector)
+
+
+async def start_http_client() -> aiohttp.ClientSession:
+    """Создает общую сессию приложения (вызывается при старте бота)"""
+    global _session
+    if _session is None or _session.closed:
+        _session = create_http_session()
+        logger.info("HTTP client started")
+    return _session
+
+
+async def close_http_client() -> None:
+    """Закрывает общую сессию при остановке бота"""
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+        logger.info("HTTP client closed")
+    _session = None
+
+
+def set_http_session(session: Optional[aiohttp.ClientSession]) -> None:
+    """Подменяет общую сессию (например, на фейковую в тестах)"""
+    global _session
+    _session = session
+
+
+def get_http_session() -> aiohttp.ClientSession:
+    """
+    Возвращает общую сессию приложения.
+
+    Если бот запущен не через main (скрипты, консоль),
+    сессия создается при первом обращении.
+    """
+    global _session
+    if _session is None or _session.closed:
+        _session = create_http_session()
+    return _session
@@ -0,0 +1,191 @@
+import asyncio
+import contextvars
+import logging
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, Optional, Set
+
+from config import (
+    JOB_WORKERS, JOB_QUEUE_MAX_DEPTH, JOB_QUEUE_MAX_PER_USER,
+    STAGE_RESOLVE_CONCURRENCY, STAGE_DOWNLOAD_CONCURRENCY, STAGE_UPLOAD_CONCURRENCY
+)
+from services.metrics import JOB_QUEUE_RUNNING, JOB_QUEUE_DEPTH
+
+logger = logging.getLogger(__name__)
+
+# on_position(место в очереди, начиная с 1)
+PositionCallback = Callable[[int], Awaitable[Any]]
+
+
+class QueueFull(Exception):
+    """Очередь переполнена - задача не принята"""
+
+    def __init__(self, per_user: bool = False):
+        super().__init__("user limit reached" if per_user else "queue is full")
+        self.per_user = per_user
+
+
+class _Waiter:
+    """Задача, ожидающая свободного слота"""
+
+    def __init__(self, user_id: Hashable, on_position: Optional[PositionCallback]):
+        self.user_id = user_id
+        self.on_position = on_position
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.position = 0
+        # Уведомления о месте идут в контексте (трассе) ожидающего, а не освободившего слот
+        self.context = contextvars.copy_context()
+
+
+class JobQueue:
+    """
+    Очередь тяжелых задач с ограничением параллельности и справедливостью
+    между пользователями.
+
+    Задача занимает слот через slot(user_id) и выполняется в задаче
+    вызывающего. Освободившийся слот получает следующий пользователь
+    по кругу (round-robin), а не следующий запрос: пользователь с пятью
+    запросами не задерживает остальных. Ожидающим сообщается их место
+    в очереди. Если очередь слишком длинная, новая задача сразу
+    отклоняется с QueueFull.
+    """
+
+    def __init__(self, workers: int, max_depth: int, max_per_user: int):
+        self.workers = max(1, workers)
+        self.max_depth = max_depth
+        self.max_per_user = max_per_user
+        self.running = 0
+        self._waiting: "OrderedDict[Hashable, Deque[_Waiter]]" = OrderedDict()
+        self._per_user: Dict[Hashable, int] = {}
+        self._notifications: Set[asyncio.Task] = set()
+
+    @property
+    def depth(self) -> int:
+        """Число ожидающих задач"""
+        return sum(len(waiters) for waiters in self._waiting.values())
+
+    @asynccontextmanager
+    async def slot(self, user_id: Hashable, on_position: Optional[PositionCallback] = None):
+        """
+        Занимает слот выполнения на время блока with
+
+        Raises:
+            QueueFull: очередь переполнена или у пользователя слишком много задач
+        """
+        if self.max_per_user and self._per_user.get(user_id, 0) >= self.max_per_user:
+            raise QueueFull(per_user=True)
+
+        if self.running < self.workers and not self._waiting:
+            self.running += 1
+        else:
+            if self.depth >= self.max_depth:
+                logger.warning(f"Job queue is full ({self.depth} waiting), rejecting job of {user_id}")
+                raise QueueFull()
+            await self._wait(user_id, on_position)
+
+        self._per_user[user_id] = self._per_user.get(user_id, 0) + 1
+        try:
+            yield
+        finally:
+            self._per_user[user_id] -= 1
+            if not self._per_user[user_id]:
+                del self._per_user[user_id]
+            self._release()
+
+    async def _wait(self, user_id: Hashable, on_position: Optional[PositionCallback]) -> None:
+        waiter = _Waiter(user_id, on_position)
+        # Место в лимите пользователя занимает и ожидающая задача
+        self._per_user[user_id] = self._per_user.get(user_id, 0) + 1
+        self._waiting.setdefault(user_id, deque()).append(waiter)
+        self._notify_positions()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Слот уже передан нам - отдаем следующему
+                self._release()
+            else:
+                self._remove(waiter)
+                self._notify_positions()
+            raise
+        finally:
+            self._per_user[user_id] -= 1
+            if not self._per_user[user_id]:
+                del self._per_user[user_id]
+
+    def _release(self) -> None:
+        """Передает освободившийся слот следующему пользователю по кругу"""
+        while self._waiting:
+            user_id, waiters = next(iter(self._waiting.items()))
+            waiter = waiters.popleft()
+            if waiters:
+                # Следующая задача этого пользователя - в конец круга
+                self._waiting.move_to_end(user_id)
+            else:
+                del self._waiting[user_id]
+            if not waiter.future.done():
+                waiter.future.set_result(None)
+                self._notify_positions()
+                return
+        self.running -= 1
+
+    def _remove(self, waiter: _Waiter) -> None:
+        waiters = self._waiting.get(waiter.user_id)
+        if waiters is None:
+            return
+        try:
+            waiters.remove(waiter)
+        except ValueError:
+            return
+        if not waiters:
+            del self._waiting[waiter.user_id]
+
+    def _notify_positions(self) -> None:
+        """Сообщает ожидающим их место, если оно изменилось"""
+        position = 0
+        queues = [list(waiters) for waiters in self._waiting.values()]
+        for turn in range(max((len(q) for q in queues), default=0)):
+            for waiters in queues:
+                if turn >= len(waiters):
+                    continue
+                position += 1
+                waiter = waiters[turn]
+                if waiter.position != position:
+                    waiter.position = position
+                    if waiter.on_position is not None:
+                        self._spawn_notification(waiter, position)
+
+    def _spawn_notification(self, waiter: _Waiter, position: int) -> None:
+        async def notify():
+            # Место успело измениться или задача уже запущена - устаревшее не показываем
+            if waiter.position != position or waiter.future.done():
+                return
+            try:
+                await waiter.on_position(position)
+            except Exception as e:
+                logger.debug(f"Failed to report queue position: {e}")
+
+        task = asyncio.create_task(notify(), context=waiter.context)
+        self._notifications.add(task)
+        task.add_done_callback(self._notifications.discard)
+
+
+class StageLimits:
+    """Отдельный лимит параллельности для каждого этапа обработки"""
+
+    def __init__(self, **limits: int):
+        self._semaphores = {name: asyncio.Semaphore(max(1, limit)) for name, limit in limits.items()}
+
+    def __call__(self, stage: str) -> asyncio.Semaphore:
+        return self._semaphores[stage]
+
+
+job_queue = JobQueue(JOB_WORKERS, JOB_QUEUE_MAX_DEPTH, JOB_QUEUE_MAX_PER_USER)
+JOB_QUEUE_RUNNING.set_function(lambda: job_queue.running)
+JOB_QUEUE_DEPTH.set_function(lambda: job_queue.depth)
+
+stage_limits = StageLimits(
+    resolve=STAGE_RESOLVE_CONCURRENCY,
+    download=STAGE_DOWNLOAD_CONCURRENCY,
+    upload=STAGE_UPLOAD_CONCURRENCY
+)
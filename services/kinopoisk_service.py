@@ -1,26 +1,42 @@
+import asyncio
+import json
 import logging
-from typing import Optional, Dict, Any, List
+from datetime import datetime
+from typing import Optional, Dict, Any, List, Tuple
 import aiohttp
-import ssl
-from config import KINOPOISK_TOKEN
+from config import KINOPOISK_TOKEN, KINOPOISK_API_URL, KINOPOISK_CACHE_SIZE, KINOPOISK_CACHE_TTL, KINOPOISK_NEGATIVE_TTL
+from services.cache import TTLCache, CacheStats, MISSING
+from services.http_client import get_http_session
+from services.metrics import KINOPOISK_REQUEST_SECONDS, track_cache
+from services.normalize import normalize_title
+from database.models import KinopoiskCache
+from database.connection import get_db_session
 
 logger = logging.getLogger(__name__)
 
-# Используем неофициальный API kinopoisk.dev
-KINOPOISK_API_URL = "https://api.kinopoisk.dev/v1.4"
+# Таймаут одного запроса к API
+KINOPOISK_TIMEOUT = aiohttp.ClientTimeout(total=15)
 
-# SSL контекст для обхода проблем с сертификатами
-ssl_context = ssl.create_default_context()
-ssl_context.check_hostname = False
-ssl_context.verify_mode = ssl.CERT_NONE
+# Двухуровневый кеш: LRU в памяти + таблица kinopoisk_cache в БД.
+# Ключи: "q:<нормализованный запрос>" и "id:<ID фильма>"
+memory_cache = TTLCache(maxsize=KINOPOISK_CACHE_SIZE, ttl=KINOPOISK_CACHE_TTL)
+cache_stats = CacheStats()
+track_cache("kinopoisk", cache_stats)
 
 
-async def search_movie_kinopoisk(query: str) -> Optional[Dict[str, Any]]:
+async def search_movie_kinopoisk(
+    query: str,
+    session: Optional[aiohttp.ClientSession] = None
+) -> Optional[Dict[str, Any]]:
     """
     Поиск фильма через Kinopoisk API
     
+    Результаты (в том числе "ничего не найдено") кешируются
+    по нормализованному запросу, детали фильма - по его ID.
+    
     Args:
         query: Название фильма для поиска
+        session: HTTP-сессия (по умолчанию общая сессия приложения)
         
     Returns:
         Словарь с данными фильма или None
@@ -29,96 +45,203 @@ async def search_movie_kinopoisk(query: str) -> Optional[Dict[str, Any]]:
         logger.warning("Kinopoisk token not configured")
         return None
     
+    cache_key = f"q:{normalize_title(query)}"
+    found, movie = await _cache_get(cache_key)
+    if found:
+        return movie
+    
     try:
-        headers = {
-            "X-API-KEY": KINOPOISK_TOKEN,
-            "Content-Type": "application/json"
-        }
-        
-        async with aiohttp.ClientSession(
-            connector=aiohttp.TCPConnector(ssl=ssl_context)
-        ) as session:
-            # Поиск фильма
-            search_url = f"{KINOPOISK_API_URL}/movie/search"
-            params = {
-                "query": query,
-                "limit": 1
-            }
-            
-            async with session.get(search_url, headers=headers, params=params) as resp:
-                if resp.status != 200:
-                    logger.warning(f"Kinopoisk API returned status {resp.status}")
-                    return None
-                
-                data = await resp.json()
-                
-                if not data.get("docs") or len(data["docs"]) == 0:
-                    logger.info(f"No results for query: {query}")
-                    return None
-                
-                movie = data["docs"][0]
-                
-                # Получаем детальную информацию
-                movie_id = movie.get("id")
-                if movie_id:
-                    detail_url = f"{KINOPOISK_API_URL}/movie/{movie_id}"
-                    async with session.get(detail_url, headers=headers) as detail_resp:
-                        if detail_resp.status == 200:
-                            detail_data = await detail_resp.json()
-                            return _format_movie_data(detail_data)
-                
-                return _format_movie_data(movie)
-                
+        session = session or get_http_session()
+        movie, complete = await _search_api(session, query)
     except Exception as e:
         logger.error(f"Error searching Kinopoisk: {e}", exc_info=True)
         return None
+    
+    # Неполный ответ (детали не загрузились) не кешируем
+    if complete:
+        await _cache_put(cache_key, movie)
+    return movie
 
 
-async def get_random_movie() -> Optional[Dict[str, Any]]:
+async def get_movie_details(
+    movie_id: int,
+    session: Optional[aiohttp.ClientSession] = None
+) -> Optional[Dict[str, Any]]:
     """
-    Получить случайный популярный фильм
+    Детальная информация о фильме по ID Kinopoisk (с кешированием)
     
+    Args:
+        movie_id: ID фильма в Kinopoisk
+        session: HTTP-сессия (по умолчанию общая сессия приложения)
+        
     Returns:
         Словарь с данными фильма или None
+    
+    Raises:
+        Exception: при ошибке API (ошибки не кешируются)
     """
-    if not KINOPOISK_TOKEN:
-        return None
+    cache_key = f"id:{movie_id}"
+    found, movie = await _cache_get(cache_key)
+    if found:
+        return movie
+    
+    session = session or get_http_session()
+    data = await _get_json(session, f"{KINOPOISK_API_URL}/movie/{movie_id}", endpoint="details")
+    movie = _format_movie_data(data) if data else None
+    await _cache_put(cache_key, movie)
+    return movie
+
+
+async def _search_api(session: aiohttp.ClientSession, query: str) -> Tuple[Optional[Dict[str, Any]], bool]:
+    """
+    Поиск через API: /movie/search, затем /movie/{id}.
+    
+    Returns:
+        (данные фильма или None, ответ полный и его можно кешировать)
+    """
+    # Поиск фильма
+    data = await _get_json(
+        session,
+        f"{KINOPOISK_API_URL}/movie/search",
+        params={"query": query, "limit": 1},
+        endpoint="search"
+    )
+    
+    if not data or not data.get("docs"):
+        logger.info(f"No results for query: {query}")
+        return None, True
+    
+    movie = data["docs"][0]
+    
+    # Получаем детальную информацию
+    movie_id = movie.get("id")
+    if movie_id:
+        try:
+            details = await get_movie_details(movie_id, session)
+            if details:
+                return details, True
+        except Exception as e:
+            logger.warning(f"Kinopoisk details failed for {movie_id}: {e}")
+            return _format_movie_data(movie), False
+    
+    return _format_movie_data(movie), True
+
+
+async def _get_json(
+    session: aiohttp.ClientSession,
+    url: str,
+    params: Optional[Dict[str, Any]] = None,
+    endpoint: str = "other"
+) -> Optional[Dict[str, Any]]:
+    """GET-запрос к API. 404 - None, прочие ошибки - исключение"""
+    headers = {
+        "X-API-KEY": KINOPOISK_TOKEN,
+        "Content-Type": "application/json"
+    }
+    
+    with KINOPOISK_REQUEST_SECONDS.labels(endpoint).time():
+        async with session.get(url, headers=headers, params=params, timeout=KINOPOISK_TIMEOUT) as resp:
+            if resp.status == 404:
+                return None
+            if resp.status != 200:
+                logger.warning(f"Kinopoisk API returned status {resp.status}")
+                raise Exception(f"Kinopoisk API returned status {resp.status}")
+            return await resp.json()
+
+
+async def _cache_get(key: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+    """Ищет ключ в памяти, затем в БД. Возвращает (найдено, значение)"""
+    value = memory_cache.get(key)
+    if value is not MISSING:
+        cache_stats.memory_hits += 1
+        return True, value
     
     try:
-        headers = {
-            "X-API-KEY": KINOPOISK_TOKEN,
-            "Content-Type": "application/json"
-        }
-        
-        async with aiohttp.ClientSession(
-            connector=aiohttp.TCPConnector(ssl=ssl_context)
-        ) as session:
-            # Получаем топ фильмов
-            url = f"{KINOPOISK_API_URL}/movie"
-            params = {
-                "page": 1,
-                "limit": 100,
-                "rating.kp": "7-10",
-                "sortField": "rating.kp",
-                "sortType": "-1"
-            }
-            
-            async with session.get(url, headers=headers, params=params) as resp:
-                if resp.status != 200:
-                    return None
-                
-                data = await resp.json()
-                
-                if not data.get("docs") or len(data["docs"]) == 0:
-                    return None
-                
-                import random
-                movie = random.choice(data["docs"])
-                return _format_movie_data(movie)
-                
+        # Поиск метаданных отменяют при попадании в кеш видео - обращение
+        # к БД доводим до конца, чтобы соединение вернулось в пул чистым
+        entry = await asyncio.shield(_db_get(key))
     except Exception as e:
-        logger.error(f"Error getting random movie: {e}", exc_info=True)
-        return None
+        logger.warning(f"Kinopoisk cache read failed: {e}")
+        entry = None
+    
+    if entry is None:
+        cache_stats.misses += 1
+        return False, None
+    
+    value = json.loads(entry.payload) if entry.payload else None
+    ttl = (entry.expires_at - datetime.utcnow()).total_seconds()
+    memory_cache.set(key, value, ttl=ttl)
+    cache_stats.db_hits += 1
+    return True, value
+
+
+async def _cache_put(key: str, value: Optional[Dict[str, Any]]) -> None:
+    """Сохраняет значение в оба уровня кеша"""
+    ttl = KINOPOISK_CACHE_TTL if value is not None else KINOPOISK_NEGATIVE_TTL
+    memory_cache.set(key, value, ttl=ttl)
+    
+    try:
+        payload = json.dumps(value, ensure_ascii=False) if value is not None else None
+        await asyncio.shield(_db_put(key, payload, ttl))
+    except Exception as e:
+        logger.warning(f"Kinopoisk cache write failed: {e}")
+
+
+async def _db_get(key: str) -> Optional[KinopoiskCache]:
+    async with get_db_session() as db_session:
+        return await KinopoiskCache.get_valid(db_session, key)
+
+
+async def _db_put(key: str, payload: Optional[str], ttl: int) -> None:
+    async with get_db_session() as db_session:
+        await KinopoiskCache.put(db_session, key, payload, ttl)
+
+
+async def purge_expired_cache() -> None:
+    """Удаляет просроченные записи кеша из БД"""
+    try:
+        async with get_db_session() as db_session:
+            removed = await KinopoiskCache.purge_expired(db_session)
+        if removed:
+            logger.info(f"Purged {removed} expired Kinopoisk cache entries")
+    except Exception as e:
+        logger.warning(f"Kinopoisk cache purge failed: {e}")
+
+
+async def get_top_movies(
+    page: int = 1,
+    limit: int = 100,
+    session: Optional[aiohttp.ClientSession] = None
+) -> List[Dict[str, Any]]:
+    """
+    Получить страницу топа фильмов с рейтингом 7+
+    
+    Args:
+        page: Номер страницы
+        limit: Фильмов на странице
+        session: HTTP-сессия (по умолчанию общая сессия приложения)
+    
+    Returns:
+        Список словарей с данными фильмов
+    
+    Raises:
+        Exception: при ошибке API
+    """
+    if not KINOPOISK_TOKEN:
+        return []
+    
+    session = session or get_http_session()
+    params = {
+        "page": page,
+        "limit": limit,
+        "rating.kp": "7-10",
+        "sortField": "rating.kp",
+        "sortType": "-1"
+    }
+    data = await _get_json(session, f"{KINOPOISK_API_URL}/movie", params=params, endpoint="top")
+    if not data or not data.get("docs"):
+        return []
+    return [_format_movie_data(movie) for movie in data["docs"]]
 
 
 def _format_movie_data(data: Dict[str, Any]) -> Dict[str, Any]:
@@ -0,0 +1,283 @@
+import logging
+import math
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин по умолчанию, сек (от запроса к БД до загрузки видео)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 900)
+
+
+def _format_value(value: float) -> str:
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if value == int(value):
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _label_text(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+class _Value:
+    """Значение счетчика или датчика; function - вычислять при сборе"""
+
+    __slots__ = ("value", "function")
+
+    def __init__(self):
+        self.value = 0.0
+        self.function: Optional[Callable[[], float]] = None
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """Значение берется из function в момент сбора (без работы на горячем пути)"""
+        self.function = function
+
+    def get(self) -> float:
+        if self.function is not None:
+            try:
+                return float(self.function())
+            except Exception as e:
+                logger.debug(f"Metric callback failed: {e}")
+                return math.nan
+        return self.value
+
+
+class _HistogramValue:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        # Последняя ячейка - значения больше всех границ (+Inf)
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        """Замеряет длительность блока with"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), registry: Optional['Registry'] = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        (registry or REGISTRY).register(self)
+
+    def labels(self, *values: object):
+        """Значение для конкретных меток (создается при первом обращении)"""
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {key}")
+            child = self._children[key] = self._new_child()
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _lines(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._lines())
+        return "\n".join(lines)
+
+
+class _ValueMetric(_Metric):
+    def _new_child(self) -> _Value:
+        return _Value()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        self.labels().set_function(function)
+
+    def _lines(self) -> Iterator[str]:
+        for key, child in list(self._children.items()):
+            yield f"{self.name}{_label_text(self.labelnames, key)} {_format_value(child.get())}"
+
+
+class Counter(_ValueMetric):
+    """Монотонно растущий счетчик"""
+    kind = "counter"
+
+
+class Gauge(_ValueMetric):
+    """Текущее значение (глубина очереди, число процессов)"""
+    kind = "gauge"
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.labels().dec(amount)
+
+
+class Histogram(_Metric):
+    """Распределение значений по корзинам (задержки, скорость)"""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS, registry: Optional['Registry'] = None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self) -> _HistogramValue:
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def time(self):
+        return self.labels().time()
+
+    def _lines(self) -> Iterator[str]:
+        for key, child in list(self._children.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), child.counts):
+                cumulative += count
+                labels = _label_text(self.labelnames + ("le",), key + (_format_value(bound),))
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _label_text(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {_format_value(child.sum)}"
+            yield f"{self.name}_count{labels} {child.count}"
+
+
+class Registry:
+    """Набор метрик процесса"""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> None:
+        if any(existing.name == metric.name for existing in self._metrics):
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics.append(metric)
+
+    def render(self) -> str:
+        """Все метрики в текстовом формате Prometheus"""
+        return "\n".join(metric.render() for metric in self._metrics) + "\n"
+
+
+REGISTRY = Registry()
+
+# Этапы загрузки фильма: cache, metadata, resolve, download, upload
+STAGE_SECONDS = Histogram("film_stage_seconds", "Duration of film pipeline stages", ["stage"])
+STAGE_FAILURES = Counter("film_stage_failures_total", "Failed or timed out film pipeline stages", ["stage"])
+
+KINOPOISK_REQUEST_SECONDS = Histogram(
+    "kinopoisk_request_seconds", "Kinopoisk API request duration", ["endpoint"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 15)
+)
+
+PARSER_STEP_SECONDS = Histogram(
+    "parser_step_seconds", "Duration of zona parser steps", ["step"],
+    buckets=(0.1, 0.25, 0.5, 1, 2, 3, 5, 8, 10, 15, 20, 30, 45)
+)
+PARSER_SEARCHES = Counter("parser_searches_total", "Video URL searches by outcome", ["result"])
+
+DOWNLOAD_BYTES = Counter("download_bytes_total", "Bytes of video downloaded")
+DOWNLOAD_SPEED = Histogram(
+    "download_speed_bytes_per_second", "Average speed of each video download",
+    buckets=tuple(2 ** power * 1024 for power in range(7, 17))  # 128 КиБ/с .. 64 МиБ/с
+)
+
+# Вычисляются при сборе из счетчиков владельцев (CacheStats, очереди, пулы)
+CACHE_LOOKUPS = Counter("cache_lookups_total", "Cache lookups by level", ["cache", "result"])
+CACHE_HIT_RATIO = Gauge("cache_hit_ratio", "Share of lookups served from memory or database", ["cache"])
+JOB_QUEUE_RUNNING = Gauge("job_queue_running", "Film jobs holding a worker slot")
+JOB_QUEUE_DEPTH = Gauge("job_queue_depth", "Film jobs waiting for a worker slot")
+OUTBOUND_PENDING = Gauge("outbound_pending", "Telegram calls waiting in the outbound scheduler")
+CHROMIUM_ACTIVE = Gauge("chromium_active", "Running Chromium browsers (one per parser process)")
+PARSER_BUSY = Gauge("parser_busy", "Video searches running in the browser")
+
+
+def observe_parser_timings(timings: Dict[str, float]) -> None:
+    """Длительности шагов одного поиска (из процесса бота или процесса парсера)"""
+    for step, seconds in timings.items():
+        PARSER_STEP_SECONDS.labels(step).observe(seconds)
+
+
+def track_cache(name: str, stats) -> None:
+    """Экспорт CacheStats: счетчики уровней и доля попаданий"""
+    CACHE_LOOKUPS.labels(name, "memory").set_function(lambda: stats.memory_hits)
+    CACHE_LOOKUPS.labels(name, "db").set_function(lambda: stats.db_hits)
+    CACHE_LOOKUPS.labels(name, "miss").set_function(lambda: stats.misses)
+    CACHE_HIT_RATIO.labels(name).set_function(lambda: stats.hit_ratio)
+
+
+_runner: Optional[web.AppRunner] = None
+
+
+async def _handle_metrics(_request: web.Request) -> web.Response:
+    return web.Response(
+        body=REGISTRY.render().encode(),
+        headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+    )
+
+
+async def start_metrics_server(host: str, port: int) -> None:
+    """HTTP-эндпоинт /metrics для Prometheus (port 0 - выключен)"""
+    global _runner
+    if port <= 0 or _runner is not None:
+        return
+    app = web.Application()
+    app.router.add_get("/metrics", _handle_metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, host, port).start()
+    except OSError as e:
+        # Метрики не должны мешать работе бота
+        logger.error(f"Failed to start metrics server on {host}:{port}: {e}")
+        await runner.cleanup()
+        return
+    _runner = runner
+    logger.info(f"Metrics available at http://{host}:{port}/metrics")
+
+
+async def stop_metrics_server() -> None:
+    global _runner
+    if _runner is not None:
+        await _runner.cleanup()
+        _runner = None
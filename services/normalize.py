@@ -0,0 +1,65 @@
+import hashlib
+import re
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# Год выпуска: в скобках ("Матрица (1999)") или в конце после разделителя
+# ("Матрица, 1999", "Матрица - 1999"). Число в самом названии
+# ("Бегущий по лезвию 2049") - часть названия
+_BRACKET_YEAR_RE = re.compile(r"[(\[]\s*(?:19|20)\d{2}\s*[)\]]")
+_TRAILING_YEAR_RE = re.compile(r"\s*[,\-–—:/|]\s*(?:19|20)\d{2}\s*$")
+_PUNCT_RE = re.compile(r"[^\w\s]+")
+_SPACES_RE = re.compile(r"\s+")
+
+# Параметры подписанных ссылок CDN, которые меняются от запроса к запросу
+# (подпись и срок действия), и метки трекинга. Только однозначные имена:
+# короткие вроде s, e или hash на части CDN выбирают сам файл
+_VOLATILE_PARAMS = frozenset({
+    "token", "expires", "signature", "sig", "hmac", "policy", "key-pair-id", "hdnts",
+    "fbclid", "gclid", "yclid", "ysclid",
+})
+_VOLATILE_PREFIXES = ("utm_", "x-amz-", "x-goog-")
+
+
+def normalize_title(title: str) -> str:
+    """
+    Нормализует название фильма для ключей кеша.
+
+    Приводит к нижнему регистру (casefold), заменяет ё на е,
+    убирает год выпуска (в скобках или в конце после запятой/тире)
+    и пунктуацию, схлопывает пробелы. "Матрица (1999)" и "матрица"
+    дают один и тот же ключ, "Бегущий по лезвию 2049" - другой.
+    """
+    if not title:
+        return ""
+    text = title.casefold().replace("ё", "е")
+    normalized = _clean(_TRAILING_YEAR_RE.sub("", _BRACKET_YEAR_RE.sub(" ", text)))
+    # Название из одного года ("1917", "(1917)") не превращаем в пустую строку
+    return normalized or _clean(text)
+
+
+def _clean(text: str) -> str:
+    text = _PUNCT_RE.sub(" ", text).replace("_", " ")
+    return _SPACES_RE.sub(" ", text).strip()
+
+
+def canonical_video_url(video_url: str) -> str:
+    """
+    Приводит URL видео к стабильному виду для ключей кеша.
+
+    Схема и хост в нижнем регистре, без фрагмента, без параметров
+    подписи/срока действия/трекинга (_VOLATILE_PARAMS); остальные
+    параметры отсортированы.
+    Две ссылки на один файл с разными токенами дают один и тот же URL.
+    """
+    parts = urlsplit(video_url.strip())
+    params = sorted(
+        (name, value)
+        for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if name.lower() not in _VOLATILE_PARAMS and not name.lower().startswith(_VOLATILE_PREFIXES)
+    )
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, urlencode(params), ""))
+
+
+def video_url_hash(video_url: str) -> str:
+    """Хеш фиксированной длины (32 hex-символа) канонического URL видео"""
+    return hashlib.blake2b(canonical_video_url(video_url).encode("utf-8"), digest_size=16).hexdigest()
@@ -0,0 +1,271 @@
+import asyncio
+import itertools
+import json
+import logging
+import os
+import signal
+import sys
+from pathlib import Path
+from typing import Optional, Dict, Any, Set
+
+from services.metrics import observe_parser_timings
+from services.tracing import current_trace_id
+
+logger = logging.getLogger(__name__)
+
+# Корень проекта: процесс парсера запускается как python -m <модуль>
+PROJECT_ROOT = Path(__file__).parent.parent
+
+# Запуск процесса вместе с Chromium, сек
+WORKER_START_TIMEOUT = 60
+
+# Корректная остановка процесса (закрытие браузера), сек
+WORKER_STOP_TIMEOUT = 10
+
+
+class WorkerFailure(Exception):
+    """Процесс парсера упал или не уложился в таймаут задания"""
+
+
+class _Worker:
+    """Процесс парсера: задания и ответы - JSON по строке через stdin/stdout"""
+
+    def __init__(self, process: asyncio.subprocess.Process):
+        self.process = process
+        self.jobs = 0
+        self.killed = False
+        self._ids = itertools.count(1)
+
+    @property
+    def pid(self) -> int:
+        return self.process.pid
+
+    @property
+    def alive(self) -> bool:
+        return self.process.returncode is None and not self.killed
+
+    async def send(self, message: Dict[str, Any]) -> int:
+        job_id = next(self._ids)
+        line = json.dumps({"id": job_id, **message}, ensure_ascii=False) + "\n"
+        self.process.stdin.write(line.encode())
+        await self.process.stdin.drain()
+        return job_id
+
+    async def receive(self, job_id: Optional[int] = None) -> Dict[str, Any]:
+        """Ответ на задание job_id (None - первое сообщение процесса)"""
+        while True:
+            line = await self.process.stdout.readline()
+            if not line:
+                await self.process.wait()
+                raise ConnectionError(f"parser worker {self.pid} exited with code {self.process.returncode}")
+            message = json.loads(line)
+            # Ответы на брошенные задания пропускаем
+            if job_id is None or message.get("id") == job_id:
+                return message
+
+    async def stop(self) -> None:
+        """Закрывает stdin (процесс закрывает браузер и выходит), при зависании - kill"""
+        if self.alive:
+            try:
+                self.process.stdin.close()
+                await asyncio.wait_for(self.process.wait(), WORKER_STOP_TIMEOUT)
+            except (asyncio.TimeoutError, ConnectionError):
+                self.kill()
+        await self.process.wait()
+
+    def kill(self) -> None:
+        """Убивает процесс вместе с Chromium (отдельная группа процессов)"""
+        if self.process.returncode is not None:
+            return
+        self.killed = True
+        try:
+            os.killpg(self.pid, signal.SIGKILL)
+        except (AttributeError, ProcessLookupError, PermissionError):
+            self.process.kill()
+
+
+class ParserWorkerPool:
+    """
+    Пул процессов парсера с асинхронным вызовом из бота.
+
+    Chromium, обработчики ответов страницы и разбор идут в отдельных
+    процессах, цикл событий бота только отправляет задание и ждет ответ.
+    Каждый процесс выполняет один поиск за раз. Процесс перезапускается,
+    если он упал, превысил лимит памяти (вместе с Chromium) или не уложился
+    в таймаут задания. Если вызывающий отменил ожидание, ответ дочитывается
+    в фоне и процесс возвращается в пул.
+    """
+
+    def __init__(self, size: int, job_timeout: float, max_rss_mb: int, module: str = "services.parser_worker"):
+        self.size = max(1, size)
+        self.job_timeout = job_timeout
+        self.max_rss = max_rss_mb * 1024 * 1024
+        # Модуль процесса (python -m module) с протоколом services/parser_worker.py
+        self.module = module
+        self._idle: Optional[asyncio.Queue] = None
+        self._workers: Set[_Worker] = set()
+        self._drains: Set[asyncio.Task] = set()
+        self._stopping: Set[asyncio.Task] = set()
+        self._closed = False
+
+    @property
+    def started(self) -> bool:
+        return self._idle is not None
+
+    @property
+    def live_workers(self) -> int:
+        """Работающих процессов (у каждого свой Chromium)"""
+        return sum(1 for worker in self._workers if worker.alive)
+
+    @property
+    def busy(self) -> int:
+        """Процессов, занятых поиском"""
+        return self.size - self._idle.qsize() if self._idle is not None else 0
+
+    async def start(self) -> None:
+        """Запускает процессы заранее (упавшие при старте создаются при первом поиске)"""
+        if self._idle is not None:
+            return
+        self._closed = False
+        self._idle = asyncio.Queue()
+        workers = await asyncio.gather(*(self._spawn() for _ in range(self.size)), return_exceptions=True)
+        for worker in workers:
+            if isinstance(worker, BaseException):
+                logger.warning(f"Failed to start parser worker: {worker}")
+                worker = None
+            self._idle.put_nowait(worker)
+        logger.info(f"Parser worker pool started: {self.size} processes, job timeout {self.job_timeout:.0f}s")
+
+    async def close(self) -> None:
+        """Останавливает все процессы"""
+        self._closed = True
+        for task in list(self._drains):
+            task.cancel()
+        await asyncio.gather(*self._drains, return_exceptions=True)
+
+        idle, self._idle = self._idle, None
+        if idle is not None:
+            workers = [idle.get_nowait() for _ in range(idle.qsize())]
+            await asyncio.gather(*(worker.stop() for worker in workers if worker is not None))
+        self._workers.clear()
+        await asyncio.gather(*self._stopping, return_exceptions=True)
+        logger.info("Parser worker pool closed")
+
+    async def search(self, title: str, deadline: Optional[float] = None) -> Optional[str]:
+        """
+        Поиск видео в свободном процессе парсера
+
+        Returns:
+            URL видео или None (не найдено)
+
+        Raises:
+            WorkerFailure: процесс упал или превысил таймаут (он перезапускается)
+        """
+        if self._idle is None:
+            await self.start()
+        idle = self._idle
+
+        worker = await idle.get()
+        handed_off = False
+        try:
+            if worker is None or not worker.alive:
+                worker = await self._spawn()
+
+            started = asyncio.get_running_loop().time()
+            try:
+                job_id = await worker.send({"title": title, "deadline": deadline, "trace_id": current_trace_id()})
+            except ConnectionError as e:
+                logger.error(f"Parser worker {worker.pid} is gone: {e}")
+                worker.kill()
+                raise WorkerFailure(str(e)) from e
+
+            reply = asyncio.ensure_future(worker.receive(job_id))
+            try:
+                message = await asyncio.wait_for(asyncio.shield(reply), self.job_timeout)
+            except asyncio.CancelledError:
+                # Процесс еще ищет - дождемся ответа в фоне, чтобы не терять процесс
+                remaining = self.job_timeout - (asyncio.get_running_loop().time() - started)
+                self._hand_off(idle, worker, reply, remaining)
+                handed_off = True
+                raise
+            except asyncio.TimeoutError:
+                reply.cancel()
+                logger.error(f"Parser worker {worker.pid} exceeded {self.job_timeout:.0f}s on '{title}', restarting")
+                worker.kill()
+                raise WorkerFailure(f"no reply in {self.job_timeout:.0f}s") from None
+            except (ConnectionError, ValueError) as e:
+                logger.error(f"Parser worker {worker.pid} crashed on '{title}': {e}")
+                worker.kill()
+                raise WorkerFailure(str(e)) from e
+
+            self._after_job(worker, message)
+            if message.get("error"):
+                logger.warning(f"Parser worker {worker.pid} failed on '{title}': {message['error']}")
+            return message.get("url")
+
+        finally:
+            if not handed_off:
+                self._put_back(idle, worker)
+
+    def _after_job(self, worker: _Worker, message: Dict[str, Any]) -> None:
+        worker.jobs += 1
+        observe_parser_timings(message.get("timings") or {})
+        rss = message.get("rss") or 0
+        if rss > self.max_rss:
+            logger.info(
+                f"Parser worker {worker.pid} uses {rss // (1024 * 1024)}MB after {worker.jobs} jobs, restarting"
+            )
+            # Процесс перезапустится при следующем поиске
+            worker.process.stdin.close()
+
+    def _put_back(self, idle: asyncio.Queue, worker: Optional[_Worker]) -> None:
+        """Возвращает процесс в пул; упавший или отслуживший останавливается в фоне"""
+        in_pool = not self._closed and idle is self._idle
+        if worker is not None and (not in_pool or not worker.alive or worker.process.stdin.is_closing()):
+            self._retire(worker)
+            worker = None
+        if in_pool:
+            idle.put_nowait(worker)
+
+    def _retire(self, worker: _Worker) -> None:
+        self._workers.discard(worker)
+        task = asyncio.create_task(worker.stop())
+        self._stopping.add(task)
+        task.add_done_callback(self._stopping.discard)
+
+    def _hand_off(self, idle: asyncio.Queue, worker: _Worker, reply: asyncio.Future, timeout: float) -> None:
+        async def drain():
+            try:
+                self._after_job(worker, await asyncio.wait_for(reply, max(0.0, timeout)))
+            except asyncio.CancelledError:
+                worker.kill()
+                raise
+            except Exception as e:
+                logger.warning(f"Parser worker {worker.pid} did not finish an abandoned job, restarting: {e}")
+                worker.kill()
+            finally:
+                self._put_back(idle, worker)
+
+        task = asyncio.create_task(drain())
+        self._drains.add(task)
+        task.add_done_callback(self._drains.discard)
+
+    async def _spawn(self) -> _Worker:
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, "-m", self.module,
+            cwd=str(PROJECT_ROOT),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            # Своя группа процессов: Ctrl+C бота не роняет поиск, kill убивает и Chromium
+            start_new_session=True
+        )
+        worker = _Worker(process)
+        try:
+            await asyncio.wait_for(worker.receive(), WORKER_START_TIMEOUT)
+        except BaseException:
+            worker.kill()
+            await process.wait()
+            raise
+        self._workers.add(worker)
+        logger.info(f"Parser worker {worker.pid} started")
+        return worker
@@ -0,0 +1,124 @@
+"""
+Процесс парсера (запускается ParserWorkerPool из services/parser_pool.py).
+
+Читает задания из stdin и пишет ответы в stdout, по одному JSON
+на строку:
+    {"id": 1, "title": "Матрица", "deadline": 45.0, "trace_id": "3f2a..."}
+    {"id": 1, "url": "https://...mp4", "rss": 412345678, "timings": {"total": 7.2}}
+
+Первая строка после запуска браузера - {"ready": true}. Закрытие stdin
+завершает процесс. Вывод print и логи идут в stderr, чтобы не смешиваться
+с протоколом; trace_id задания попадает в логи процесса.
+
+Запуск вручную:
+    echo '{"id": 1, "title": "Матрица"}' | python -m services.parser_worker
+"""
+import asyncio
+import json
+import logging
+import os
+import sys
+from pathlib import Path
+from typing import Any, Dict, TextIO
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+logger = logging.getLogger(__name__)
+
+
+def process_tree_rss(pid: int | None = None) -> int:
+    """Резидентная память процесса и всех потомков (Chromium), байт"""
+    pid = pid or os.getpid()
+    try:
+        entries = [entry for entry in os.listdir("/proc") if entry.isdigit()]
+    except FileNotFoundError:
+        # Не Linux: только пик памяти самого процесса
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    children: Dict[int, list] = {}
+    for entry in entries:
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # Имя процесса в скобках может содержать пробелы
+        ppid = int(stat.rsplit(")", 1)[1].split()[1])
+        children.setdefault(ppid, []).append(int(entry))
+
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    total = 0
+    stack = [pid]
+    while stack:
+        current = stack.pop()
+        try:
+            with open(f"/proc/{current}/statm") as f:
+                total += int(f.read().split()[1]) * page_size
+        except OSError:
+            continue
+        stack.extend(children.get(current, ()))
+    return total
+
+
+def _protocol_stream() -> TextIO:
+    """Забирает stdout под протокол, а обычный вывод перенаправляет в stderr"""
+    protocol = os.fdopen(os.dup(sys.stdout.fileno()), "w", encoding="utf-8")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    sys.stdout = sys.stderr
+    return protocol
+
+
+def _reply(protocol: TextIO, message: Dict[str, Any]) -> None:
+    protocol.write(json.dumps(message, ensure_ascii=False) + "\n")
+    protocol.flush()
+
+
+async def serve(protocol: TextIO) -> None:
+    from services.zona_parser_service import create_browser_pool, search_with_pool
+    from services.tracing import set_trace_id, trace_id_var
+
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader()
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+
+    # Один поиск за раз - одна страница
+    pool = create_browser_pool(size=1)
+    try:
+        await pool.start()
+    except Exception as e:
+        # Пул попробует запуститься при первом задании
+        logger.error(f"Failed to start browser: {e}", exc_info=True)
+
+    _reply(protocol, {"ready": True})
+    try:
+        while line := await reader.readline():
+            job = json.loads(line)
+            reply: Dict[str, Any] = {"id": job["id"], "url": None, "timings": {}}
+            token = set_trace_id(job.get("trace_id"))
+            try:
+                reply["url"] = await search_with_pool(pool, job["title"], job.get("deadline"), reply["timings"])
+            except Exception as e:
+                logger.error(f"Search failed for '{job['title']}': {e}", exc_info=True)
+                reply["error"] = str(e)
+            finally:
+                trace_id_var.reset(token)
+            reply["rss"] = process_tree_rss()
+            _reply(protocol, reply)
+    finally:
+        await pool.close()
+
+
+def main() -> None:
+    from services.logging_setup import setup_logging
+
+    protocol = _protocol_stream()
+    setup_logging(
+        stream=sys.stderr,
+        text_format='%(asctime)s - parser-worker[%(process)d] - %(name)s - %(levelname)s - [%(trace_id)s] %(message)s'
+    )
+    asyncio.run(serve(protocol))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import asyncio
+import cProfile
+import io
+import logging
+import pstats
+import time
+from pathlib import Path
+from typing import Tuple
+
+from config import PROFILE_DIR
+
+logger = logging.getLogger(__name__)
+
+_active = False
+
+
+class ProfilerBusy(Exception):
+    """Профиль уже снимается"""
+
+
+async def profile_event_loop(seconds: float, directory: str = PROFILE_DIR, top: int = 15) -> Tuple[Path, str]:
+    """
+    Профилирует поток цикла событий seconds секунд.
+
+    cProfile включается в потоке цикла и видит все корутины и колбэки,
+    но не потоки executor и не процессы парсера. Полный профиль
+    сохраняется в directory (.pstats для pstats/snakeviz и .txt).
+
+    Returns:
+        (путь к .pstats, краткая сводка самых затратных функций)
+
+    Raises:
+        ProfilerBusy: профиль уже снимается
+        ValueError: включен другой профилировщик
+    """
+    global _active
+    if _active:
+        raise ProfilerBusy()
+
+    _active = True
+    profiler = cProfile.Profile()
+    try:
+        logger.info(f"Profiling event loop for {seconds:.0f}s")
+        profiler.enable()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            profiler.disable()
+    finally:
+        _active = False
+
+    path = Path(directory) / f"profile-{time.strftime('%Y%m%d-%H%M%S')}.pstats"
+    summary = await asyncio.to_thread(_save, profiler, path, top)
+    logger.info(f"Event loop profile saved to {path}")
+    return path, summary
+
+
+def _save(profiler: cProfile.Profile, path: Path, top: int) -> str:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    profiler.dump_stats(path)
+
+    report = io.StringIO()
+    stats = pstats.Stats(profiler, stream=report)
+    stats.sort_stats("cumulative").print_stats(100)
+    path.with_suffix(".txt").write_text(report.getvalue())
+
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:top]
+    lines = [f"{'cum, s':>8} {'own, s':>8} {'calls':>8}  function"]
+    for (filename, line, function), (_, calls, own, cumulative, _) in rows:
+        lines.append(f"{cumulative:8.3f} {own:8.3f} {calls:8d}  {function} ({Path(filename).name}:{line})")
+    return "\n".join(lines)
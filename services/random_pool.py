@@ -0,0 +1,118 @@
+import asyncio
+import logging
+import random
+from typing import Optional, Dict, Any, List
+
+from config import RANDOM_POOL_PAGES, RANDOM_POOL_PAGE_SIZE, RANDOM_POOL_REFRESH, RANDOM_CACHED_PREFERENCE
+from services.kinopoisk_service import get_top_movies
+from database.models import VideoCache
+from database.connection import get_db_session
+
+logger = logging.getLogger(__name__)
+
+# Повторная попытка, если обновить пул не удалось
+RETRY_INTERVAL = 300
+
+
+class RandomMoviePool:
+    """
+    Пул кандидатов для /random, обновляемый в фоне.
+
+    Собирается из нескольких страниц топа Kinopoisk, поэтому выбор
+    случайного фильма не требует запросов к API. Предпочтение отдается
+    фильмам, уже загруженным в Telegram (есть file_id в VideoCache).
+    """
+
+    def __init__(
+        self,
+        pages: int = 5,
+        page_size: int = 100,
+        refresh_interval: float = 6 * 3600,
+        cached_preference: float = 0.9
+    ):
+        self.pages = pages
+        self.page_size = page_size
+        self.refresh_interval = refresh_interval
+        self.cached_preference = cached_preference
+        self._candidates: Dict[int, Dict[str, Any]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._candidates)
+
+    async def start(self) -> None:
+        """Запускает фоновое обновление пула"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def refresh(self) -> int:
+        """Загружает страницы топа параллельно и заменяет пул"""
+        results = await asyncio.gather(
+            *(get_top_movies(page, self.page_size) for page in range(1, self.pages + 1)),
+            return_exceptions=True
+        )
+
+        candidates: Dict[int, Dict[str, Any]] = {}
+        for page_result in results:
+            if isinstance(page_result, BaseException):
+                logger.warning(f"Failed to load top movies page: {page_result}")
+                continue
+            for movie in page_result:
+                if movie.get("id") and movie.get("name"):
+                    candidates[movie["id"]] = movie
+
+        # При полном сбое оставляем старый пул
+        if candidates:
+            self._candidates = candidates
+        logger.info(f"Random pool refreshed: {len(candidates)} candidates")
+        return len(candidates)
+
+    async def pick(self) -> Optional[Dict[str, Any]]:
+        """Выбирает случайный фильм, предпочитая уже загруженные"""
+        if not self._candidates:
+            return None
+
+        ids: List[int] = list(self._candidates)
+        if random.random() < self.cached_preference:
+            try:
+                async with get_db_session() as session:
+                    cached_ids = await VideoCache.get_cached_kinopoisk_ids(session, ids)
+                if cached_ids:
+                    return self._candidates[random.choice(list(cached_ids))]
+            except Exception as e:
+                logger.warning(f"Failed to load cached random candidates: {e}")
+
+        return self._candidates[random.choice(ids)]
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            try:
+                count = await self.refresh()
+            except Exception as e:
+                logger.error(f"Random pool refresh failed: {e}", exc_info=True)
+                count = 0
+            await asyncio.sleep(self.refresh_interval if count else RETRY_INTERVAL)
+
+
+random_pool = RandomMoviePool(
+    pages=RANDOM_POOL_PAGES,
+    page_size=RANDOM_POOL_PAGE_SIZE,
+    refresh_interval=RANDOM_POOL_REFRESH,
+    cached_preference=RANDOM_CACHED_PREFERENCE
+)
+
+
+async def get_random_movie() -> Optional[Dict[str, Any]]:
+    """
+    Получить случайный популярный фильм из пула кандидатов
+
+    Returns:
+        Словарь с данными фильма или None, если пул еще пуст
+    """
+    return await random_pool.pick()
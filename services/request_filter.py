@@ -0,0 +1,97 @@
+import logging
+from collections import Counter
+from typing import Iterable, Optional
+from urllib.parse import urlsplit
+
+from playwright.async_api import Route, Request, Response
+
+logger = logging.getLogger(__name__)
+
+
+def _parse_list(value: str) -> frozenset:
+    return frozenset(item.strip().lower() for item in value.split(",") if item.strip())
+
+
+class FilterStats:
+    """Счетчики запросов одного поиска"""
+
+    def __init__(self):
+        self.allowed = 0
+        self.blocked = 0
+        self.blocked_by_type: Counter = Counter()
+        self.allowed_bytes = 0
+
+    def record_response(self, response: Response) -> None:
+        """Учитывает размер пропущенного ответа (видео не считаем - качается частично)"""
+        if response.request.resource_type == "media":
+            return
+        length = response.headers.get("content-length")
+        if length and length.isdigit():
+            self.allowed_bytes += int(length)
+
+    def summary(self) -> str:
+        by_type = ",".join(f"{name}:{count}" for name, count in self.blocked_by_type.most_common())
+        return (
+            f"requests allowed={self.allowed} blocked={self.blocked}"
+            f"{f' ({by_type})' if by_type else ''} transferred={self.allowed_bytes // 1024}KB"
+        )
+
+
+class RequestFilter:
+    """
+    Политика перехвата запросов страницы Playwright.
+
+    Порядок проверки: домен из allowed_domains - пропускаем;
+    тип ресурса из blocked_types - блокируем; домен из blocked_domains -
+    блокируем; остальное пропускаем. Домены совпадают вместе с поддоменами.
+    """
+
+    def __init__(
+        self,
+        blocked_types: Iterable[str] = (),
+        blocked_domains: Iterable[str] = (),
+        allowed_domains: Iterable[str] = ()
+    ):
+        self.blocked_types = frozenset(blocked_types)
+        self.blocked_domains = frozenset(blocked_domains)
+        self.allowed_domains = frozenset(allowed_domains)
+
+    @classmethod
+    def from_config(cls, blocked_types: str, blocked_domains: str, allowed_domains: str) -> Optional['RequestFilter']:
+        """Политика из строк через запятую; None, если блокировать нечего"""
+        request_filter = cls(_parse_list(blocked_types), _parse_list(blocked_domains), _parse_list(allowed_domains))
+        if not request_filter.blocked_types and not request_filter.blocked_domains:
+            return None
+        return request_filter
+
+    def allows(self, url: str, resource_type: str) -> bool:
+        host = (urlsplit(url).hostname or "").lower()
+        if self._matches(host, self.allowed_domains):
+            return True
+        if resource_type in self.blocked_types:
+            return False
+        return not self._matches(host, self.blocked_domains)
+
+    def handler(self, stats: FilterStats):
+        """Обработчик для page.route, считающий решения в stats"""
+        async def handle(route: Route, request: Request) -> None:
+            try:
+                if self.allows(request.url, request.resource_type):
+                    stats.allowed += 1
+                    await route.continue_()
+                else:
+                    stats.blocked += 1
+                    stats.blocked_by_type[request.resource_type] += 1
+                    await route.abort("blockedbyclient")
+            except Exception as e:
+                # Страница уже закрыта или ушла на другой адрес
+                logger.debug(f"Route handling failed for {request.url[:80]}: {e}")
+
+        return handle
+
+    @staticmethod
+    def _matches(host: str, domains: frozenset) -> bool:
+        if not host or not domains:
+            return False
+        parts = host.split(".")
+        return any(".".join(parts[i:]) in domains for i in range(len(parts) - 1))
@@ -0,0 +1,99 @@
+import asyncio
+import logging
+from typing import Optional
+
+import aiohttp
+
+from config import RESOLVED_URL_TTL, RESOLVED_URL_CHECK_TIMEOUT
+from services.http_client import get_http_session
+from services.normalize import normalize_title
+from database.models import ResolvedUrl
+from database.connection import get_db_session
+
+logger = logging.getLogger(__name__)
+
+# Ответы, после которых ссылку можно отдавать загрузчику
+_LIVE_STATUSES = (200, 206)
+
+# Сервер не поддерживает HEAD - проверяем запросом первого байта
+_HEAD_UNSUPPORTED = (403, 405, 501)
+
+
+def resolved_keys(title: str, kinopoisk_id: Optional[int] = None) -> list[str]:
+    """Ключи кеша в порядке приоритета: ID Kinopoisk точнее названия"""
+    keys = [f"title:{normalize_title(title)}"]
+    if kinopoisk_id:
+        keys.insert(0, f"kp:{kinopoisk_id}")
+    return keys
+
+
+async def get_resolved_url(title: str, kinopoisk_id: Optional[int] = None, timeout: float = RESOLVED_URL_CHECK_TIMEOUT) -> Optional[str]:
+    """
+    URL видео, найденный парсером раньше, если он еще отвечает.
+
+    Перед выдачей ссылка проверяется HEAD-запросом (или запросом
+    первого байта): подписанные ссылки CDN истекают раньше TTL.
+    Нерабочая ссылка удаляется из кеша - дальше нужен новый поиск.
+    """
+    keys = resolved_keys(title, kinopoisk_id)
+    try:
+        async with get_db_session() as db_session:
+            entry = await ResolvedUrl.get_valid(db_session, keys)
+    except Exception as e:
+        logger.warning(f"Resolved URL cache read failed: {e}")
+        return None
+
+    if entry is None:
+        return None
+
+    if await check_video_url(entry.video_url, timeout):
+        logger.info(f"Reusing resolved video URL for '{title}' ({entry.key})")
+        return entry.video_url
+
+    logger.info(f"Resolved video URL for '{title}' is no longer valid, searching again")
+    try:
+        async with get_db_session() as db_session:
+            await ResolvedUrl.forget(db_session, entry.video_url)
+    except Exception as e:
+        logger.warning(f"Resolved URL cache cleanup failed: {e}")
+    return None
+
+
+async def remember_resolved_url(title: str, video_url: str, kinopoisk_id: Optional[int] = None) -> None:
+    """Сохраняет найденный URL под названием и ID Kinopoisk"""
+    try:
+        async with get_db_session() as db_session:
+            await ResolvedUrl.put(db_session, resolved_keys(title, kinopoisk_id), video_url, RESOLVED_URL_TTL)
+    except Exception as e:
+        logger.warning(f"Resolved URL cache write failed: {e}")
+
+
+async def check_video_url(url: str, timeout: float = RESOLVED_URL_CHECK_TIMEOUT) -> bool:
+    """Проверяет, что ссылка еще отдает видео (HEAD, при отказе - Range на 1 байт)"""
+    session = get_http_session()
+    client_timeout = aiohttp.ClientTimeout(total=timeout)
+    try:
+        async with session.head(url, timeout=client_timeout, allow_redirects=True) as resp:
+            if resp.status not in _HEAD_UNSUPPORTED:
+                return resp.status in _LIVE_STATUSES and _is_video(resp)
+        async with session.get(url, headers={"Range": "bytes=0-0"}, timeout=client_timeout) as resp:
+            return resp.status in _LIVE_STATUSES and _is_video(resp)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logger.debug(f"Resolved URL check failed: {e}")
+        return False
+
+
+def _is_video(resp: aiohttp.ClientResponse) -> bool:
+    """Истекшая подпись часто отдает 200 со страницей ошибки вместо видео"""
+    return not resp.content_type.startswith("text/")
+
+
+async def purge_expired_urls() -> None:
+    """Удаляет просроченные записи кеша URL из БД"""
+    try:
+        async with get_db_session() as db_session:
+            removed = await ResolvedUrl.purge_expired(db_session)
+        if removed:
+            logger.info(f"Purged {removed} expired resolved URLs")
+    except Exception as e:
+        logger.warning(f"Resolved URL purge failed: {e}")
@@ -0,0 +1,63 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+from services.tracing import current_trace_id
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class _Call:
+    """Выполняющийся вызов и число ожидающих его результата"""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+        # Трасса лидера: в ее логах вся работа для ведомых
+        self.trace_id = current_trace_id()
+
+
+class SingleFlight:
+    """
+    Объединяет одинаковые конкурентные вызовы в один.
+
+    Первый вызов с ключом (лидер) запускает работу в отдельной задаче,
+    остальные (ведомые) ждут её результата. Результат и исключение
+    получают все участники. Отмена одного участника не отменяет работу
+    для остальных; работа отменяется, только когда её больше никто не ждет.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def in_flight(self, key: Hashable) -> bool:
+        return key in self._calls
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.create_task(fn()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _task: self._forget(key, call))
+        else:
+            logger.info(f"Joining in-flight request: {key} (trace {call.trace_id or '-'})")
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        except asyncio.CancelledError:
+            if not call.task.done() and call.waiters == 1:
+                # Последний ожидающий ушел - работа больше не нужна.
+                # Ключ освобождаем сразу, чтобы новый вызов не присоединился к отменяемой задаче
+                self._forget(key, call)
+                call.task.cancel()
+            raise
+        finally:
+            call.waiters -= 1
+
+    def _forget(self, key: Hashable, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
@@ -0,0 +1,72 @@
+import asyncio
+import contextvars
+import logging
+import time
+import uuid
+from typing import Any, Optional
+
+logger = logging.getLogger("trace")
+
+# ID трассы текущего обновления; задачи asyncio наследуют его при создании
+trace_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("trace_id", default=None)
+
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+def current_trace_id() -> Optional[str]:
+    return trace_id_var.get()
+
+
+def set_trace_id(trace_id: Optional[str]) -> contextvars.Token:
+    """Устанавливает ID трассы; вернуть прежний - trace_id_var.reset(token)"""
+    return trace_id_var.set(trace_id)
+
+
+def record_span(name: str, seconds: float, status: str = "ok", **fields: Any) -> None:
+    """
+    Событие о завершенном этапе: в тексте лога и в полях записи
+    (span, status, duration_ms и fields) для JSON-формата логов
+    """
+    duration_ms = round(seconds * 1000, 1)
+    details = "".join(f" {key}={value}" for key, value in fields.items())
+    logger.info(
+        f"span {name} {status} {duration_ms}ms{details}",
+        extra={"span": name, "status": status, "duration_ms": duration_ms, "fields": fields}
+    )
+
+
+def _status(exc_type) -> str:
+    if exc_type is None:
+        return "ok"
+    if issubclass(exc_type, asyncio.TimeoutError):
+        return "timeout"
+    if issubclass(exc_type, asyncio.CancelledError):
+        return "cancelled"
+    return "error"
+
+
+class span:
+    """
+    Замеряет этап и пишет событие record_span при выходе:
+        with span("download", url=url[:50]):
+            ...
+    Работает и в обычном with внутри корутин.
+    """
+
+    __slots__ = ("name", "fields", "started")
+
+    def __init__(self, name: str, **fields: Any):
+        self.name = name
+        self.fields = fields
+        self.started = 0.0
+
+    def __enter__(self) -> 'span':
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is not None and _status(exc_type) == "error":
+            self.fields["error"] = exc_type.__name__
+        record_span(self.name, time.perf_counter() - self.started, _status(exc_type), **self.fields)
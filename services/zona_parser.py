@@ -1,124 +1,239 @@
 import asyncio
-from playwright.async_api import async_playwright
-from typing import Optional
+import logging
+from contextlib import contextmanager
+from playwright.async_api import async_playwright, Page
+from typing import Optional, Dict
+
+from services.request_filter import RequestFilter, FilterStats
+
+logger = logging.getLogger(__name__)
+
+# Параметры контекста браузера (используются и пулом браузера)
+CONTEXT_OPTIONS = {
+    "user_agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/120.0.0.0 Safari/537.36"
+    ),
+    "viewport": {"width": 1920, "height": 1080},
+}
 
 
 class ZonaParser:
     """Парсер для zona.plus с улучшенной обработкой ошибок"""
 
-    def __init__(self, base_url: str = "https://w140.zona.plus", headless: bool = True):
+    def __init__(
+        self,
+        base_url: str = "https://w140.zona.plus",
+        headless: bool = True,
+        deadline: float = 45,
+        navigation_timeout: float = 20,
+        results_timeout: float = 15,
+        play_timeout: float = 10,
+        video_timeout: float = 15,
+        request_filter: Optional[RequestFilter] = None
+    ):
         self.base_url = base_url
         self.headless = headless
-        self.video_urls = []
-
-    async def search_movie(self, movie_title: str) -> Optional[str]:
+        # Таймауты в секундах: общий дедлайн и ограничения отдельных шагов
+        self.deadline = deadline
+        self.navigation_timeout = navigation_timeout
+        self.results_timeout = results_timeout
+        self.play_timeout = play_timeout
+        self.video_timeout = video_timeout
+        # Политика блокировки ненужных запросов (картинки, шрифты, реклама)
+        self.request_filter = request_filter
+
+    async def search_movie(
+        self,
+        movie_title: str,
+        page: Optional[Page] = None,
+        deadline: Optional[float] = None,
+        timings: Optional[Dict[str, float]] = None
+    ) -> Optional[str]:
         """
         Ищет фильм и возвращает прямую ссылку на видео
 
         Args:
             movie_title: Название фильма
+            page: Страница из пула браузера. Если не передана,
+                  запускается отдельный браузер только для этого поиска
+            deadline: Время на поиск, сек (не больше общего дедлайна парсера)
+            timings: Словарь для длительностей шагов поиска, сек (для метрик)
 
         Returns:
             URL видео или None если не найдено
         """
-        search_query = movie_title.replace(" ", "%20")
-        search_url = f"{self.base_url}/search/{search_query}"
-
-        print(f"🔍 Ищу: {movie_title}")
-        print(f"📍 URL: {search_url}")
-
-        self.video_urls = []
+        if page is not None:
+            return await self._search_on_page(movie_title, page, deadline, timings)
 
         try:
             async with async_playwright() as p:
-                # Запускаем браузер
                 browser = await p.chromium.launch(headless=self.headless)
+                try:
+                    context = await browser.new_context(**CONTEXT_OPTIONS)
+                    return await self._search_on_page(movie_title, await context.new_page(), deadline, timings)
+                finally:
+                    await browser.close()
+        except Exception as e:
+            logger.error(f"Failed to launch browser: {e}")
+            return None
 
-                context = await browser.new_context(
-                    user_agent=(
-                        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                        "AppleWebKit/537.36 (KHTML, like Gecko) "
-                        "Chrome/120.0.0.0 Safari/537.36"
-                    ),
-                    viewport={"width": 1920, "height": 1080}
-                )
+    async def _search_on_page(
+        self,
+        movie_title: str,
+        page: Page,
+        budget: Optional[float] = None,
+        timings: Optional[Dict[str, float]] = None
+    ) -> Optional[str]:
+        """Выполняет поиск на арендованной странице"""
+        search_query = movie_title.replace(" ", "%20")
+        search_url = f"{self.base_url}/search/{search_query}"
 
-                page = await context.new_page()
+        logger.info(f"Searching zona for '{movie_title}': {search_url}")
 
-                # Перехватчик видео
-                def handle_response(response):
-                    url = response.url.lower()
+        loop = asyncio.get_running_loop()
+        budget = self.deadline if budget is None else max(0.0, min(budget, self.deadline))
+        started = loop.time()
+        deadline = started + budget
+        timings = {} if timings is None else timings
 
-                    # Ищем только .mp4 (самые надежные)
-                    if '.mp4' in url:
-                        if response.url not in self.video_urls:
-                            self.video_urls.append(response.url)
-                            print(f"✅ Найдено видео: {response.url[:80]}...")
+        # Первый подходящий .mp4 завершает future. Результат локальный:
+        # парсер общий для всех конкурентных поисков
+        found: asyncio.Future = loop.create_future()
 
-                page.on("response", handle_response)
+        stats = FilterStats()
+        route_handler = None
+        if self.request_filter is not None:
+            route_handler = self.request_filter.handler(stats)
+            await page.route("**/*", route_handler)
 
-                # Шаг 1: Открываем поиск
-                print("⏳ Загружаю страницу поиска...")
-                await page.goto(search_url, wait_until="domcontentloaded", timeout=60000)
-                await page.wait_for_timeout(3000)
+        # Перехватчик видео
+        def handle_response(response):
+            stats.record_response(response)
+            if found.done():
+                return
 
-                # Шаг 2: Проверяем результаты
-                try:
-                    await page.wait_for_selector('.results-wrap', timeout=15000)
-                except:
-                    print("❌ Результаты не загрузились")
-                    await browser.close()
-                    return None
+            # Ищем только .mp4 (самые надежные)
+            if '.mp4' in response.url.lower() and response.status < 400:
+                logger.debug(f"Video response: {response.url[:80]}...")
+                found.set_result(response.url)
 
-                results = page.locator('a.results-item')
-                count = await results.count()
+        page.on("response", handle_response)
+        navigation = asyncio.create_task(self._navigate(page, search_url, deadline, timings))
 
-                if count == 0:
-                    print("❌ Фильм не найден")
-                    await browser.close()
-                    return None
-
-                print(f"📋 Найдено результатов: {count}")
+        try:
+            await asyncio.wait(
+                {navigation, found},
+                timeout=budget,
+                return_when=asyncio.FIRST_COMPLETED
+            )
+
+            if not found.done() and navigation.done() and navigation.result():
+                # Плеер запущен, ждем первый ответ с видео
+                with self._step("video", timings):
+                    await asyncio.wait(
+                        {found},
+                        timeout=max(0.0, min(self.video_timeout, deadline - loop.time()))
+                    )
+
+            if not found.done():
+                if not navigation.done():
+                    logger.warning(f"Search for '{movie_title}' exceeded its {budget:.1f}s deadline")
+                elif navigation.result():
+                    logger.info(f"No video for '{movie_title}' after pressing Play")
+                return None
+
+            video_url = found.result()
+            logger.info(f"Found video for '{movie_title}': {video_url[:100]}")
+            return video_url
 
-                # Шаг 3: Кликаем на первый результат
-                print("🎬 Открываю страницу фильма...")
-                first_result = results.first
-                await first_result.click(force=True)
-                await page.wait_for_load_state('domcontentloaded', timeout=60000)
-                await page.wait_for_timeout(3000)
+        except Exception as e:
+            logger.error(f"Parser failed on '{movie_title}': {e}")
+            return None
 
-                # Шаг 4: Нажимаем Play
+        finally:
+            # Видео найдено или время вышло - остаток навигации не нужен
+            if not navigation.done():
+                navigation.cancel()
+            await asyncio.gather(navigation, return_exceptions=True)
+            if not found.done():
+                found.cancel()
+            page.remove_listener("response", handle_response)
+            if route_handler is not None:
                 try:
-                    play_button = page.locator("button.vjs-big-play-button")
-
-                    if await play_button.is_visible(timeout=10000):
-                        print("▶️ Нажимаю Play...")
-                        await play_button.click(force=True)
-                        await page.wait_for_timeout(8000)  # Ждем загрузку видео
-                    else:
-                        print("⚠️ Кнопка Play не найдена, жду автозапуск...")
-                        await page.wait_for_timeout(5000)
-
+                    await page.unroute("**/*", route_handler)
                 except Exception as e:
-                    print(f"⚠️ Ошибка с Play: {e}")
-
-                # Закрываем браузер
-                await browser.close()
+                    logger.debug(f"Failed to remove request filter: {e}")
 
-                # Проверяем что нашли
-                if not self.video_urls:
-                    print("❌ Видео не найдено")
-                    return None
+            breakdown = " ".join(f"{name}={seconds:.2f}s" for name, seconds in timings.items())
+            timings["total"] = loop.time() - started
+            logger.info(
+                f"Parser timings for '{movie_title}': {breakdown} "
+                f"total={timings['total']:.2f}s found={found.done() and not found.cancelled()} "
+                f"{stats.summary()}"
+            )
 
-                # Берем первую ссылку (обычно лучшего качества)
-                video_url = self.video_urls[0]
-                print(f"✅ Видео найдено: {video_url}")
-
-                return video_url
+    async def _navigate(self, page: Page, search_url: str, deadline: float, timings: Dict[str, float]) -> bool:
+        """
+        Проходит поиск до запуска плеера.
 
-        except Exception as e:
-            print(f"❌ Ошибка парсера: {e}")
-            return None
+        Returns:
+            True если плеер запущен, False если фильм не найден
+        """
+        loop = asyncio.get_running_loop()
+
+        def timeout_ms(step_timeout: float) -> float:
+            # Шаг не может выйти за общий дедлайн поиска
+            return max(1.0, min(step_timeout, deadline - loop.time()) * 1000)
+
+        # Шаг 1: Открываем поиск
+        with self._step("search_page", timings):
+            await page.goto(search_url, wait_until="domcontentloaded", timeout=timeout_ms(self.navigation_timeout))
+
+        # Шаг 2: Проверяем результаты
+        with self._step("results", timings):
+            try:
+                await page.wait_for_selector('.results-wrap', timeout=timeout_ms(self.results_timeout))
+            except Exception:
+                logger.info("Search results did not load")
+                return False
+
+            results = page.locator('a.results-item')
+            count = await results.count()
+
+        if count == 0:
+            logger.info("No search results")
+            return False
+
+        logger.debug(f"Search results: {count}")
+
+        # Шаг 3: Кликаем на первый результат
+        with self._step("film_page", timings):
+            await results.first.click(force=True)
+            await page.wait_for_load_state('domcontentloaded', timeout=timeout_ms(self.navigation_timeout))
+
+        # Шаг 4: Нажимаем Play
+        with self._step("play", timings):
+            play_button = page.locator("button.vjs-big-play-button")
+            try:
+                await play_button.wait_for(state="visible", timeout=timeout_ms(self.play_timeout))
+                await play_button.click(force=True)
+            except Exception as e:
+                logger.info(f"Play button not found, waiting for autoplay: {e}")
+
+        return True
+
+    @staticmethod
+    @contextmanager
+    def _step(name: str, timings: Dict[str, float]):
+        """Замеряет длительность шага поиска"""
+        loop = asyncio.get_running_loop()
+        step_started = loop.time()
+        try:
+            yield
+        finally:
+            timings[name] = loop.time() - step_started
 
 
 # Пример использования
@@ -1,6 +1,106 @@
-from services.zona_parser import ZonaParser
+import logging
+from typing import Dict
 
-parser = ZonaParser()
+from config import (
+    ZONA_BASE_URL, PARSER_HEADLESS, PARSER_POOL_SIZE, PARSER_MAX_USES,
+    PARSER_DEADLINE, PARSER_NAVIGATION_TIMEOUT, PARSER_RESULTS_TIMEOUT,
+    PARSER_PLAY_TIMEOUT, PARSER_VIDEO_TIMEOUT,
+    PARSER_BLOCK_TYPES, PARSER_BLOCK_DOMAINS, PARSER_ALLOW_DOMAINS,
+    PARSER_WORKERS, PARSER_JOB_TIMEOUT, PARSER_WORKER_MAX_RSS_MB
+)
+from services.browser_pool import BrowserPool
+from services.metrics import PARSER_SEARCHES, CHROMIUM_ACTIVE, PARSER_BUSY, observe_parser_timings
+from services.parser_pool import ParserWorkerPool, WorkerFailure
+from services.request_filter import RequestFilter
+from services.zona_parser import ZonaParser, CONTEXT_OPTIONS
 
-async def get_video_url(movie_title: str) -> str | None:
-    return await parser.search_movie(movie_title)
+logger = logging.getLogger(__name__)
+
+parser = ZonaParser(
+    base_url=ZONA_BASE_URL,
+    headless=PARSER_HEADLESS,
+    deadline=PARSER_DEADLINE,
+    navigation_timeout=PARSER_NAVIGATION_TIMEOUT,
+    results_timeout=PARSER_RESULTS_TIMEOUT,
+    play_timeout=PARSER_PLAY_TIMEOUT,
+    video_timeout=PARSER_VIDEO_TIMEOUT,
+    request_filter=RequestFilter.from_config(PARSER_BLOCK_TYPES, PARSER_BLOCK_DOMAINS, PARSER_ALLOW_DOMAINS)
+)
+
+
+def create_browser_pool(size: int = PARSER_POOL_SIZE) -> BrowserPool:
+    return BrowserPool(
+        size=size,
+        max_uses=PARSER_MAX_USES,
+        headless=PARSER_HEADLESS,
+        context_options=CONTEXT_OPTIONS
+    )
+
+
+# Браузер в процессе бота (PARSER_WORKERS=0) или пул процессов парсера
+browser_pool = create_browser_pool()
+parser_workers = (
+    ParserWorkerPool(PARSER_WORKERS, PARSER_JOB_TIMEOUT, PARSER_WORKER_MAX_RSS_MB)
+    if PARSER_WORKERS > 0 else None
+)
+
+if parser_workers is not None:
+    CHROMIUM_ACTIVE.set_function(lambda: parser_workers.live_workers)
+    PARSER_BUSY.set_function(lambda: parser_workers.busy)
+else:
+    CHROMIUM_ACTIVE.set_function(lambda: int(browser_pool.started))
+    PARSER_BUSY.set_function(lambda: browser_pool.busy)
+
+
+async def start_parser() -> None:
+    """Запускает процессы парсера или Chromium при старте бота"""
+    try:
+        if parser_workers is not None:
+            await parser_workers.start()
+        else:
+            await browser_pool.start()
+    except Exception as e:
+        # Бот продолжит работать, пул попробует запуститься при первом поиске
+        logger.error(f"Failed to start parser: {e}", exc_info=True)
+
+
+async def stop_parser() -> None:
+    """Останавливает процессы парсера или закрывает браузер при остановке бота"""
+    if parser_workers is not None:
+        await parser_workers.close()
+    else:
+        await browser_pool.close()
+
+
+async def get_video_url(movie_title: str, deadline: float | None = None) -> str | None:
+    try:
+        if parser_workers is not None:
+            # Длительности шагов процесс парсера возвращает в ответе
+            url = await parser_workers.search(movie_title, deadline)
+        else:
+            timings: Dict[str, float] = {}
+            try:
+                url = await search_with_pool(browser_pool, movie_title, deadline, timings)
+            finally:
+                observe_parser_timings(timings)
+    except WorkerFailure:
+        # Причину уже записал пул процессов
+        PARSER_SEARCHES.labels("worker_failure").inc()
+        return None
+    except Exception as e:
+        logger.error(f"Parser error: {e}", exc_info=True)
+        PARSER_SEARCHES.labels("error").inc()
+        return None
+    PARSER_SEARCHES.labels("found" if url else "not_found").inc()
+    return url
+
+
+async def search_with_pool(
+    pool: BrowserPool,
+    movie_title: str,
+    deadline: float | None = None,
+    timings: Dict[str, float] | None = None
+) -> str | None:
+    """Поиск на странице из пула браузера текущего процесса"""
+    async with pool.lease() as page:
+        return await parser.search_movie(movie_title, page, deadline, timings)
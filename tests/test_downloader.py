@@ -0,0 +1,150 @@
+import os
+import re
+
+import aiohttp
+import pytest
+from aiohttp import web
+
+from services import downloader
+
+DATA = os.urandom(1024 * 1024)
+CHUNK = 64 * 1024
+SEGMENTS = 4
+
+_RANGE_RE = re.compile(r"bytes=(\d+)-(\d+)?")
+
+
+class RangeServer:
+    """
+    Локальный сервер с файлом DATA.
+
+    ranges=False - Range игнорируется (HTTP 200 на весь файл).
+    drop - сколько раз обрывать соединение на середине диапазона,
+    начинающегося внутри drop_segment (-1 - всегда).
+    """
+
+    def __init__(self, ranges: bool = True, accept_ranges: bool = True, drop: int = 0, drop_segment=(-1, -1)):
+        self.ranges = ranges
+        self.accept_ranges = accept_ranges
+        self.drop = drop
+        self.drop_segment = drop_segment
+        self.requests: list = []
+
+    async def handle(self, request: web.Request) -> web.StreamResponse:
+        header = request.headers.get("Range")
+        self.requests.append(header)
+        headers = {"Accept-Ranges": "bytes"} if self.accept_ranges else {}
+        match = _RANGE_RE.match(header or "")
+        if not self.ranges or match is None:
+            return web.Response(body=DATA, headers=headers)
+
+        start = int(match.group(1))
+        end = min(int(match.group(2) or len(DATA) - 1), len(DATA) - 1)
+        body = DATA[start:end + 1]
+        response = web.StreamResponse(status=206, headers={
+            **headers,
+            "Content-Range": f"bytes {start}-{end}/{len(DATA)}",
+            "Content-Length": str(len(body)),
+        })
+        await response.prepare(request)
+        if header != "bytes=0-0" and self.drop_segment[0] <= start <= self.drop_segment[1] and self.drop:
+            self.drop -= 1
+            await response.write(body[:len(body) // 2])
+            request.transport.close()
+            return response
+        await response.write(body)
+        await response.write_eof()
+        return response
+
+
+@pytest.fixture
+async def serve(monkeypatch):
+    # Сегментами качаем и маленький тестовый файл; один повтор на сегмент
+    monkeypatch.setattr(downloader, "DOWNLOAD_SEGMENT_MIN_SIZE", 1)
+    monkeypatch.setattr(downloader, "DOWNLOAD_SEGMENT_RETRIES", 1)
+    runners = []
+    session = aiohttp.ClientSession()
+
+    async def start(server: RangeServer) -> str:
+        app = web.Application()
+        app.router.add_get("/video.mp4", server.handle)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        runners.append(runner)
+        return f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/video.mp4"
+
+    start.session = session
+    yield start
+    await session.close()
+    for runner in runners:
+        await runner.cleanup()
+
+
+async def _download(serve, server: RangeServer, path) -> str:
+    url = await serve(server)
+    return await downloader.download_video(
+        url, str(path), timeout=30, chunk_size=CHUNK, segments=SEGMENTS, session=serve.session
+    )
+
+
+async def test_segmented_download_is_byte_identical(serve, tmp_path):
+    server = RangeServer()
+    path = tmp_path / "video.mp4"
+
+    assert await _download(serve, server, path) == str(path)
+
+    assert path.read_bytes() == DATA
+    segment_requests = [r for r in server.requests if r != "bytes=0-0"]
+    assert len(segment_requests) == SEGMENTS
+
+
+async def test_dropped_segment_resumes_from_position(serve, tmp_path):
+    start, end = downloader._split_ranges(len(DATA), SEGMENTS)[1]
+    server = RangeServer(drop=1, drop_segment=(start, end))
+    path = tmp_path / "video.mp4"
+
+    assert await _download(serve, server, path) == str(path)
+
+    assert path.read_bytes() == DATA
+    resumed = [
+        int(_RANGE_RE.match(r).group(1)) for r in server.requests
+        if r != "bytes=0-0" and start < int(_RANGE_RE.match(r).group(1)) <= end
+    ]
+    assert len(resumed) == 1
+    # Докачка начинается с уже записанного байта, а не с начала сегмента
+    assert start < resumed[0] <= start + (end - start + 1) // 2
+
+
+@pytest.mark.parametrize("accept_ranges", [False, True])
+async def test_server_without_ranges_falls_back_to_single_stream(serve, tmp_path, monkeypatch, accept_ranges):
+    streams = []
+    stream_to_file = downloader._stream_to_file
+
+    async def spy(*args, **kwargs):
+        streams.append(args[1])
+        return await stream_to_file(*args, **kwargs)
+
+    monkeypatch.setattr(downloader, "_stream_to_file", spy)
+    server = RangeServer(ranges=False, accept_ranges=accept_ranges)
+    path = tmp_path / "video.mp4"
+
+    assert await _download(serve, server, path) == str(path)
+
+    assert path.read_bytes() == DATA
+    assert streams == [str(path)]
+    # Проба диапазона и одно скачивание целиком
+    assert server.requests == ["bytes=0-0", None]
+
+
+async def test_exhausted_retries_remove_partial_file(serve, tmp_path):
+    start, end = downloader._split_ranges(len(DATA), SEGMENTS)[2]
+    server = RangeServer(drop=-1, drop_segment=(start, end))
+    path = tmp_path / "video.mp4"
+
+    assert await _download(serve, server, path) is None
+
+    assert not path.exists()
+    attempts = [r for r in server.requests if r and start <= int(_RANGE_RE.match(r).group(1)) <= end]
+    assert len(attempts) == 1 + downloader.DOWNLOAD_SEGMENT_RETRIES
@@ -0,0 +1,122 @@
+import asyncio
+
+import pytest
+
+from services.job_queue import JobQueue, QueueFull
+
+
+async def _hold(queue: JobQueue, user_id, started: list, release: asyncio.Event, name: str = None):
+    async with queue.slot(user_id):
+        started.append(name or user_id)
+        await release.wait()
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+async def test_slots_go_round_robin_across_users():
+    queue = JobQueue(workers=1, max_depth=10, max_per_user=5)
+    started = []
+    gates = {name: asyncio.Event() for name in ("a1", "a2", "a3", "b1", "c1")}
+
+    tasks = [asyncio.create_task(_hold(queue, "a", started, gates["a1"], "a1"))]
+    await _settle()
+    for name in ("a2", "a3", "b1", "c1"):
+        tasks.append(asyncio.create_task(_hold(queue, name[0], started, gates[name], name)))
+        await _settle()
+    assert started == ["a1"]
+    assert queue.depth == 4
+
+    for name in ("a1", "a2", "b1", "c1", "a3"):
+        gates[name].set()
+        await _settle()
+
+    await asyncio.gather(*tasks)
+    # Вторая задача пользователя a уходит в конец круга
+    assert started == ["a1", "a2", "b1", "c1", "a3"]
+    assert queue.running == 0 and queue.depth == 0
+
+
+async def test_queue_full_when_depth_is_exceeded():
+    queue = JobQueue(workers=1, max_depth=2, max_per_user=0)
+    release = asyncio.Event()
+    started = []
+    tasks = [asyncio.create_task(_hold(queue, user, started, release)) for user in ("a", "b", "c")]
+    await _settle()
+
+    with pytest.raises(QueueFull) as error:
+        async with queue.slot("d"):
+            pass
+    assert not error.value.per_user
+
+    release.set()
+    await asyncio.gather(*tasks)
+    assert started == ["a", "b", "c"]
+
+
+async def test_queue_full_when_user_limit_is_reached():
+    queue = JobQueue(workers=2, max_depth=10, max_per_user=1)
+    release = asyncio.Event()
+    started = []
+    task = asyncio.create_task(_hold(queue, "a", started, release))
+    await _settle()
+
+    with pytest.raises(QueueFull) as error:
+        async with queue.slot("a"):
+            pass
+    assert error.value.per_user
+
+    # Лимит одного пользователя не мешает другим
+    async with queue.slot("b"):
+        pass
+
+    release.set()
+    await task
+
+
+async def test_cancelled_waiter_leaves_the_queue():
+    queue = JobQueue(workers=1, max_depth=10, max_per_user=0)
+    release = asyncio.Event()
+    started = []
+    running = asyncio.create_task(_hold(queue, "a", started, release))
+    await _settle()
+    waiting = asyncio.create_task(_hold(queue, "b", started, release))
+    following = asyncio.create_task(_hold(queue, "c", started, release))
+    await _settle()
+    assert queue.depth == 2
+
+    waiting.cancel()
+    await _settle()
+    assert queue.depth == 1
+
+    release.set()
+    await asyncio.gather(running, following)
+    assert waiting.cancelled()
+    assert started == ["a", "c"]
+    assert queue.running == 0 and queue.depth == 0
+
+
+async def test_slot_handed_to_cancelled_waiter_goes_to_next():
+    queue = JobQueue(workers=1, max_depth=10, max_per_user=0)
+    first = asyncio.Event()
+    release = asyncio.Event()
+    started = []
+    running = asyncio.create_task(_hold(queue, "a", started, first))
+    await _settle()
+    waiting = asyncio.create_task(_hold(queue, "b", started, release))
+    following = asyncio.create_task(_hold(queue, "c", started, release))
+    await _settle()
+
+    # Слот передается b, но b отменяют раньше, чем он успевает его занять
+    first.set()
+    while queue.depth == 2:
+        await asyncio.sleep(0)
+    waiting.cancel()
+    release.set()
+    await asyncio.gather(running, following)
+
+    assert waiting.cancelled()
+    assert started == ["a", "c"]
+    assert queue.running == 0 and queue.depth == 0
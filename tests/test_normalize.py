@@ -0,0 +1,49 @@
+import pytest
+
+from services.normalize import normalize_title
+
+
+@pytest.mark.parametrize("title", [
+    "Матрица",
+    "матрица",
+    "МАТРИЦА!",
+    "Матрица (1999)",
+    "Матрица [1999]",
+    "Матрица, 1999",
+    "Матрица - 1999",
+])
+def test_release_year_and_punctuation_are_ignored(title):
+    assert normalize_title(title) == "матрица"
+
+
+def test_yo_is_folded():
+    assert normalize_title("Ёлки") == normalize_title("Елки")
+
+
+@pytest.mark.parametrize("sequel, original", [
+    ("Бегущий по лезвию 2049", "Бегущий по лезвию"),
+    ("Космическая одиссея 2001 года", "Космическая одиссея года"),
+    ("Терминатор 2", "Терминатор"),
+    ("Ёлки 1914", "Ёлки"),
+])
+def test_numbers_in_title_are_kept(sequel, original):
+    assert normalize_title(sequel) != normalize_title(original)
+
+
+def test_numbers_in_title_are_kept_with_release_year():
+    assert normalize_title("Бегущий по лезвию 2049 (2017)") == "бегущий по лезвию 2049"
+    assert normalize_title("Космическая одиссея 2001 года") == "космическая одиссея 2001 года"
+
+
+@pytest.mark.parametrize("title, key", [
+    ("1917", "1917"),
+    ("(1917)", "1917"),
+    ("2012", "2012"),
+])
+def test_title_that_is_a_year_is_kept(title, key):
+    assert normalize_title(title) == key
+
+
+def test_empty_title():
+    assert normalize_title("") == ""
+
@@ -0,0 +1,71 @@
+import asyncio
+
+from aiogram.methods import SendMessage
+
+from bot.middlewares.outbound import OutboundScheduler
+
+# Допуск на планирование цикла событий, сек
+SLACK = 0.01
+
+
+class Recorder:
+    """make_request, запоминающий время отправки по чатам"""
+
+    def __init__(self):
+        self.sent = []
+
+    async def __call__(self, bot, method):
+        self.sent.append((method.chat_id, asyncio.get_running_loop().time()))
+        return True
+
+
+async def _send_all(scheduler: OutboundScheduler, recorder: Recorder, chat_ids) -> float:
+    started = asyncio.get_running_loop().time()
+    try:
+        await asyncio.gather(*(
+            scheduler(recorder, None, SendMessage(chat_id=chat_id, text="status"))
+            for chat_id in chat_ids
+        ))
+    finally:
+        await scheduler.close()
+    return started
+
+
+async def test_chat_rate_limit_spaces_requests_after_burst():
+    recorder = Recorder()
+    scheduler = OutboundScheduler(global_rate=1000, chat_rate=20, chat_burst=2, group_rate_per_min=60)
+
+    started = await _send_all(scheduler, recorder, [1] * 6 + [2])
+
+    times = {chat_id: [t - started for c, t in recorder.sent if c == chat_id] for chat_id in (1, 2)}
+    # Два запроса сразу (burst), дальше не чаще 20 в секунду
+    assert times[1][1] < SLACK
+    for earlier, later in zip(times[1][1:], times[1][2:]):
+        assert later - earlier >= 1 / 20 - SLACK
+    assert times[1][-1] >= 4 / 20 - SLACK
+    # Лимит одного чата не задерживает другой
+    assert times[2][0] < SLACK
+
+
+async def test_group_chats_use_the_per_minute_rate():
+    recorder = Recorder()
+    scheduler = OutboundScheduler(global_rate=1000, chat_rate=1000, chat_burst=1, group_rate_per_min=600)
+
+    started = await _send_all(scheduler, recorder, [-100] * 3)
+
+    times = [t - started for _, t in recorder.sent]
+    assert times[0] < SLACK
+    assert times[2] - times[0] >= 2 * 60 / 600 - SLACK
+
+
+async def test_global_rate_limit_applies_across_chats():
+    recorder = Recorder()
+    scheduler = OutboundScheduler(global_rate=10, chat_rate=1000, chat_burst=5, group_rate_per_min=60)
+
+    started = await _send_all(scheduler, recorder, range(1, 16))
+
+    times = sorted(t - started for _, t in recorder.sent)
+    # Десять запросов сразу (запас общей корзины), остальные - по 10 в секунду
+    assert sum(1 for t in times if t < SLACK) == 10
+    assert times[-1] >= 5 / 10 - SLACK
+    assert len({chat_id for chat_id, _ in recorder.sent}) == 15
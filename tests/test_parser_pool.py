@@ -0,0 +1,88 @@
+import asyncio
+import os
+import signal
+
+import pytest
+from aiohttp import web
+
+from benchmarks.fake_services import FakeOptions, FakeServices
+from services.parser_pool import ParserWorkerPool, WorkerFailure
+
+# Процесс парсера без браузера с протоколом services/parser_worker.py
+WORKER_MODULE = "benchmarks.fake_parser_worker"
+
+# Задержка страниц заменителя zona: поиск в процессе идет ~2 * ZONA_MS
+ZONA_MS = 300
+
+
+@pytest.fixture
+async def zona(monkeypatch, tmp_path):
+    """Заменитель zona на локальном порту; процессы парсера берут адрес из окружения"""
+    video = tmp_path / "video.mp4"
+    video.write_bytes(b"\0")
+    runner = web.AppRunner(FakeServices(FakeOptions(zona_ms=ZONA_MS), str(video)).app())
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    base_url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+    monkeypatch.setenv("ZONA_BASE_URL", f"{base_url}/zona")
+    yield base_url
+    await runner.cleanup()
+
+
+@pytest.fixture
+async def pool(zona):
+    pool = ParserWorkerPool(1, job_timeout=10, max_rss_mb=10_000, module=WORKER_MODULE)
+    await pool.start()
+    yield pool
+    await pool.close()
+
+
+def _pids(pool: ParserWorkerPool) -> set:
+    return {worker.pid for worker in pool._workers if worker.alive}
+
+
+async def test_search_returns_video_url(pool, zona):
+    url = await pool.search("Матрица")
+    assert url.startswith(f"{zona}/video/")
+
+
+async def test_crashed_worker_raises_and_is_respawned(pool):
+    [pid] = _pids(pool)
+    search = asyncio.create_task(pool.search("Матрица"))
+    await asyncio.sleep(ZONA_MS / 1000 / 2)
+    os.kill(pid, signal.SIGKILL)
+
+    with pytest.raises(WorkerFailure):
+        await search
+
+    # Следующий поиск запускает новый процесс
+    assert await pool.search("Матрица")
+    assert _pids(pool) and pid not in _pids(pool)
+
+
+async def test_job_timeout_raises_and_restarts_worker(zona):
+    pool = ParserWorkerPool(1, job_timeout=ZONA_MS / 1000, max_rss_mb=10_000, module=WORKER_MODULE)
+    await pool.start()
+    try:
+        [pid] = _pids(pool)
+        with pytest.raises(WorkerFailure):
+            await pool.search("Матрица")
+        assert pid not in _pids(pool)
+    finally:
+        await pool.close()
+
+
+async def test_abandoned_job_is_drained_and_worker_reused(pool):
+    [pid] = _pids(pool)
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(pool.search("Матрица"), ZONA_MS / 1000 / 2)
+
+    # Процесс дорабатывает брошенное задание в фоне и возвращается в пул
+    assert pool._drains
+    assert pool.busy == 1
+    await asyncio.gather(*pool._drains)
+    assert pool.busy == 0
+
+    assert await pool.search("Интерстеллар")
+    assert _pids(pool) == {pid}
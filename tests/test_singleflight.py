@@ -0,0 +1,92 @@
+import asyncio
+
+import pytest
+
+from services.singleflight import SingleFlight
+
+
+async def test_concurrent_calls_are_coalesced():
+    flight = SingleFlight()
+    calls = 0
+    release = asyncio.Event()
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return "file_id"
+
+    waiters = [asyncio.create_task(flight.do("kp:1", work)) for _ in range(5)]
+    await asyncio.sleep(0)
+    assert flight.in_flight("kp:1")
+
+    release.set()
+    assert await asyncio.gather(*waiters) == ["file_id"] * 5
+    assert calls == 1
+    assert not flight.in_flight("kp:1")
+
+
+async def test_exception_reaches_every_waiter():
+    flight = SingleFlight()
+    release = asyncio.Event()
+
+    async def work():
+        await release.wait()
+        raise ValueError("upload failed")
+
+    waiters = [asyncio.create_task(flight.do("kp:1", work)) for _ in range(3)]
+    await asyncio.sleep(0)
+    release.set()
+
+    results = await asyncio.gather(*waiters, return_exceptions=True)
+    assert all(isinstance(result, ValueError) for result in results)
+    assert not flight.in_flight("kp:1")
+
+
+async def test_cancelled_leader_does_not_cancel_work_for_followers():
+    flight = SingleFlight()
+    release = asyncio.Event()
+
+    async def work():
+        await release.wait()
+        return "file_id"
+
+    leader = asyncio.create_task(flight.do("kp:1", work))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(flight.do("kp:1", work))
+    await asyncio.sleep(0)
+
+    leader.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+
+    release.set()
+    assert await follower == "file_id"
+    assert not flight.in_flight("kp:1")
+
+
+async def test_work_is_cancelled_and_key_freed_when_last_waiter_leaves():
+    flight = SingleFlight()
+    cancelled = asyncio.Event()
+
+    async def work():
+        try:
+            await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    leader = asyncio.create_task(flight.do("kp:1", work))
+    await asyncio.sleep(0)
+    leader.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+
+    # Новый вызов не присоединяется к отменяемой работе
+    assert not flight.in_flight("kp:1")
+    await asyncio.wait_for(cancelled.wait(), 1)
+
+    async def fresh():
+        return "again"
+
+    assert await flight.do("kp:1", fresh) == "again"
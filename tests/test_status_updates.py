@@ -0,0 +1,57 @@
+import asyncio
+
+from bot.pipeline import StatusUpdates
+
+
+async def test_statuses_are_sent_in_order_keeping_only_the_latest():
+    sent = []
+
+    async def on_status(text):
+        await asyncio.sleep(0.02)
+        sent.append(text)
+
+    status = StatusUpdates(on_status)
+    for text in ("queued", "searching", "downloading", "uploading"):
+        await status(text)
+        await asyncio.sleep(0.005)
+    await status.close()
+
+    # Пока шла первая правка, промежуточные статусы заменили друг друга
+    assert sent == ["queued", "uploading"]
+
+
+async def test_nothing_is_sent_after_close():
+    sent = []
+
+    async def on_status(text):
+        await asyncio.sleep(0.02)
+        sent.append(text)
+
+    status = StatusUpdates(on_status)
+    await status("searching")
+    await asyncio.sleep(0)
+    await status("uploading")
+    await status.close()
+    sent.append("final edit")
+    await status("late")
+    await asyncio.sleep(0.05)
+
+    # Начатую правку дождались, неотправленную отбросили
+    assert sent == ["searching", "final edit"]
+
+
+async def test_failed_edit_does_not_stop_updates():
+    sent = []
+
+    async def on_status(text):
+        if text == "broken":
+            raise RuntimeError("message is not modified")
+        sent.append(text)
+
+    status = StatusUpdates(on_status)
+    await status("broken")
+    await asyncio.sleep(0)
+    await status("uploading")
+    await asyncio.sleep(0)
+    await status.close()
+    assert sent == ["uploading"]